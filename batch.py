@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+"""
+WSADOWE URUCHAMIANIE PRZEGLĄDÓW PARAMETRÓW
+==========================================
+
+Czyta definicję przeglądów z pliku JSON lub TOML, rozwija ją w zadania
+(konfiguracja x powtórzenie), wykonuje je na puli procesów i zapisuje wyniki
+do kolumnowego zbioru danych (klucz 'export_path', patrz symulacja.RunExporter).
+Zadania, których wynik jest już w zbiorze, są pomijane, więc przerwany
+przegląd można po prostu uruchomić ponownie. Przebieg opisuje manifest.json
+w katalogu wyników.
+
+Format pliku (TOML; JSON ma tę samą strukturę):
+
+    base_seed = 2024          # wymagane - ziarna zadań zależą od niego i od konfiguracji
+    replicates = 3            # domyślna liczba powtórzeń
+
+    [defaults]                # wspólne parametry wszystkich przeglądów (nadpisują base)
+    generations = 100
+
+    [[sweeps]]
+    name = "mutacja"
+    base = "default"          # nazwa z ConfigGallery.configs (opcjonalnie)
+    params = { grid_size = 15 }
+    grid = { mutation_rate = [0.01, 0.05, 0.1] }   # iloczyn kartezjański list
+
+Pierwszeństwo parametrów: base < defaults < params < punkt siatki.
+
+Użycie:
+    python batch.py przeglad.toml                        # wszystkie rdzenie
+    python batch.py przeglad.json --workers 8 --max-in-flight 8
+    python batch.py przeglad.toml --dry-run              # tylko lista zadań
+    python batch.py przeglad.toml --force                # licz także gotowe zadania
+"""
+
+import argparse
+import itertools
+import json
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, List
+
+import numpy as np
+
+from config_gallery import ConfigGallery
+from symulacja import ExportedRun, export_config_key, run_simulation
+
+try:
+    import tomllib
+except ImportError:  # Python < 3.11
+    tomllib = None
+
+DEFAULT_OUTPUT = os.path.join('results', 'batch')
+MANIFEST_NAME = 'manifest.json'
+# Najkrótszy odstęp (s) między zapisami manifestu w trakcie przeglądu
+MANIFEST_INTERVAL = 5.0
+
+BATCH_KEYS = ('base_seed', 'replicates', 'defaults', 'sweeps')
+SWEEP_KEYS = ('name', 'base', 'params', 'grid', 'replicates')
+
+
+@dataclass
+class BatchJob:
+    """Pojedyncze zadanie przeglądu wsadowego"""
+    index: int          # pozycja w manifeście
+    sweep: str          # nazwa przeglądu
+    params: dict        # wartości z siatki parametrów
+    replicate: int      # numer powtórzenia
+    config: dict
+    seed: int
+    config_key: str     # export_config_key(config) - katalog w zbiorze danych
+
+    def run_dir(self, output: str) -> str:
+        return os.path.join(output, self.config_key, f"seed_{self.seed}")
+
+    def done(self, output: str) -> bool:
+        """Czy wynik zadania jest już w zbiorze danych"""
+        return ExportedRun(self.run_dir(output), self.config_key).complete
+
+
+def load_batch_file(path: str) -> dict:
+    """Wczytuje definicję przeglądów z pliku .json lub .toml"""
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.toml':
+        if tomllib is None:
+            raise ValueError("Pliki TOML wymagają Pythona 3.11+ (moduł tomllib)")
+        with open(path, 'rb') as f:
+            return tomllib.load(f)
+    if extension == '.json':
+        with open(path) as f:
+            return json.load(f)
+    raise ValueError(f"Nieobsługiwany format pliku przeglądów: {path} (dozwolone .json, .toml)")
+
+
+def job_seed(base_seed: int, config_key: str, replicate: int) -> int:
+    """
+    Ziarno zadania z ziarna bazowego, konfiguracji i numeru powtórzenia.
+    Nie zależy od kolejności przeglądów w pliku, więc dopisanie nowego
+    przeglądu nie zmienia ziaren (ani wyników) zadań już policzonych.
+    """
+    sequence = np.random.SeedSequence(base_seed, spawn_key=(int(config_key[:16], 16), replicate))
+    return int(sequence.generate_state(1)[0])
+
+
+def expand_sweep(sweep: dict, defaults: dict) -> list:
+    """Punkty siatki przeglądu jako lista (params, config); base < defaults < params < siatka"""
+    unknown = set(sweep) - set(SWEEP_KEYS)
+    if unknown:
+        raise ValueError(f"Nieznane klucze przeglądu {sweep.get('name')}: {sorted(unknown)}")
+    base = ConfigGallery.get(sweep['base']) if 'base' in sweep else {}
+    config = {**base, **defaults, **sweep.get('params', {})}
+    grid = sweep.get('grid', {})
+    for name, values in grid.items():
+        if not isinstance(values, list) or not values:
+            raise ValueError(f"Siatka parametru {name} musi być niepustą listą wartości")
+    points = []
+    for values in itertools.product(*grid.values()):
+        params = dict(zip(grid, values))
+        points.append((params, {**config, **params}))
+    return points
+
+
+def expand_batch(spec: dict) -> List[BatchJob]:
+    """
+    Rozwija definicję przeglądów w zadania (przeglądy, punkty siatki, powtórzenia).
+    Zadania o identycznej konfiguracji i ziarnie z różnych przeglądów liczone są raz.
+    """
+    unknown = set(spec) - set(BATCH_KEYS)
+    if unknown:
+        raise ValueError(f"Nieznane klucze pliku przeglądów: {sorted(unknown)}")
+    if spec.get('base_seed') is None:
+        raise ValueError("Plik przeglądów musi podawać base_seed (pomijanie gotowych zadań wymaga stałych ziaren)")
+    base_seed = int(spec['base_seed'])
+    defaults = spec.get('defaults', {})
+    jobs = []
+    seen = set()
+    for sweep_index, sweep in enumerate(spec.get('sweeps', [])):
+        name = sweep.get('name', f"sweep{sweep_index + 1}")
+        replicates = int(sweep.get('replicates', spec.get('replicates', 1)))
+        for params, config in expand_sweep(sweep, defaults):
+            config_key = export_config_key(config)
+            for replicate in range(replicates):
+                seed = job_seed(base_seed, config_key, replicate)
+                if (config_key, seed) in seen:
+                    continue
+                seen.add((config_key, seed))
+                jobs.append(BatchJob(index=len(jobs), sweep=name, params=params, replicate=replicate,
+                                     config=config, seed=seed, config_key=config_key))
+    return jobs
+
+
+def run_batch_job(job: BatchJob, output: str) -> dict:
+    """Uruchamia jedno zadanie z eksportem do output (w procesie roboczym)"""
+    start = time.perf_counter()
+    _, _, _, collection = run_simulation(dict(job.config, seed=job.seed, export_path=output))
+    final_population = collection['total_population'][-1] if len(collection['total_population']) else 0
+    return {'seconds': round(time.perf_counter() - start, 3), 'final_population': int(final_population)}
+
+
+def write_manifest(path: str, manifest: dict):
+    """Zapis atomowy (manifest można czytać w trakcie przeglądu)"""
+    manifest['counts'] = {status: sum(entry['status'] == status for entry in manifest['jobs'])
+                          for status in ('pending', 'done', 'skipped', 'failed')}
+    manifest['updated'] = datetime.now().isoformat(timespec='seconds')
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def print_batch_progress(done: int, total: int, job: BatchJob, entry: dict):
+    """Domyślny raport postępu"""
+    status = '✓' if entry['status'] == 'done' else '✗'
+    params = ', '.join(f"{name}={value}" for name, value in job.params.items())
+    print(f"  [{done}/{total}] {job.sweep} ({params}) powtórzenie {job.replicate + 1} "
+          f"{status}", flush=True)
+
+
+def run_batch(jobs: List[BatchJob], output: str = DEFAULT_OUTPUT, workers: int = None,
+              max_in_flight: int = None, force: bool = False, progress: Callable = None,
+              source: str = None) -> dict:
+    """
+    Wykonuje zadania na puli procesów i zapisuje manifest.
+
+    Args:
+        jobs: zadania z expand_batch
+        output: katalog zbioru danych (wyniki i manifest.json)
+        workers: liczba procesów (None = liczba rdzeni, 1 = bez puli)
+        max_in_flight: największa liczba zadań przekazanych naraz do puli
+                       (domyślnie workers); kolejne zadania czekają w kolejce
+        force: liczy także zadania, których wynik już istnieje
+        progress: funkcja progress(done, total, job, entry) po każdym zadaniu
+        source: plik definicji przeglądów (zapisywany w manifeście)
+
+    Returns:
+        dict: manifest (także w output/manifest.json); status zadania:
+              'done', 'skipped' (wynik już istniał) lub 'failed' (z 'error')
+    """
+    os.makedirs(output, exist_ok=True)
+    manifest_path = os.path.join(output, MANIFEST_NAME)
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = max_in_flight or workers
+    manifest = {
+        'source': source,
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'workers': workers,
+        'jobs': [{'index': job.index, 'sweep': job.sweep, 'params': job.params,
+                  'replicate': job.replicate, 'seed': job.seed, 'config_key': job.config_key,
+                  'run_dir': os.path.relpath(job.run_dir(output), output), 'status': 'pending'}
+                 for job in jobs],
+    }
+    pending = []
+    for job in jobs:
+        if not force and job.done(output):
+            manifest['jobs'][job.index]['status'] = 'skipped'
+        else:
+            pending.append(job)
+    write_manifest(manifest_path, manifest)
+
+    last_write = time.monotonic()
+    for done, (job, result, error) in enumerate(_execute(pending, output, workers, max_in_flight), 1):
+        entry = manifest['jobs'][job.index]
+        if error is None:
+            entry.update(result, status='done')
+        else:
+            entry.update(status='failed', error=error)
+        if progress is not None:
+            progress(done, len(pending), job, entry)
+        if time.monotonic() - last_write >= MANIFEST_INTERVAL:
+            write_manifest(manifest_path, manifest)
+            last_write = time.monotonic()
+    write_manifest(manifest_path, manifest)
+    return manifest
+
+
+def _execute(jobs: List[BatchJob], output: str, workers: int, max_in_flight: int):
+    """Generator (job, wynik, błąd) w kolejności zakończenia zadań"""
+    if workers == 1 or len(jobs) <= 1:
+        for job in jobs:
+            try:
+                yield job, run_batch_job(job, output), None
+            except Exception:
+                yield job, None, traceback.format_exc()
+        return
+
+    queue = iter(jobs)
+    with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as executor:
+        running = {}
+        while True:
+            while len(running) < max_in_flight:
+                job = next(queue, None)
+                if job is None:
+                    break
+                running[executor.submit(run_batch_job, job, output)] = job
+            if not running:
+                break
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                job = running.pop(future)
+                try:
+                    yield job, future.result(), None
+                except Exception:
+                    yield job, None, traceback.format_exc()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Wsadowe uruchamianie przeglądów parametrów')
+    parser.add_argument('path', help='plik definicji przeglądów (.json lub .toml)')
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help='katalog zbioru danych i manifestu')
+    parser.add_argument('--workers', type=int, help='liczba procesów (domyślnie liczba rdzeni)')
+    parser.add_argument('--max-in-flight', type=int,
+                        help='największa liczba zadań naraz w puli (domyślnie --workers)')
+    parser.add_argument('--force', action='store_true', help='licz także zadania z gotowym wynikiem')
+    parser.add_argument('--dry-run', action='store_true', help='wypisz zadania bez uruchamiania')
+    args = parser.parse_args()
+
+    jobs = expand_batch(load_batch_file(args.path))
+    print("=" * 70)
+    print(f"PRZEGLĄD WSADOWY: {args.path} ({len(jobs)} zadań)")
+    print("=" * 70)
+
+    if args.dry_run:
+        for job in jobs:
+            status = 'gotowe' if job.done(args.output) else 'do policzenia'
+            print(f"  {job.index:4d} {job.sweep:<16} {job.params} powtórzenie {job.replicate + 1} "
+                  f"seed={job.seed} [{status}]")
+        return 0
+
+    manifest = run_batch(jobs, args.output, args.workers, args.max_in_flight, args.force,
+                         progress=print_batch_progress, source=args.path)
+    counts = manifest['counts']
+    print(f"\n✓ Policzone: {counts['done']}, pominięte: {counts['skipped']}, błędy: {counts['failed']}")
+    print(f"✓ Manifest: {os.path.join(args.output, MANIFEST_NAME)}")
+    return 1 if counts['failed'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""
+BENCHMARK GORĄCYCH ŚCIEŻEK SYMULACJI
+====================================
+
+Mierzy czasy poszczególnych etapów kroku symulacji (migracja, rozród,
+regulacja liczebności), pełnych kroków obu silników, liczenia różnorodności
+genetycznej (pdist vs częstości alleli) oraz visualize_comparison dla
+standardowej macierzy rozmiarów siatki, populacji i długości genotypu.
+Wyniki zapisywane są do pliku JSON, który może służyć jako punkt odniesienia
+przy porównywaniu kolejnych commitów.
+
+Użycie:
+    python benchmark.py                                  # pełna macierz
+    python benchmark.py --quick                          # mała macierz (szybki test)
+    python benchmark.py --output results/base.json       # własny plik wyników
+    python benchmark.py --baseline results/base.json     # porównanie z poprzednim wynikiem
+"""
+
+import argparse
+import itertools
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import matplotlib
+matplotlib.use('Agg')
+
+import numpy as np
+from scipy.spatial.distance import pdist
+
+from symulacja import (init_environment, init_population_arrays, PopulationArrays,
+                       migration_kernel, reproduction_kernel, capacity_kernel,
+                       simulation_step, simulation_step_arrays, mean_hamming_diversity,
+                       SimulationState, StepParams, step_kernel, ensure_results_directory)
+from wizualizacja import visualize_comparison
+
+
+# =========================
+# Macierz przypadków
+# =========================
+
+GRID_SIZES = [20, 50, 100]
+POPULATION_SIZES = [1_000, 10_000, 50_000]
+GENOME_LENGTHS = [8, 64, 256]
+
+QUICK_GRID_SIZES = [20]
+QUICK_POPULATION_SIZES = [1_000]
+QUICK_GENOME_LENGTHS = [8]
+
+# Parametry kroku jak w run_simulation
+STEP_PARAMS = dict(p_mig=0.15, p_base_repro=0.12, p_mut=0.05, max_per_cell=25)
+
+# Ścieżki kwadratowe lub wolne mierzone tylko do danej wielkości populacji
+PDIST_MAX_N = 5_000
+LIST_ENGINE_MAX_N = 10_000
+
+# Względne spowolnienie uznawane za regresję przy porównaniu z baseline
+REGRESSION_THRESHOLD = 1.2
+
+
+# =========================
+# Pomiar czasu
+# =========================
+
+def measure(func, repeats: int, setup=None) -> dict:
+    """
+    Mierzy czas wywołania func(*setup()) repeats razy.
+    Przygotowanie danych (setup) nie wlicza się do pomiaru.
+    """
+    times = []
+    for _ in range(repeats):
+        args = setup() if setup is not None else ()
+        start = time.perf_counter()
+        func(*args)
+        times.append(time.perf_counter() - start)
+    return {'min': min(times), 'median': float(np.median(times)), 'repeats': repeats}
+
+
+def copy_population(population: PopulationArrays) -> PopulationArrays:
+    """Kopia populacji (kroki symulacji modyfikują ją w miejscu)"""
+    return PopulationArrays(x=population.x.copy(), y=population.y.copy(),
+                            genotypes=population.genotypes.copy(),
+                            birth_time=population.birth_time.copy())
+
+
+# =========================
+# Jeden przypadek macierzy
+# =========================
+
+def benchmark_case(grid_size: int, num_individuals: int, genome_length: int,
+                   repeats: int, seed: int = 0, visualize: bool = True) -> dict:
+    """Mierzy wszystkie etapy dla jednego rozmiaru siatki, populacji i genotypu"""
+    rng = np.random.default_rng(seed)
+    env, barrier = init_environment(grid_size, grid_size, 'vertical', rng)
+    population = init_population_arrays(num_individuals, grid_size, grid_size, genome_length, rng=rng)
+    env_values = env[population.y, population.x]
+    parents, _ = reproduction_kernel(population.genotypes, env_values,
+                                     STEP_PARAMS['p_base_repro'], STEP_PARAMS['p_mut'], rng)
+    all_x = np.concatenate([population.x, population.x[parents]])
+    all_y = np.concatenate([population.y, population.y[parents]])
+
+    timings = {}
+
+    # Etapy kroku (kernele wsadowe)
+    timings['migration'] = measure(
+        lambda x, y: migration_kernel(x, y, barrier, STEP_PARAMS['p_mig'], rng), repeats,
+        setup=lambda: (population.x.copy(), population.y.copy()))
+    timings['reproduction'] = measure(
+        lambda: reproduction_kernel(population.genotypes, env_values,
+                                    STEP_PARAMS['p_base_repro'], STEP_PARAMS['p_mut'], rng), repeats)
+    timings['capacity'] = measure(
+        lambda: capacity_kernel(all_x, all_y, grid_size, STEP_PARAMS['max_per_cell'], rng), repeats)
+
+    # Pełne kroki obu silników
+    timings['step_arrays'] = measure(
+        lambda pop: simulation_step_arrays(pop, env, barrier, 0, rng=rng, **STEP_PARAMS), repeats,
+        setup=lambda: (copy_population(population),))
+    timings['step_fused'] = measure(
+        lambda state: step_kernel(state, env, barrier, StepParams(**STEP_PARAMS), rng), repeats,
+        setup=lambda: (SimulationState(population),))
+    if num_individuals <= LIST_ENGINE_MAX_N:
+        timings['step_list'] = measure(
+            lambda pop: simulation_step(pop, env, barrier, rng=rng, **STEP_PARAMS), repeats,
+            setup=lambda: (population.to_individuals(),))
+
+    # Statystyki: różnorodność genetyczna
+    if num_individuals <= PDIST_MAX_N:
+        timings['diversity_pdist'] = measure(
+            lambda: np.mean(pdist(population.genotypes, metric='hamming')), repeats)
+    timings['diversity_counts'] = measure(
+        lambda: mean_hamming_diversity(population.genotypes), repeats)
+
+    # Wizualizacja stanu końcowego
+    if visualize:
+        mid = grid_size // 2
+        populations = [population.take(population.x < mid), population.take(population.x >= mid)]
+        collection = {'total_population': [num_individuals] * 10, 'genetic_diversity': [0.5] * 10}
+        with tempfile.TemporaryDirectory() as tmp:
+            filename = os.path.join(tmp, 'benchmark.png')
+            timings['visualize_comparison'] = measure(
+                lambda: visualize_comparison(populations, env, barrier, collection,
+                                             'benchmark', filename), 1)
+
+    return {'case': {'grid_size': grid_size, 'num_individuals': num_individuals,
+                     'genome_length': genome_length},
+            'timings': timings}
+
+
+# =========================
+# Zapis i porównanie wyników
+# =========================
+
+def git_commit():
+    """Skrócony hash bieżącego commita (None poza repozytorium git)"""
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def case_key(case: dict):
+    return (case['grid_size'], case['num_individuals'], case['genome_length'])
+
+
+def compare_with_baseline(results: list, baseline: dict) -> int:
+    """
+    Drukuje porównanie z wynikiem bazowym (stosunek czasów min).
+    Zwraca liczbę regresji powyżej REGRESSION_THRESHOLD.
+    """
+    previous = {case_key(r['case']): r['timings'] for r in baseline['results']}
+    regressions = 0
+    print(f"\nPorównanie z baseline (commit {baseline['meta'].get('commit')}):")
+    print(f"  {'siatka':>6} {'N':>7} {'L':>4}  {'etap':<22} {'przed [ms]':>11} {'teraz [ms]':>11} {'x':>6}")
+    for result in results:
+        key = case_key(result['case'])
+        if key not in previous:
+            continue
+        for phase, timing in result['timings'].items():
+            if phase not in previous[key]:
+                continue
+            before = previous[key][phase]['min']
+            ratio = timing['min'] / before if before > 0 else float('inf')
+            flag = '  ✗ REGRESJA' if ratio > REGRESSION_THRESHOLD else ''
+            regressions += bool(flag)
+            print(f"  {key[0]:>6} {key[1]:>7} {key[2]:>4}  {phase:<22} "
+                  f"{before * 1e3:>11.2f} {timing['min'] * 1e3:>11.2f} {ratio:>6.2f}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark gorących ścieżek symulacji')
+    parser.add_argument('--quick', action='store_true', help='mała macierz przypadków')
+    parser.add_argument('--repeats', type=int, default=5, help='liczba powtórzeń pomiaru')
+    parser.add_argument('--output', default='results/benchmark.json', help='plik wyników JSON')
+    parser.add_argument('--baseline', help='plik JSON z poprzednim wynikiem do porównania')
+    parser.add_argument('--no-plots', action='store_true', help='pomiń visualize_comparison')
+    args = parser.parse_args()
+
+    if args.quick:
+        matrix = (QUICK_GRID_SIZES, QUICK_POPULATION_SIZES, QUICK_GENOME_LENGTHS)
+    else:
+        matrix = (GRID_SIZES, POPULATION_SIZES, GENOME_LENGTHS)
+
+    print("=" * 70)
+    print("BENCHMARK SYMULACJI")
+    print("=" * 70)
+
+    results = []
+    for grid_size, num_individuals, genome_length in itertools.product(*matrix):
+        print(f"\n[siatka {grid_size}x{grid_size}, N={num_individuals}, L={genome_length}]")
+        # Wizualizacja nie zależy od długości genotypu - mierzymy ją raz
+        visualize = not args.no_plots and genome_length == matrix[2][0]
+        result = benchmark_case(grid_size, num_individuals, genome_length,
+                                args.repeats, visualize=visualize)
+        for phase, timing in result['timings'].items():
+            print(f"  {phase:<22} min={timing['min'] * 1e3:9.2f} ms  "
+                  f"mediana={timing['median'] * 1e3:9.2f} ms")
+        results.append(result)
+
+    report = {
+        'meta': {
+            'commit': git_commit(),
+            'date': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'repeats': args.repeats,
+        },
+        'results': results,
+    }
+
+    output_dir = os.path.dirname(args.output)
+    if output_dir == 'results':
+        ensure_results_directory()
+    elif output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\n✓ Wyniki zapisane: {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare_with_baseline(results, baseline)
+        if regressions:
+            print(f"\n✗ Wykryto regresje: {regressions}")
+            return 1
+        print("\n✓ Brak regresji")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -8,9 +8,15 @@ Wykorzystuje słowniki zamiast obiektów klasy SimulationConfig.
 """
 
 import os
-from symulacja import run_simulation, visualize_comparison, analyze_genetic_divergence, ensure_results_directory
+from symulacja import analyze_genetic_divergence, ensure_results_directory
+from sweep import run_sweep, print_progress
 import numpy as np
-import matplotlib.pyplot as plt
+# matplotlib importowany jest w funkcjach demonstracyjnych, więc ConfigGallery
+# (np. w batch.py) nie ładuje go w procesach roboczych
+
+# Stałe ziarno bazowe i pamięć podręczna wyników dla porównań konfiguracji
+BASE_SEED = 2024
+RESULT_CACHE = os.path.join('results', 'cache')
 
 
 # ============================================================================
@@ -135,6 +141,7 @@ def config_long_term():
         'generations': 300,
         'mutation_rate': 0.05,
         'barrier_type': 'vertical',
+        'collector': 'streaming',
     }
 
 
@@ -222,16 +229,20 @@ class ConfigGallery:
 
 def demo_compare_configs(config_names):
     """Porównaj wyniki różnych konfiguracji"""
+    import matplotlib.pyplot as plt
+    
     print(f"\nPorównanie konfiguracji: {config_names}")
     print("=" * 70)
     
     results = {}
     
-    for name in config_names:
+    configs = [ConfigGallery.get(name) for name in config_names]
+    sweep_results = run_sweep(configs, base_seed=BASE_SEED, progress=print_progress,
+                              cache=RESULT_CACHE)
+    
+    for name, config, (populations, env, barriers, collection) in zip(config_names, configs, sweep_results):
         try:
             print(f"  [{name}] ", end='', flush=True)
-            config = ConfigGallery.get(name)
-            populations, env, barriers, collection = run_simulation(config)
             results[name] = {
                 'config': config,
                 'populations': populations,
@@ -240,8 +251,8 @@ def demo_compare_configs(config_names):
                 'collection': collection,
             }
             
-            final_pop = collection['total_population'][-1] if collection['total_population'] else 0
-            final_div = collection['genetic_diversity'][-1] if collection['genetic_diversity'] else 0
+            final_pop = collection['total_population'][-1] if len(collection['total_population']) else 0
+            final_div = collection['genetic_diversity'][-1] if len(collection['genetic_diversity']) else 0
             divergence = analyze_genetic_divergence(populations) if len(populations) > 1 else 0
             
             print(f"✓ Pop={final_pop}, Div={final_div:.4f}, Divergence={divergence:.4f}")
@@ -279,23 +290,25 @@ def demo_compare_configs(config_names):
 
 def demo_barrier_types():
     """Pokaz różnych typów barier"""
+    import matplotlib.pyplot as plt
+    
     print("\nDemo typów barier...")
     
     barrier_types = ['vertical', 'horizontal', 'none']
     results = {}
     
-    for barrier_type in barrier_types:
+    configs = [{
+        'grid_size': 20,
+        'initial_pop_size': 150,
+        'generations': 120,
+        'mutation_rate': 0.05,
+        'barrier_type': barrier_type,
+    } for barrier_type in barrier_types]
+    sweep_results = run_sweep(configs, base_seed=BASE_SEED, progress=print_progress,
+                              cache=RESULT_CACHE)
+    
+    for barrier_type, (populations, env, barriers, collection) in zip(barrier_types, sweep_results):
         print(f"  [{barrier_type}] ", end='', flush=True)
-        
-        config = {
-            'grid_size': 20,
-            'initial_pop_size': 150,
-            'generations': 120,
-            'mutation_rate': 0.05,
-            'barrier_type': barrier_type,
-        }
-        
-        populations, env, barriers, collection = run_simulation(config)
         results[barrier_type] = (populations, env, barriers, collection)
         
         divergence = analyze_genetic_divergence(populations) if len(populations) > 1 else 0
@@ -322,24 +335,26 @@ def demo_barrier_types():
 
 def demo_population_sensitivity():
     """Pokaz wrażliwości na wielkość populacji"""
+    import matplotlib.pyplot as plt
+    
     print("\nDemo wrażliwości na wielkość populacji...")
     
     pop_sizes = [50, 150, 300]
     results = {}
     
-    for pop_size in pop_sizes:
+    configs = [{
+        'grid_size': 20,
+        'initial_pop_size': pop_size,
+        'generations': 150,
+        'mutation_rate': 0.05,
+        'barrier_type': 'vertical',
+    } for pop_size in pop_sizes]
+    sweep_results = run_sweep(configs, base_seed=BASE_SEED, progress=print_progress,
+                              cache=RESULT_CACHE)
+    
+    for pop_size, result in zip(pop_sizes, sweep_results):
         print(f"  [pop={pop_size}] ", end='', flush=True)
-        
-        config = {
-            'grid_size': 20,
-            'initial_pop_size': pop_size,
-            'generations': 150,
-            'mutation_rate': 0.05,
-            'barrier_type': 'vertical',
-        }
-        
-        populations, env, barriers, collection = run_simulation(config)
-        results[pop_size] = (populations, env, barriers, collection)
+        results[pop_size] = result
         print("✓")
     
     # Wizualizacja
@@ -0,0 +1,368 @@
+"""
+Dekompozycja przestrzenna symulacji na procesy (bardzo duże siatki).
+
+Siatka dzielona jest na pionowe pasy kolumn (kafelki), a każdy kafelek
+należy do jednego procesu roboczego, który przechowuje jego osobników we
+współrzędnych lokalnych. W każdej generacji proces wykonuje migrację,
+odkłada osobników opuszczających kafelek do bufora w pamięci współdzielonej
+(osobno dla lewej i prawej krawędzi), po synchronizacji odbiera migrantów
+od sąsiadów, a rozród, mutacje i regulację liczebności wykonuje lokalnie
+(local_step_arrays) - wszystkie te etapy działają w obrębie komórki.
+Statystyki kafelków (liczebność, częstości alleli, suma dopasowania)
+łączone są na końcu w serie jak w run_simulation.
+
+Pełne kolumny barier są naturalnymi granicami kafelków (nikt ich nie
+przekracza). Każdy kafelek ma własny generator losowości
+(SeedSequence(seed).spawn), więc wynik jest powtarzalny dla danego ziarna
+i liczby kafelków, ale nie jest identyczny z silnikiem 'arrays'.
+"""
+
+import multiprocessing as mp
+import os
+import queue
+from dataclasses import dataclass
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from symulacja import (RUN_DEFAULTS, NUM_ALLELES, DiversityTracker, FitnessEvaluator,
+                       PopulationArrays, config_environment, config_to_dict,
+                       diversity_from_allele_counts, init_population_arrays, local_step_arrays,
+                       make_rng, migration_kernel, split_at_barrier)
+
+# Krawędzie kafelka w buforach migrantów
+LEFT, RIGHT = 0, 1
+
+# Co ile sekund proces główny sprawdza, czy procesy robocze żyją
+RESULT_POLL_SECONDS = 1.0
+
+
+def tile_bounds(width: int, tiles: int, barrier: np.ndarray = None) -> np.ndarray:
+    """
+    Granice kafelków: tiles + 1 rosnących numerów kolumn od 0 do width.
+
+    Siatka dzielona jest po równo, a granica najbliższa pełnej kolumnie
+    bariery przesuwana jest na tę kolumnę (kafelki po jej obu stronach
+    nie wymieniają migrantów).
+    """
+    tiles = max(1, min(tiles, width))
+    bounds = np.linspace(0, width, tiles + 1).round().astype(np.int64)
+    if barrier is not None and tiles > 1:
+        for column in np.flatnonzero(np.asarray(barrier).all(axis=0)):
+            nearest = 1 + int(np.argmin(np.abs(bounds[1:-1] - column)))
+            if bounds[nearest - 1] < column < bounds[nearest + 1]:
+                bounds[nearest] = column
+    return bounds
+
+
+def migrant_dtype(genome_length: int) -> np.dtype:
+    """Rekord migranta w buforze (współrzędne globalne)"""
+    return np.dtype([('x', np.int32), ('y', np.int32), ('birth_time', np.int32),
+                     ('genotype', np.uint8, (genome_length,))])
+
+
+class MigrantExchange:
+    """
+    Bufory migrantów w pamięci współdzielonej.
+
+    Blok główny (tworzony przez proces nadrzędny) zawiera dla każdego
+    kafelka i krawędzi (LEFT/RIGHT) licznik i pojemność bufora. Rekordy
+    migrant_dtype leżą w osobnych blokach tworzonych przez kafelek wysyłający:
+    gdy migrantów jest więcej niż pojemność, send zastępuje blok co najmniej
+    dwa razy większym, a receive podłącza się do nowego bloku po zmianie
+    pojemności. Kafelek zapisuje tylko własne bufory (send), a czyta bufory
+    sąsiadów skierowane do niego (receive); zapis i odczyt rozdziela bariera
+    synchronizacji procesów.
+
+    Args:
+        tiles: liczba kafelków
+        capacity: początkowa liczba migrantów przez jedną krawędź w generacji
+        genome_length: długość genotypu
+        name: nazwa istniejącego bloku (proces roboczy); None tworzy nowy blok
+    """
+    def __init__(self, tiles: int, capacity: int, genome_length: int, name: str = None):
+        self.tiles = tiles
+        self.capacity = capacity
+        self.genome_length = genome_length
+        self.dtype = migrant_dtype(genome_length)
+        self.owner = name is None
+        size = 2 * tiles * 2 * np.dtype(np.int64).itemsize
+        self.shm = shared_memory.SharedMemory(name=name, create=self.owner, size=size if self.owner else 0)
+        table = np.frombuffer(self.shm.buf, dtype=np.int64, count=2 * tiles * 2).reshape(2, tiles, 2)
+        self.counts, self.capacities = table[0], table[1]
+        if self.owner:
+            self.counts[:] = 0
+            self.capacities[:] = capacity
+        # (kafelek, krawędź) -> (pojemność, blok, rekordy, czy blok utworzony w tym procesie)
+        self._blocks = {}
+
+    def spec(self) -> tuple:
+        """Argumenty do podłączenia się do bufora w innym procesie (attach)"""
+        return (self.tiles, self.capacity, self.genome_length, self.shm.name)
+
+    @classmethod
+    def attach(cls, spec: tuple) -> 'MigrantExchange':
+        return cls(*spec)
+
+    def _records(self, tile: int, side: int, create: bool) -> np.ndarray:
+        """Rekordy bufora (tile, side) o pojemności z bloku głównego (podłącza lub tworzy blok)"""
+        capacity = int(self.capacities[tile, side])
+        if (tile, side) in self._blocks:
+            if self._blocks[(tile, side)][0] == capacity:
+                return self._blocks[(tile, side)][2]
+            self._release((tile, side))
+        name = f"{self.shm.name}_{tile}_{side}_{capacity}"
+        shm = shared_memory.SharedMemory(name=name, create=create,
+                                         size=max(capacity, 1) * self.dtype.itemsize if create else 0)
+        records = np.frombuffer(shm.buf, dtype=self.dtype, count=capacity)
+        self._blocks[(tile, side)] = (capacity, shm, records, create)
+        return records
+
+    def _release(self, key: tuple):
+        _, shm, records, created = self._blocks.pop(key)
+        del records
+        shm.close()
+        if created:
+            shm.unlink()
+
+    def send(self, tile: int, side: int, emigrants: PopulationArrays, x_offset: int = 0):
+        """Zapisuje osobników opuszczających kafelek przez krawędź side"""
+        n = len(emigrants)
+        if n > self.capacities[tile, side]:
+            self.capacities[tile, side] = max(n, 2 * int(self.capacities[tile, side]))
+        out = self._records(tile, side, create=True)[:n]
+        out['x'] = emigrants.x + x_offset
+        out['y'] = emigrants.y
+        out['birth_time'] = emigrants.birth_time
+        out['genotype'] = emigrants.genotypes
+        self.counts[tile, side] = n
+
+    def receive(self, tile: int, x_offset: int = 0) -> PopulationArrays:
+        """Migranci wysłani do kafelka przez lewego i prawego sąsiada (kopia)"""
+        parts = [np.zeros(0, dtype=self.dtype)]
+        for neighbour, side in ((tile - 1, RIGHT), (tile + 1, LEFT)):
+            if 0 <= neighbour < self.tiles and self.counts[neighbour, side]:
+                records = self._records(neighbour, side, create=False)
+                parts.append(records[:self.counts[neighbour, side]])
+        records = np.concatenate(parts)
+        return PopulationArrays(x=records['x'] - np.int32(x_offset), y=records['y'].copy(),
+                                genotypes=np.ascontiguousarray(records['genotype']),
+                                birth_time=records['birth_time'].copy())
+
+    def close(self):
+        """Zamyka bloki (twórca bloku dodatkowo go usuwa)"""
+        for key in list(self._blocks):
+            self._release(key)
+        del self.counts, self.capacities
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+@dataclass
+class TileTask:
+    """Kafelek przekazywany procesowi roboczemu"""
+    tile: int
+    x0: int                         # pierwsza kolumna kafelka
+    x1: int                         # kolumna za ostatnią kolumną kafelka
+    population: PopulationArrays    # osobniki kafelka (współrzędne lokalne)
+    env: np.ndarray                 # env[:, x0:x1] (None przy wspólnym środowisku)
+    barrier: np.ndarray             # barrier z kolumnami sąsiadów (halo)
+    halo_left: int                  # 1, jeśli barrier zawiera kolumnę x0 - 1
+    halo_right: int                 # 1, jeśli barrier zawiera kolumnę x1
+    seed: np.random.SeedSequence
+    landscape: object = None        # wspólne środowisko (env_registry.SharedEnvironment)
+
+    def arrays(self) -> tuple:
+        """(env, barrier) kafelka; przy wspólnym środowisku widoki bez kopiowania"""
+        if self.landscape is None:
+            return self.env, self.barrier
+        env, barrier = self.landscape.arrays()
+        return (env[:, self.x0:self.x1],
+                barrier[:, self.x0 - self.halo_left:self.x1 + self.halo_right])
+
+
+def make_tile_tasks(population: PopulationArrays, env: np.ndarray, barrier: np.ndarray,
+                    bounds: np.ndarray, seed, landscape=None) -> list:
+    """
+    Dzieli populację, środowisko i bariery na kafelki o granicach bounds.
+    Ze wspólnym środowiskiem (landscape) kafelki nie dostają kopii env i barrier.
+    """
+    width = env.shape[1]
+    seeds = np.random.SeedSequence(seed).spawn(len(bounds) - 1)
+    tasks = []
+    for tile, (x0, x1) in enumerate(zip(bounds[:-1], bounds[1:])):
+        x0, x1 = int(x0), int(x1)
+        halo_left = 1 if x0 > 0 else 0
+        halo_right = 1 if x1 < width else 0
+        members = population.take((population.x >= x0) & (population.x < x1))
+        members.x = members.x - np.int32(x0)
+        shared = landscape is not None
+        tasks.append(TileTask(tile=tile, x0=x0, x1=x1, population=members,
+                              env=None if shared else env[:, x0:x1].copy(),
+                              barrier=None if shared else barrier[:, x0 - halo_left:x1 + halo_right].copy(),
+                              halo_left=halo_left, halo_right=halo_right, seed=seeds[tile],
+                              landscape=landscape))
+    return tasks
+
+
+def simulate_tile(task: TileTask, params: dict, exchange: MigrantExchange, sync) -> tuple:
+    """
+    Pętla generacji jednego kafelka.
+
+    Returns:
+        tuple: (populacja kafelka we współrzędnych globalnych, statystyki generacji)
+    """
+    rng = np.random.default_rng(task.seed)
+    genome_length = task.population.genotypes.shape[1]
+    generations = params['generations']
+    width = task.x1 - task.x0
+    population = task.population
+    env, barrier = task.arrays()
+    fitness = FitnessEvaluator(genome_length, params['fitness'])
+    tracker = DiversityTracker(genome_length)
+    tracker.add(population.genotypes)
+    stats = {'total_population': np.zeros(generations, dtype=np.int64),
+             'allele_counts': np.zeros((generations, genome_length, NUM_ALLELES), dtype=np.int64),
+             'fitness_sum': np.zeros(generations),
+             'fitness_count': np.zeros(generations, dtype=np.int64)}
+
+    for gen in range(generations):
+        # 1. Migracja w ramce z kolumnami sąsiadów; opuszczający kafelek do buforów
+        x = population.x + np.int32(task.halo_left)
+        migration_kernel(x, population.y, barrier, params['migration_rate'], rng)
+        population.x = x - np.int32(task.halo_left)
+        left, right = population.x < 0, population.x >= width
+        exchange.send(task.tile, LEFT, population.take(left), task.x0)
+        exchange.send(task.tile, RIGHT, population.take(right), task.x0)
+        staying = ~(left | right)
+        tracker.remove(population.genotypes[~staying])
+        population = population.take(staying)
+        sync.wait()
+
+        # 2. Odbiór migrantów od sąsiadów (bufory wolne do zapisu po drugiej barierze)
+        immigrants = exchange.receive(task.tile, task.x0)
+        sync.wait()
+        tracker.add(immigrants.genotypes)
+        population = population.concat(immigrants)
+
+        # 3. Rozród, mutacje i regulacja liczebności w obrębie kafelka
+        population = local_step_arrays(population, env, gen,
+                                       p_base_repro=params['reproduction_rate'],
+                                       p_mut=params['mutation_rate'],
+                                       max_per_cell=params['max_per_cell'],
+                                       tracker=tracker, rng=rng, fitness=fitness)
+        stats['total_population'][gen] = len(population)
+        stats['allele_counts'][gen] = tracker.counts
+        stats['fitness_sum'][gen] = fitness.last.sum()
+        stats['fitness_count'][gen] = len(fitness.last)
+
+    population.x = population.x + np.int32(task.x0)
+    return population, stats
+
+
+def run_tile(task: TileTask, params: dict, exchange_spec: tuple, sync, results):
+    """Proces roboczy: symuluje kafelek i odsyła wynik (lub wyjątek) przez results"""
+    exchange = MigrantExchange.attach(exchange_spec)
+    try:
+        results.put((task.tile, simulate_tile(task, params, exchange, sync)))
+    except BaseException as error:
+        # Pozostałe kafelki czekające na barierze dostają BrokenBarrierError
+        sync.abort()
+        results.put((task.tile, error))
+    finally:
+        exchange.close()
+
+
+def collect_tile_results(processes: list, results) -> dict:
+    """Odbiera wyniki wszystkich kafelków; błąd kafelka zgłaszany jest jako RuntimeError"""
+    outcomes = {}
+    while len(outcomes) < len(processes):
+        try:
+            tile, outcome = results.get(timeout=RESULT_POLL_SECONDS)
+        except queue.Empty:
+            crashed = [p for p in processes if p.exitcode not in (None, 0)]
+            if crashed:
+                raise RuntimeError(f"Proces kafelka zakończył się błędem (kod {crashed[0].exitcode})")
+            continue
+        outcomes[tile] = outcome
+    for tile in sorted(outcomes):
+        if isinstance(outcomes[tile], BaseException):
+            raise RuntimeError(f"Błąd symulacji kafelka {tile}") from outcomes[tile]
+    return outcomes
+
+
+def merge_tile_stats(stats: list) -> dict:
+    """Łączy statystyki kafelków w serie 'collection' jak w run_simulation"""
+    total = sum(s['total_population'] for s in stats)
+    counts = sum(s['allele_counts'] for s in stats)
+    fitness_sum = sum(s['fitness_sum'] for s in stats)
+    fitness_count = sum(s['fitness_count'] for s in stats)
+    fitness = np.divide(fitness_sum, fitness_count, out=np.zeros(len(total)), where=fitness_count > 0)
+    return {'total_population': total.tolist(),
+            'genetic_diversity': [diversity_from_allele_counts(c, n) for c, n in zip(counts, total)],
+            'fitness': fitness.tolist(),
+            'num_populations': []}
+
+
+def run_simulation_tiled(config=None, tiles: int = None):
+    """
+    Uruchamia symulację z siatką podzieloną na kafelki w osobnych procesach.
+
+    Środowisko i populacja początkowa powstają jak w run_simulation (silnik
+    'arrays'); kolejne generacje liczone są równolegle w kafelkach.
+
+    Args:
+        config: jak w run_simulation (klucze snapshot/checkpoint/cache są pomijane);
+            klucz 'tiles' - liczba kafelków, gdy argument tiles nie jest podany;
+            ze wspólnym środowiskiem ('landscape') procesy czytają env i barrier
+            z pamięci współdzielonej zamiast dostawać ich kopie
+        tiles: liczba kafelków = procesów (None = liczba rdzeni)
+
+    Returns:
+        tuple: (populations, environment, barriers, collection) jak w run_simulation
+    """
+    config = dict(RUN_DEFAULTS, **config_to_dict(config))
+    tiles = tiles or config.get('tiles') or os.cpu_count() or 1
+    grid_size = config['grid_size']
+    genome_length = config['genome_length']
+
+    rng = make_rng(config['seed'])
+    environment, barriers = config_environment(config, rng)
+    population = init_population_arrays(config['initial_pop_size'], grid_size, grid_size,
+                                        genome_length, rng=rng)
+    bounds = tile_bounds(grid_size, tiles, barriers)
+    tasks = make_tile_tasks(population, environment, barriers, bounds, config['seed'],
+                            config.get('landscape'))
+
+    # Przez krawędź przechodzą co najwyżej osobniki jej skrajnej kolumny (po regulacji
+    # liczebności najwyżej grid_size * max_per_cell) i nie więcej niż cała populacja;
+    # bufory rosną w send, jeśli populacja przekroczy początkową pojemność
+    capacity = max(1, min(grid_size * config['max_per_cell'], len(population)))
+    exchange = MigrantExchange(len(tasks), capacity, genome_length)
+    params = {name: config[name] for name in ('generations', 'migration_rate', 'reproduction_rate',
+                                              'mutation_rate', 'max_per_cell', 'fitness')}
+
+    context = mp.get_context()
+    sync = context.Barrier(len(tasks))
+    results = context.Queue()
+    processes = [context.Process(target=run_tile, args=(task, params, exchange.spec(), sync, results))
+                 for task in tasks]
+    try:
+        for process in processes:
+            process.start()
+        outcomes = collect_tile_results(processes, results)
+    finally:
+        for process in processes:
+            if process.is_alive() and process.exitcode is None:
+                process.join(timeout=RESULT_POLL_SECONDS)
+            if process.is_alive():
+                process.terminate()
+        exchange.close()
+
+    population = PopulationArrays.empty(genome_length)
+    for tile in range(len(tasks)):
+        population = population.concat(outcomes[tile][0])
+    collection = merge_tile_stats([outcomes[tile][1] for tile in range(len(tasks))])
+    populations = split_at_barrier(population, barriers, config['barrier_type'])
+    return populations, environment, barriers, collection
@@ -0,0 +1,152 @@
+"""
+Zespoły powtórzeń (ensembles) jednej konfiguracji.
+
+Uruchamia K niezależnych powtórzeń symulacji (w jednym procesie, na puli
+procesów - patrz sweep.run_sweep - lub wszystkie naraz w jednej populacji,
+patrz symulacja.run_simulation_batched) i składa serie 'total_population' oraz
+'genetic_diversity' w tablice (K, generacje), z których liczone są średnie,
+odchylenia standardowe i przedziały ufności.
+"""
+
+from dataclasses import dataclass
+from typing import Callable, Dict, List
+
+import numpy as np
+
+from symulacja import analyze_genetic_divergence, config_to_dict, run_simulation_batched
+from sweep import expand_jobs, run_jobs, with_options
+
+# Serie z 'collection' składane w tablice (K, generacje)
+ENSEMBLE_SERIES = ('total_population', 'genetic_diversity')
+
+
+@dataclass
+class EnsembleResult:
+    """Wyniki K powtórzeń jednej konfiguracji"""
+    config: dict
+    seeds: np.ndarray                # (K,) ziarna powtórzeń
+    series: Dict[str, np.ndarray]    # nazwa serii -> (K, generacje)
+    divergence: np.ndarray           # (K,) analyze_genetic_divergence
+    num_populations: np.ndarray      # (K,) liczba populacji po stronach bariery
+
+    @property
+    def replicates(self) -> int:
+        return len(self.seeds)
+
+    def mean(self, name: str) -> np.ndarray:
+        """Średnia serii po powtórzeniach"""
+        return self.series[name].mean(axis=0)
+
+    def std(self, name: str) -> np.ndarray:
+        """Odchylenie standardowe serii po powtórzeniach"""
+        return self.series[name].std(axis=0, ddof=1) if self.replicates > 1 else np.zeros_like(self.mean(name))
+
+    def confidence_band(self, name: str, level: float = 0.95):
+        """
+        Przedział ufności dla średniej (rozkład t-Studenta).
+
+        Returns:
+            tuple: (dolna granica, górna granica) - tablice długości generacji
+        """
+        mean = self.mean(name)
+        if self.replicates < 2:
+            return mean, mean
+        half_width = _t_half_width(self.std(name), self.replicates, level)
+        return mean - half_width, mean + half_width
+
+    def percentile_band(self, name: str, low: float = 2.5, high: float = 97.5):
+        """Pasmo percentyli trajektorii (rozrzut pojedynczych powtórzeń)"""
+        return tuple(np.percentile(self.series[name], [low, high], axis=0))
+
+    def summary(self, level: float = 0.95) -> dict:
+        """Podsumowanie wartości końcowych i divergencji"""
+        result = {'replicates': self.replicates}
+        for name in self.series:
+            final = self.series[name][:, -1]
+            low, high = self.confidence_band(name, level)
+            result[name] = {'mean': float(final.mean()),
+                            'std': float(final.std(ddof=1)) if self.replicates > 1 else 0.0,
+                            'ci': (float(low[-1]), float(high[-1]))}
+        ci = _mean_confidence_interval(self.divergence, level)
+        result['divergence'] = {'mean': float(self.divergence.mean()),
+                                'std': float(self.divergence.std(ddof=1)) if self.replicates > 1 else 0.0,
+                                'ci': ci}
+        return result
+
+
+def _t_half_width(std, k: int, level: float):
+    """Połowa szerokości przedziału ufności dla średniej z k powtórzeń"""
+    from scipy import stats
+    return stats.t.ppf(0.5 + level / 2, k - 1) * std / np.sqrt(k)
+
+
+def _mean_confidence_interval(values: np.ndarray, level: float):
+    """Przedział ufności dla średniej wektora wartości"""
+    mean = float(values.mean())
+    if len(values) < 2:
+        return mean, mean
+    half_width = float(_t_half_width(values.std(ddof=1), len(values), level))
+    return mean - half_width, mean + half_width
+
+
+def aggregate_results(config, seeds, results) -> EnsembleResult:
+    """Składa wyniki run_simulation z K powtórzeń w EnsembleResult"""
+    series = {name: np.array([collection[name] for _, _, _, collection in results], dtype=float)
+              for name in ENSEMBLE_SERIES}
+    divergence = np.array([analyze_genetic_divergence(populations) for populations, _, _, _ in results])
+    num_populations = np.array([len(populations) for populations, _, _, _ in results])
+    return EnsembleResult(config=config_to_dict(config), seeds=np.asarray(seeds),
+                          series=series, divergence=divergence,
+                          num_populations=num_populations)
+
+
+def run_batched_jobs(jobs, replicates: int, progress: Callable = None):
+    """Wykonuje zadania z expand_jobs po K powtórzeń konfiguracji w jednej populacji"""
+    results = []
+    for start in range(0, len(jobs), replicates):
+        chunk = jobs[start:start + replicates]
+        results.extend(run_simulation_batched(chunk[0].config, seeds=[job.seed for job in chunk]))
+        if progress is not None:
+            for job in chunk:
+                progress(job.index + 1, len(jobs), job)
+    return results
+
+
+def run_ensembles(configs, replicates: int = 10, workers: int = 1,
+                  base_seed: int = None, progress: Callable = None,
+                  batched: bool = False, cache=None,
+                  export_path: str = None) -> List[EnsembleResult]:
+    """
+    Uruchamia po K powtórzeń każdej konfiguracji jednym przeglądem parametrów.
+
+    Args:
+        configs: lista konfiguracji (słowniki lub SimulationConfig)
+        replicates: liczba powtórzeń K
+        workers: 1 = wszystkie powtórzenia w bieżącym procesie, więcej = pula procesów
+        base_seed: ziarno bazowe (jak w run_sweep)
+        progress: funkcja progress(done, total, job)
+        batched: True = K powtórzeń konfiguracji w jednej populacji
+                 (run_simulation_batched, bez puli procesów; szybsze dla małych siatek)
+        cache: pamięć podręczna wyników (jak w run_sweep)
+        export_path: katalog zbioru danych (jak w run_sweep; bez trybu batched)
+    """
+    if batched and export_path is not None:
+        raise ValueError("Eksport wyników (export_path) nie obsługuje trybu batched")
+    jobs = expand_jobs(with_options(configs, cache=cache, export_path=export_path), replicates, base_seed)
+    if batched:
+        results = run_batched_jobs(jobs, replicates, progress)
+    else:
+        results = run_jobs(jobs, workers, progress)
+    ensembles = []
+    for config_index, config in enumerate(configs):
+        chunk = slice(config_index * replicates, (config_index + 1) * replicates)
+        ensembles.append(aggregate_results(config, [job.seed for job in jobs[chunk]], results[chunk]))
+    return ensembles
+
+
+def run_ensemble(config, replicates: int = 10, workers: int = 1,
+                 base_seed: int = None, progress: Callable = None,
+                 batched: bool = False, cache=None, export_path: str = None) -> EnsembleResult:
+    """Uruchamia K powtórzeń jednej konfiguracji"""
+    return run_ensembles([config], replicates, workers, base_seed, progress, batched, cache,
+                         export_path)[0]
@@ -0,0 +1,158 @@
+"""
+Wspólne środowisko (env, bariery) dla procesów roboczych.
+
+EnvironmentRegistry publikuje tablice env i barrier raz, w bloku
+multiprocessing.shared_memory, i zwraca lekki uchwyt SharedEnvironment.
+Uchwyt przekazywany jest w konfiguracji (klucz 'landscape') zamiast tablic:
+marynowany jest tylko nazwami bloków, a proces roboczy podłącza się do nich
+raz i dostaje widoki tylko do odczytu, bez kopiowania.
+
+Bloki usuwane są przy zamknięciu rejestru (close, koniec bloku with lub
+usunięcie obiektu rejestru), a najpóźniej przy zakończeniu procesu, który je
+utworzył - uchwyty są ważne tylko tak długo, jak istnieje rejestr.
+"""
+
+import atexit
+import hashlib
+import weakref
+from dataclasses import dataclass
+from multiprocessing import shared_memory
+
+import numpy as np
+
+# Bloki podłączone w bieżącym procesie: nazwa -> (SharedMemory, widok tylko do odczytu)
+_ATTACHED = {}
+# Bloki, których nie można było zamknąć, bo istnieją jeszcze ich widoki
+_LINGERING = []
+
+
+@dataclass(frozen=True)
+class SharedArraySpec:
+    """Opis tablicy w bloku pamięci współdzielonej"""
+    name: str
+    shape: tuple
+    dtype: str
+
+
+def _attach(spec: SharedArraySpec) -> np.ndarray:
+    """Widok tablicy spec (tylko do odczytu); blok podłączany raz na proces"""
+    if spec.name not in _ATTACHED:
+        try:
+            shm = shared_memory.SharedMemory(name=spec.name)
+        except FileNotFoundError:
+            raise RuntimeError(f"Środowisko {spec.name} nie jest już opublikowane "
+                               f"(EnvironmentRegistry zamknięty)") from None
+        _ATTACHED[spec.name] = (shm, _readonly_view(shm, spec))
+    return _ATTACHED[spec.name][1]
+
+
+def _shared_array(shm: shared_memory.SharedMemory, shape: tuple, dtype) -> np.ndarray:
+    """
+    Tablica na bloku shm. np.frombuffer (w odróżnieniu od np.ndarray(buffer=...))
+    trzyma eksport bufora, więc blok nie da się zamknąć, dopóki istnieje widok.
+    """
+    dtype = np.dtype(dtype)
+    return np.frombuffer(shm.buf, dtype=dtype, count=int(np.prod(shape))).reshape(shape)
+
+
+def _readonly_view(shm: shared_memory.SharedMemory, spec: SharedArraySpec) -> np.ndarray:
+    view = _shared_array(shm, spec.shape, spec.dtype)
+    view.flags.writeable = False
+    return view
+
+
+def _release(shm: shared_memory.SharedMemory):
+    """Zamyka blok; z istniejącymi widokami mapowanie zostaje do ich zwolnienia"""
+    try:
+        shm.close()
+    except BufferError:
+        _LINGERING.append(shm)
+
+
+@atexit.register
+def _detach_all():
+    shms = [shm for shm, _ in _ATTACHED.values()] + _LINGERING
+    _ATTACHED.clear()
+    _LINGERING.clear()
+    for shm in shms:
+        _release(shm)
+
+
+@dataclass(frozen=True)
+class SharedEnvironment:
+    """
+    Uchwyt środowiska opublikowanego przez EnvironmentRegistry.
+
+    fingerprint (SHA-256 zawartości env i barrier) identyfikuje środowisko
+    w kluczu pamięci podręcznej wyników niezależnie od nazw bloków.
+    """
+    env: SharedArraySpec
+    barrier: SharedArraySpec
+    fingerprint: str
+
+    def arrays(self) -> tuple:
+        """(env, barrier) jako widoki tylko do odczytu w bieżącym procesie"""
+        return _attach(self.env), _attach(self.barrier)
+
+    @property
+    def shape(self) -> tuple:
+        return self.env.shape
+
+
+def _unlink_blocks(blocks: list):
+    """Zamyka i usuwa bloki rejestru (także przy zakończeniu procesu)"""
+    for shm in blocks:
+        _ATTACHED.pop(shm.name, None)
+        _release(shm)
+        try:
+            shm.unlink()
+        except FileNotFoundError:
+            pass
+    blocks.clear()
+
+
+class EnvironmentRegistry:
+    """
+    Publikuje środowiska w pamięci współdzielonej na czas przeglądu parametrów.
+
+    Przykład:
+        with EnvironmentRegistry() as registry:
+            landscape = registry.publish(env, barrier)
+            run_sweep([dict(config, landscape=landscape) for config in configs])
+    """
+    def __init__(self):
+        self._blocks = []
+        self._finalizer = weakref.finalize(self, _unlink_blocks, self._blocks)
+
+    def _share(self, array: np.ndarray) -> SharedArraySpec:
+        array = np.ascontiguousarray(array)
+        shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        self._blocks.append(shm)
+        spec = SharedArraySpec(name=shm.name, shape=array.shape, dtype=array.dtype.str)
+        _shared_array(shm, array.shape, array.dtype)[...] = array
+        _ATTACHED[shm.name] = (shm, _readonly_view(shm, spec))
+        return spec
+
+    def publish(self, env: np.ndarray, barrier: np.ndarray) -> SharedEnvironment:
+        """Kopiuje env i barrier do pamięci współdzielonej (jeden raz)"""
+        if barrier is None:
+            barrier = np.zeros(np.shape(env), dtype=bool)
+        if np.shape(env) != np.shape(barrier):
+            raise ValueError(f"Niezgodne wymiary środowiska {np.shape(env)} i barier {np.shape(barrier)}")
+        digest = hashlib.sha256()
+        for array in (env, barrier):
+            array = np.ascontiguousarray(array)
+            digest.update(f"{array.dtype.str}{array.shape}".encode())
+            digest.update(array.tobytes())
+        return SharedEnvironment(env=self._share(env), barrier=self._share(barrier),
+                                 fingerprint=digest.hexdigest())
+
+    def close(self):
+        """Usuwa wszystkie opublikowane bloki"""
+        self._finalizer()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
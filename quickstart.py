@@ -7,10 +7,16 @@ Ten skrypt pokazuje jak używać modułu symulacji w prosty sposób.
 """
 
 import os
-from symulacja import run_simulation, visualize_comparison, analyze_genetic_divergence, ensure_results_directory
+from symulacja import run_simulation, analyze_genetic_divergence, ensure_results_directory
+from wizualizacja import visualize_comparison
+from sweep import run_sweep
+from ensemble import run_ensembles
 import matplotlib.pyplot as plt
 import numpy as np
 
+# Liczba powtórzeń w przykładzie 4 (średnia i pasmo ufności zamiast jednego przebiegu)
+REPLICATES = 5
+
 
 def example_1_basic_simulation():
     """Przykład 1: Podstawowa symulacja z barierą"""
@@ -115,45 +121,51 @@ def example_4_mutation_sensitivity():
     mutation_rates = [0.01, 0.05, 0.10]
     results = {}
     
-    for mut_rate in mutation_rates:
-        print(f"\nUruchamianie z mutation_rate={mut_rate}...")
-        
-        config = {
-            'grid_size': 15,
-            'initial_pop_size': 100,
-            'generations': 80,
-            'mutation_rate': mut_rate,
-            'barrier_type': 'vertical',
-        }
-        
-        populations, env, barriers, collection = run_simulation(config)
-        results[mut_rate] = collection
+    configs = [{
+        'grid_size': 15,
+        'initial_pop_size': 100,
+        'generations': 80,
+        'mutation_rate': mut_rate,
+        'barrier_type': 'vertical',
+    } for mut_rate in mutation_rates]
+    
+    print(f"\nUruchamianie {REPLICATES} powtórzeń dla mutation_rate={mutation_rates}...")
+    ensembles = run_ensembles(configs, replicates=REPLICATES, batched=True)
+    
+    for mut_rate, ensemble in zip(mutation_rates, ensembles):
+        print(f"\nmutation_rate={mut_rate}")
+        results[mut_rate] = ensemble
         
-        final_div = collection['genetic_diversity'][-1]
-        print(f"  ✓ Końcowa różnorodność: {final_div:.4f}")
+        final_div = ensemble.mean('genetic_diversity')[-1]
+        print(f"  ✓ Końcowa różnorodność: {final_div:.4f} "
+              f"(± {ensemble.std('genetic_diversity')[-1]:.4f})")
     
-    # Porównanie na jednym wykresie
+    # Porównanie na jednym wykresie (średnia z pasmem 95% CI)
     fig, axes = plt.subplots(1, 3, figsize=(15, 4))
     fig.suptitle('Przykład 4: Wpływ tempa mutacji na dynamikę populacji', 
                  fontsize=14, fontweight='bold')
     
-    for idx, (mut_rate, collection) in enumerate(results.items()):
+    for idx, (mut_rate, ensemble) in enumerate(results.items()):
         ax = axes[idx]
         
-        generations = range(len(collection['total_population']))
+        generations = range(ensemble.series['total_population'].shape[1])
         
         # Wykres 1: Populacja
         ax_pop = ax
-        ax_pop.plot(generations, collection['total_population'], 'b-', linewidth=2, label='Populacja')
+        ax_pop.plot(generations, ensemble.mean('total_population'), 'b-', linewidth=2, label='Populacja')
+        ax_pop.fill_between(generations, *ensemble.confidence_band('total_population'),
+                            color='b', alpha=0.2)
         ax_pop.set_xlabel('Generacja')
         ax_pop.set_ylabel('Liczba osobników', color='b')
         ax_pop.tick_params(axis='y', labelcolor='b')
-        ax_pop.set_title(f'Mutation Rate = {mut_rate}')
+        ax_pop.set_title(f'Mutation Rate = {mut_rate} ({ensemble.replicates} powtórzeń)')
         ax_pop.grid(True, alpha=0.3)
         
         # Wykres 2: Różnorodność (na drugiej osi Y)
         ax_div = ax_pop.twinx()
-        ax_div.plot(generations, collection['genetic_diversity'], 'r-', linewidth=2, label='Różnorodność')
+        ax_div.plot(generations, ensemble.mean('genetic_diversity'), 'r-', linewidth=2, label='Różnorodność')
+        ax_div.fill_between(generations, *ensemble.confidence_band('genetic_diversity'),
+                            color='r', alpha=0.2)
         ax_div.set_ylabel('Różnorodność genetyczna', color='r')
         ax_div.tick_params(axis='y', labelcolor='r')
     
@@ -165,10 +177,12 @@ def example_4_mutation_sensitivity():
     print("\n" + "="*60)
     print("PODSUMOWANIE")
     print("="*60)
-    for mut_rate, collection in results.items():
-        final_pop = collection['total_population'][-1]
-        final_div = collection['genetic_diversity'][-1]
-        print(f"Mutation {mut_rate:4.2f}: Population={final_pop:3d}, Diversity={final_div:.4f}")
+    for mut_rate, ensemble in results.items():
+        summary = ensemble.summary()
+        final_pop = summary['total_population']['mean']
+        final_div = summary['genetic_diversity']['mean']
+        print(f"Mutation {mut_rate:4.2f}: Population={final_pop:7.1f}, Diversity={final_div:.4f}, "
+              f"Divergence={summary['divergence']['mean']:.4f}")
 
 
 def example_5_population_size_impact():
@@ -180,18 +194,19 @@ def example_5_population_size_impact():
     pop_sizes = [50, 100, 200]
     results = {}
     
-    for pop_size in pop_sizes:
-        print(f"\nUruchamianie z initial_pop_size={pop_size}...")
-        
-        config = {
-            'grid_size': 15,
-            'initial_pop_size': pop_size,
-            'generations': 80,
-            'mutation_rate': 0.05,
-            'barrier_type': 'vertical',
-        }
-        
-        populations, env, barriers, collection = run_simulation(config)
+    configs = [{
+        'grid_size': 15,
+        'initial_pop_size': pop_size,
+        'generations': 80,
+        'mutation_rate': 0.05,
+        'barrier_type': 'vertical',
+    } for pop_size in pop_sizes]
+    
+    print(f"\nUruchamianie równolegle dla initial_pop_size={pop_sizes}...")
+    sweep_results = run_sweep(configs)
+    
+    for pop_size, (populations, env, barriers, collection) in zip(pop_sizes, sweep_results):
+        print(f"\ninitial_pop_size={pop_size}")
         results[pop_size] = collection
         
         final_div = collection['genetic_diversity'][-1]
@@ -0,0 +1,136 @@
+"""
+Dyskowa pamięć podręczna wyników symulacji.
+
+Wynik uruchomienia (serie z 'collection', końcowe populacje, środowisko)
+zapisywany jest jako plik .npz, którego nazwą jest skrót (SHA-256)
+kanonicznego zapisu konfiguracji razem z ziarnem i wersją silnika.
+Przy przekroczeniu limitu liczby wpisów lub rozmiaru usuwane są wpisy
+najdawniej używane (LRU według czasu modyfikacji pliku, odświeżanego
+przy każdym trafieniu). Wpisy zapisywane są atomowo, więc z jednego
+katalogu mogą korzystać równolegle procesy przeglądu parametrów.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+
+import numpy as np
+
+DEFAULT_CACHE_DIR = os.path.join('results', 'cache')
+DEFAULT_MAX_BYTES = 512 * 2**20
+DEFAULT_MAX_ENTRIES = 1000
+
+
+def _to_builtin(value):
+    """Zamiana typów NumPy na typy wbudowane (dla json.dumps)"""
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    return str(value)
+
+
+def canonical_json(value) -> str:
+    """Jednoznaczny zapis JSON (posortowane klucze, bez spacji)"""
+    return json.dumps(value, sort_keys=True, separators=(',', ':'), default=_to_builtin)
+
+
+def config_hash(config: dict, version) -> str:
+    """Klucz wpisu: skrót SHA-256 konfiguracji (z ziarnem) i wersji silnika"""
+    payload = canonical_json({'config': config, 'version': version})
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class ResultCache:
+    """
+    Katalog plików .npz z wynikami, ograniczony liczbą wpisów i rozmiarem.
+
+    Args:
+        path: katalog pamięci podręcznej
+        max_bytes: łączny rozmiar wpisów, powyżej którego usuwane są najstarsze
+        max_entries: największa liczba wpisów
+    """
+    def __init__(self, path: str = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES,
+                 max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        os.makedirs(path, exist_ok=True)
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.path, f"{key}.npz")
+
+    def __contains__(self, key: str) -> bool:
+        return os.path.exists(self._entry_path(key))
+
+    def __len__(self) -> int:
+        return len(self.entries())
+
+    def get(self, key: str):
+        """Tablice zapisanego wyniku (słownik) lub None, jeśli brak wpisu"""
+        entry_path = self._entry_path(key)
+        try:
+            with np.load(entry_path, allow_pickle=False) as data:
+                arrays = {name: data[name] for name in data.files}
+        except (OSError, ValueError):
+            return None
+        # Odświeżenie czasu użycia (kolejność LRU)
+        try:
+            os.utime(entry_path)
+        except OSError:
+            pass
+        return arrays
+
+    def put(self, key: str, arrays: dict):
+        """Zapisuje wynik (słownik tablic) i usuwa nadmiarowe wpisy"""
+        handle, tmp_path = tempfile.mkstemp(dir=self.path, suffix='.tmp')
+        with os.fdopen(handle, 'wb') as f:
+            np.savez(f, **arrays)
+        os.replace(tmp_path, self._entry_path(key))
+        self.evict()
+
+    def entries(self) -> list:
+        """Wpisy jako (ścieżka, rozmiar, czas użycia), od najdawniej używanego"""
+        entries = []
+        for name in os.listdir(self.path):
+            if not name.endswith('.npz'):
+                continue
+            entry_path = os.path.join(self.path, name)
+            try:
+                stat = os.stat(entry_path)
+            except OSError:
+                continue
+            entries.append((entry_path, stat.st_size, stat.st_mtime))
+        return sorted(entries, key=lambda entry: entry[2])
+
+    def evict(self):
+        """Usuwa najdawniej używane wpisy ponad limit liczby i rozmiaru"""
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        while entries and (len(entries) > self.max_entries or total > self.max_bytes):
+            entry_path, size, _ = entries.pop(0)
+            try:
+                os.remove(entry_path)
+            except OSError:
+                pass
+            total -= size
+
+    def clear(self):
+        """Usuwa wszystkie wpisy"""
+        for entry_path, _, _ in self.entries():
+            os.remove(entry_path)
+
+
+def open_result_cache(cache):
+    """
+    ResultCache z wartości klucza konfiguracji 'cache':
+    None/False - brak, True - DEFAULT_CACHE_DIR, str - katalog, ResultCache - bez zmian.
+    """
+    if cache is None or cache is False:
+        return None
+    if isinstance(cache, ResultCache):
+        return cache
+    if cache is True:
+        return ResultCache()
+    return ResultCache(cache)
@@ -6,11 +6,21 @@ Umożliwia łatwe testowanie różnych parametrów i scenariuszy.
 
 import sys
 import os
-sys.path.insert(0, '/home/andrzej/Studia/Modelowanie i symulacja systemów/projekt')
 
-from symulacja import run_simulation, analyze_genetic_divergence, visualize_comparison, ensure_results_directory
+from symulacja import analyze_genetic_divergence, ensure_results_directory, init_environment, make_rng
+from wizualizacja import visualize_comparison
+from sweep import run_sweep, print_progress
+from ensemble import run_ensembles
+from env_registry import EnvironmentRegistry
 import matplotlib.pyplot as plt
 
+# Liczba niezależnych powtórzeń każdej wartości parametru (eksperymenty 2 i 3)
+REPLICATES = 5
+# Stałe ziarno bazowe i pamięć podręczna wyników: ponowne uruchomienie
+# eksperymentu wczytuje gotowe wyniki zamiast liczyć je od nowa
+BASE_SEED = 2024
+RESULT_CACHE = os.path.join('results', 'cache')
+
 
 def ensure_results_dir():
     """Tworzy katalog results jeśli nie istnieje"""
@@ -39,8 +49,6 @@ def run_barrier_vs_no_barrier_comparison():
     print(f"  - Populacja początkowa: {config1['initial_pop_size']}")
     print(f"  - Generacji: {config1['generations']}")
     print(f"  - Bariera: pionowa na kolumnie {config1['barrier_position']}")
-    pop1, env1, bar1, col1 = run_simulation(config1)
-    print("  ✓ Zakończono")
     
     # Konfiguracja 2: BEZ BARIERY
     config2 = {
@@ -56,7 +64,11 @@ def run_barrier_vs_no_barrier_comparison():
     print(f"  - Populacja początkowa: {config2['initial_pop_size']}")
     print(f"  - Generacji: {config2['generations']}")
     print(f"  - Bariera: brak")
-    pop2, env2, bar2, col2 = run_simulation(config2)
+    
+    print("\nUruchamianie obu symulacji równolegle...")
+    (pop1, env1, bar1, col1), (pop2, env2, bar2, col2) = run_sweep([config1, config2],
+                                                                  base_seed=BASE_SEED, progress=print_progress,
+                                                                  cache=RESULT_CACHE)
     print("  ✓ Zakończono")
     
     # ANALIZA
@@ -98,38 +110,51 @@ def run_mutation_rate_experiment():
     divergences = []
     populations = []
     
-    for i, mut_rate in enumerate(mutation_rates, 1):
-        config = {
+    divergence_errors = []
+    
+    # Wszystkie szybkości mutacji na tym samym środowisku, publikowanym raz
+    # w pamięci współdzielonej dla procesów puli (bez kopii env/barrier na zadanie)
+    with EnvironmentRegistry() as registry:
+        landscape = registry.publish(*init_environment(10, 10, 'vertical', make_rng(BASE_SEED)))
+        configs = [{
             'grid_size': 10,
             'initial_pop_size': 80,
             'generations': 120,
             'mutation_rate': mut_rate,
             'barrier_type': 'vertical',
             'barrier_position': 5,
-        }
+            'landscape': landscape,
+        } for mut_rate in mutation_rates]
         
-        print(f"\n[{i}/{len(mutation_rates)}] Symulacja z mutation_rate={mut_rate}...")
-        pop, env, bar, col = run_simulation(config)
-        div = analyze_genetic_divergence(pop)
+        print(f"\nUruchamianie {len(configs)} x {REPLICATES} symulacji (mutation_rate={mutation_rates})...")
+        ensembles = run_ensembles(configs, replicates=REPLICATES, workers=os.cpu_count() or 1,
+                                  base_seed=BASE_SEED, progress=print_progress, cache=RESULT_CACHE)
+    
+    for i, (mut_rate, ensemble) in enumerate(zip(mutation_rates, ensembles), 1):
+        print(f"\n[{i}/{len(mutation_rates)}] Symulacja z mutation_rate={mut_rate} ({REPLICATES} powtórzeń)")
+        summary = ensemble.summary()['divergence']
+        div = summary['mean']
         
         divergences.append(div)
-        populations.append(len(pop))
+        divergence_errors.append(summary['ci'][1] - div)
+        populations.append(ensemble.num_populations.mean())
         
-        print(f"  - Divergencja: {div:.4f}")
-        print(f"  - Liczba populacji: {len(pop)}")
+        print(f"  - Divergencja: {div:.4f} ± {summary['std']:.4f}")
+        print(f"  - Liczba populacji (średnio): {ensemble.num_populations.mean():.1f}")
     
     print("\n" + "-"*70)
     print("WYNIKI EKSPERYMENTU 2")
     print("-"*70)
     for mut_rate, div, npop in zip(mutation_rates, divergences, populations):
-        print(f"  Mutacja {mut_rate:5.2f}: divergencja={div:.4f}, populacje={npop}")
+        print(f"  Mutacja {mut_rate:5.2f}: divergencja={div:.4f}, populacje={npop:.1f}")
     
     # Wizualizacja
     fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(12, 4))
     
-    ax1.plot(mutation_rates, divergences, 'o-', linewidth=2, markersize=8, color='#2ecc71')
+    ax1.errorbar(mutation_rates, divergences, yerr=divergence_errors, fmt='o-', linewidth=2,
+                 markersize=8, capsize=4, color='#2ecc71')
     ax1.set_xlabel('Szybkość mutacji', fontsize=11)
-    ax1.set_ylabel('Divergencja genetyczna', fontsize=11)
+    ax1.set_ylabel('Divergencja genetyczna (średnia ± 95% CI)', fontsize=11)
     ax1.set_title('Wpływ mutacji na divergencję', fontsize=12, fontweight='bold')
     ax1.grid(True, alpha=0.3)
     
@@ -154,38 +179,46 @@ def run_population_size_experiment():
     divergences = []
     populations = []
     
-    for i, pop_size in enumerate(pop_sizes, 1):
-        config = {
-            'grid_size': 10,
-            'initial_pop_size': pop_size,
-            'generations': 120,
-            'mutation_rate': 0.05,
-            'barrier_type': 'vertical',
-            'barrier_position': 5,
-        }
-        
-        print(f"\n[{i}/{len(pop_sizes)}] Symulacja z initial_pop_size={pop_size}...")
-        pop, env, bar, col = run_simulation(config)
-        div = analyze_genetic_divergence(pop)
+    configs = [{
+        'grid_size': 10,
+        'initial_pop_size': pop_size,
+        'generations': 120,
+        'mutation_rate': 0.05,
+        'barrier_type': 'vertical',
+        'barrier_position': 5,
+    } for pop_size in pop_sizes]
+    
+    divergence_errors = []
+    
+    print(f"\nUruchamianie {len(configs)} x {REPLICATES} symulacji (initial_pop_size={pop_sizes})...")
+    ensembles = run_ensembles(configs, replicates=REPLICATES, base_seed=BASE_SEED,
+                              progress=print_progress, batched=True, cache=RESULT_CACHE)
+    
+    for i, (pop_size, ensemble) in enumerate(zip(pop_sizes, ensembles), 1):
+        print(f"\n[{i}/{len(pop_sizes)}] Symulacja z initial_pop_size={pop_size} ({REPLICATES} powtórzeń)")
+        summary = ensemble.summary()['divergence']
+        div = summary['mean']
         
         divergences.append(div)
-        populations.append(len(pop))
+        divergence_errors.append(summary['ci'][1] - div)
+        populations.append(ensemble.num_populations.mean())
         
-        print(f"  - Divergencja: {div:.4f}")
-        print(f"  - Liczba populacji: {len(pop)}")
+        print(f"  - Divergencja: {div:.4f} ± {summary['std']:.4f}")
+        print(f"  - Liczba populacji (średnio): {ensemble.num_populations.mean():.1f}")
     
     print("\n" + "-"*70)
     print("WYNIKI EKSPERYMENTU 3")
     print("-"*70)
     for pop_size, div, npop in zip(pop_sizes, divergences, populations):
-        print(f"  Populacja {pop_size:3d}: divergencja={div:.4f}, populacje={npop}")
+        print(f"  Populacja {pop_size:3d}: divergencja={div:.4f}, populacje={npop:.1f}")
     
     # Wizualizacja
     fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(12, 4))
     
-    ax1.plot(pop_sizes, divergences, 'o-', linewidth=2, markersize=8, color='#e74c3c')
+    ax1.errorbar(pop_sizes, divergences, yerr=divergence_errors, fmt='o-', linewidth=2,
+                 markersize=8, capsize=4, color='#e74c3c')
     ax1.set_xlabel('Wielkość populacji początkowej', fontsize=11)
-    ax1.set_ylabel('Divergencja genetyczna', fontsize=11)
+    ax1.set_ylabel('Divergencja genetyczna (średnia ± 95% CI)', fontsize=11)
     ax1.set_title('Wpływ wielkości populacji na divergencję', fontsize=12, fontweight='bold')
     ax1.grid(True, alpha=0.3)
     
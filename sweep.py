@@ -0,0 +1,123 @@
+"""
+Równoległe przeglądy parametrów (parameter sweeps).
+
+Uruchamia listę konfiguracji (słowniki lub SimulationConfig), każdą w zadanej
+liczbie powtórzeń, na puli procesów. Każde uruchomienie dostaje własne ziarno
+losowości wyprowadzone z jednego ziarna bazowego, więc wyniki są powtarzalne
+niezależnie od liczby procesów i kolejności ich zakończenia.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import Callable, List
+
+import numpy as np
+
+from symulacja import run_simulation, config_to_dict
+
+
+@dataclass
+class SweepJob:
+    """Pojedyncze uruchomienie w przeglądzie parametrów"""
+    index: int          # pozycja w liście wyników
+    config_index: int   # numer konfiguracji
+    replicate: int      # numer powtórzenia
+    config: dict
+    seed: int
+
+
+def expand_jobs(configs, replicates: int = 1, base_seed: int = None) -> List[SweepJob]:
+    """
+    Rozwija konfiguracje i powtórzenia w listę zadań.
+
+    Kolejność: najpierw konfiguracje, w ich obrębie powtórzenia. Ziarna
+    zadań pochodzą z np.random.SeedSequence(base_seed).spawn(), więc są
+    od siebie niezależne; base_seed=None oznacza losowe ziarno bazowe.
+    Ziarno zadania zastępuje ewentualny klucz 'seed' w konfiguracji.
+    """
+    configs = [config_to_dict(config) for config in configs]
+    children = np.random.SeedSequence(base_seed).spawn(len(configs) * replicates)
+    jobs = []
+    for config_index, config in enumerate(configs):
+        for replicate in range(replicates):
+            index = config_index * replicates + replicate
+            seed = int(children[index].generate_state(1)[0])
+            jobs.append(SweepJob(index=index, config_index=config_index,
+                                 replicate=replicate, config=config, seed=seed))
+    return jobs
+
+
+def with_options(configs, **options) -> list:
+    """
+    Konfiguracje z dodanymi kluczami run_simulation (np. cache, export_path);
+    opcje o wartości None są pomijane.
+    """
+    options = {name: value for name, value in options.items() if value is not None}
+    if not options:
+        return list(configs)
+    return [dict(config_to_dict(config), **options) for config in configs]
+
+
+def run_job(job: SweepJob):
+    """Uruchamia jedno zadanie z własnym ziarnem (w procesie roboczym)"""
+    return run_simulation(dict(job.config, seed=job.seed))
+
+
+def print_progress(done: int, total: int, job: SweepJob):
+    """Domyślny raport postępu dla skryptów uruchomieniowych"""
+    print(f"  [{done}/{total}] konfiguracja {job.config_index + 1}, "
+          f"powtórzenie {job.replicate + 1} ✓", flush=True)
+
+
+def run_jobs(jobs: List[SweepJob], workers: int = None, progress: Callable = None):
+    """
+    Wykonuje gotową listę zadań (np. z expand_jobs) na puli procesów.
+
+    Returns:
+        list: wyniki run_simulation w kolejności job.index
+    """
+    results = [None] * len(jobs)
+    workers = workers or os.cpu_count() or 1
+
+    if workers == 1 or len(jobs) == 1:
+        for done, job in enumerate(jobs, 1):
+            results[job.index] = run_job(job)
+            if progress is not None:
+                progress(done, len(jobs), job)
+        return results
+
+    with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as executor:
+        futures = {executor.submit(run_job, job): job for job in jobs}
+        for done, future in enumerate(as_completed(futures), 1):
+            job = futures[future]
+            results[job.index] = future.result()
+            if progress is not None:
+                progress(done, len(jobs), job)
+
+    return results
+
+
+def run_sweep(configs, replicates: int = 1, workers: int = None,
+              base_seed: int = None, progress: Callable = None, cache=None,
+              export_path: str = None):
+    """
+    Uruchamia przegląd parametrów na puli procesów.
+
+    Args:
+        configs: lista konfiguracji (słowniki lub SimulationConfig)
+        replicates: liczba powtórzeń każdej konfiguracji
+        workers: liczba procesów (None = liczba rdzeni, 1 = bez puli)
+        base_seed: ziarno bazowe dla ziaren poszczególnych uruchomień
+        progress: funkcja progress(done, total, job) wołana po każdym zadaniu
+        cache: pamięć podręczna wyników (klucz 'cache' run_simulation: True,
+               ścieżka katalogu lub ResultCache); działa tylko ze stałym base_seed
+        export_path: katalog zbioru danych (klucz 'export_path' run_simulation);
+               kolejne przeglądy dopisują do niego swoje uruchomienia
+
+    Returns:
+        list: wyniki run_simulation (populations, environment, barriers, collection)
+              w kolejności zadań z expand_jobs
+    """
+    configs = with_options(configs, cache=cache, export_path=export_path)
+    return run_jobs(expand_jobs(configs, replicates, base_seed), workers, progress)
@@ -1,11 +1,11 @@
 import numpy as np
-import random
+import json
 import os
+import shutil
+import time
 from dataclasses import dataclass, field
 from typing import List, Dict, Tuple
-import matplotlib.pyplot as plt
-from matplotlib.patches import Rectangle
-from scipy.spatial.distance import pdist, squareform
+from result_cache import canonical_json, config_hash, open_result_cache
 import warnings
 warnings.filterwarnings('ignore')
 
@@ -39,6 +39,31 @@ class SimulationConfig:
         
         # Typy barier
         self.barrier_type = "vertical"  # "vertical", "horizontal", "none"
+        
+        # Ziarno generatora losowości (None = losowe)
+        self.seed = None
+        
+        # Funkcja dopasowania (nazwa z register_fitness_table)
+        self.fitness = 'distance'
+
+
+# =========================
+# Losowość
+# =========================
+
+def make_rng(seed=None) -> np.random.Generator:
+    """
+    Generator losowości dla jednego uruchomienia.
+    seed może być liczbą, np.random.SeedSequence, gotowym Generatorem lub None.
+    """
+    if isinstance(seed, np.random.Generator):
+        return seed
+    return np.random.default_rng(seed)
+
+
+def spawn_rngs(seed, n: int) -> List[np.random.Generator]:
+    """Niezależne generatory dla n powtórzeń (SeedSequence.spawn)."""
+    return [np.random.default_rng(child) for child in np.random.SeedSequence(seed).spawn(n)]
 
 
 # =========================
@@ -51,16 +76,25 @@ class Individual:
     y: int
     genotype: np.ndarray  # wektor cech genetycznych
     birth_time: int = 0
+    sum: int = field(default=None, repr=False, compare=False)  # suma genotypu (genotype_sum)
+
+    def genotype_sum(self) -> int:
+        """Suma genotypu (liczona przy pierwszym użyciu; po zmianie genotypu w miejscu ustaw sum = None)."""
+        if self.sum is None:
+            self.sum = int(self.genotype.sum())
+        return self.sum
 
 
 # =========================
 # Inicjalizacja środowiska
 # =========================
 
-def init_environment(height: int, width: int, barrier_type: str = "vertical"):
+def init_environment(height: int, width: int, barrier_type: str = "vertical",
+                     rng: np.random.Generator = None):
     """Tworzy heterogeniczne środowisko oraz bariery."""
+    rng = make_rng(rng)
     # Wartość środowiskowa jako liczba całkowita 0..2
-    env = np.random.randint(0, 3, size=(height, width))
+    env = rng.integers(0, 3, size=(height, width))
     
     # Tworzenie barier
     barrier = np.zeros((height, width), dtype=bool)
@@ -85,13 +119,15 @@ def init_environment(height: int, width: int, barrier_type: str = "vertical"):
 # =========================
 
 def init_population(num_individuals: int, height: int, width: int, 
-                   genome_length: int, initial_time: int = 0):
+                   genome_length: int, initial_time: int = 0,
+                   rng: np.random.Generator = None):
     """Losowo rozmieszcza osobniki i nadaje im losowe genotypy."""
+    rng = make_rng(rng)
     population = []
     for _ in range(num_individuals):
-        x = random.randrange(width)
-        y = random.randrange(height)
-        genotype = np.random.randint(0, 3, size=genome_length)
+        x = int(rng.integers(width))
+        y = int(rng.integers(height))
+        genotype = rng.integers(0, 3, size=genome_length)
         population.append(Individual(x=x, y=y, genotype=genotype, birth_time=initial_time))
     return population
 
@@ -125,12 +161,13 @@ def fitness(ind: Individual, env_value: int):
     return 1.0 / (1.0 + diff)
 
 
-def mutate(genotype: np.ndarray, p_mut: float):
+def mutate(genotype: np.ndarray, p_mut: float, rng: np.random.Generator = None):
     """Mutacje genotypu: losowa zmiana wybranych genów."""
+    rng = make_rng(rng)
     new_genotype = genotype.copy()
     for i in range(len(new_genotype)):
-        if random.random() < p_mut:
-            new_genotype[i] = random.randint(0, 2)
+        if rng.random() < p_mut:
+            new_genotype[i] = rng.integers(0, 3)
     return new_genotype
 
 
@@ -145,49 +182,751 @@ def can_move(x1, y1, x2, y2, barrier):
 
 def simulation_step(population: List[Individual], env: np.ndarray, 
                    barrier: np.ndarray, current_time: int,
-                   config: SimulationConfig):
-    """Jeden krok symulacji obejmujący migrację, rozród i selekcję."""
+                   config: SimulationConfig, rng: np.random.Generator = None):
+    """
+    Jeden krok symulacji obejmujący migrację, rozród i selekcję.
+    Etapy jak w silniku 'list': migration_kernel, reproduction_kernel
+    i capacity_kernel na tablicach zebranych z listy osobników.
+    """
     height, width = env.shape
+    rng = make_rng(rng)
+    if not population:
+        return population
     
-    # 1. Migracja
-    for ind in population:
-        if random.random() < config.p_migration:
-            neighbors = get_neighbors(ind.x, ind.y, width, height)
-            if neighbors:
-                new_x, new_y = random.choice(neighbors)
-                if can_move(ind.x, ind.y, new_x, new_y, barrier):
-                    ind.x, ind.y = new_x, new_y
+    # 1. Migracja (wsadowo dla całej populacji, patrz migration_kernel)
+    xs = np.fromiter((ind.x for ind in population), dtype=np.int32, count=len(population))
+    ys = np.fromiter((ind.y for ind in population), dtype=np.int32, count=len(population))
+    for i in migration_kernel(xs, ys, barrier, config.p_migration, rng):
+        population[i].x, population[i].y = int(xs[i]), int(ys[i])
     
-    # 2. Rozród + mutacje
-    offspring = []
-    for ind in population:
-        env_val = env[ind.y, ind.x]
-        fit = fitness(ind, env_val)
-        p_repro = config.p_base_repro * fit
-        
-        if random.random() < p_repro:
-            child_genotype = mutate(ind.genotype, config.p_mutation)
-            offspring.append(Individual(x=ind.x, y=ind.y, 
-                                       genotype=child_genotype, 
-                                       birth_time=current_time))
+    # 2. Rozród + mutacje (wsadowo, patrz reproduction_kernel)
+    genotypes = np.array([ind.genotype for ind in population])
+    parents, child_genotypes = reproduction_kernel(genotypes, env[ys, xs], config.p_base_repro,
+                                                   config.p_mutation, rng)
+    offspring = [Individual(x=population[i].x, y=population[i].y, genotype=genotype,
+                            birth_time=current_time)
+                 for i, genotype in zip(parents, child_genotypes)]
     
     # 3. Dodanie potomków
     population.extend(offspring)
     
-    # 4. Regulacja liczebności w komórkach
-    cell_map = {}
-    for ind in population:
-        cell_map.setdefault((ind.x, ind.y), []).append(ind)
-    
-    new_population = []
-    for cell, inds in cell_map.items():
-        if len(inds) <= config.max_per_cell:
-            new_population.extend(inds)
+    # 4. Regulacja liczebności w komórkach (patrz capacity_kernel);
+    #    potomkowie zajmują komórki swoich rodziców
+    keep = capacity_kernel(np.concatenate([xs, xs[parents]]), np.concatenate([ys, ys[parents]]),
+                           width, config.max_per_cell, rng)
+    return [population[i] for i in keep]
+
+
+# =========================
+# Populacja tablicowa (structure-of-arrays)
+# =========================
+
+@dataclass
+class PopulationArrays:
+    """
+    Populacja przechowywana jako ciągłe tablice zamiast listy Individual.
+
+    Każdy osobnik to jeden wiersz: współrzędne x, y i czas narodzin w
+    tablicach całkowitych oraz genotyp w macierzy (N, genome_length) typu uint8.
+    Sumy genotypów (sums) liczone są raz i przenoszone przez take/concat.
+    """
+    x: np.ndarray
+    y: np.ndarray
+    genotypes: np.ndarray
+    birth_time: np.ndarray
+    sums: np.ndarray = None
+
+    def __len__(self):
+        return len(self.x)
+
+    def genotype_sums(self) -> np.ndarray:
+        """Sumy wierszy genotypów (liczone przy pierwszym użyciu)."""
+        if self.sums is None:
+            self.sums = self.genotypes.sum(axis=1, dtype=np.int32)
+        return self.sums
+
+    @classmethod
+    def empty(cls, genome_length: int):
+        """Pusta populacja o zadanej długości genotypu."""
+        return cls(x=np.zeros(0, dtype=np.int32),
+                   y=np.zeros(0, dtype=np.int32),
+                   genotypes=np.zeros((0, genome_length), dtype=np.uint8),
+                   birth_time=np.zeros(0, dtype=np.int32))
+
+    @classmethod
+    def from_individuals(cls, population: List[Individual], genome_length: int = 8):
+        """Konwersja z listy obiektów Individual."""
+        if not population:
+            return cls.empty(genome_length)
+        return cls(x=np.array([ind.x for ind in population], dtype=np.int32),
+                   y=np.array([ind.y for ind in population], dtype=np.int32),
+                   genotypes=np.array([ind.genotype for ind in population], dtype=np.uint8),
+                   birth_time=np.array([ind.birth_time for ind in population], dtype=np.int32))
+
+    def to_individuals(self) -> List[Individual]:
+        """Konwersja do listy obiektów Individual (np. dla starego kodu analizy)."""
+        return [Individual(x=int(x), y=int(y), genotype=g.astype(int), birth_time=int(t))
+                for x, y, g, t in zip(self.x, self.y, self.genotypes, self.birth_time)]
+
+    def take(self, index) -> 'PopulationArrays':
+        """Podzbiór osobników wg maski logicznej lub tablicy indeksów."""
+        return PopulationArrays(x=self.x[index], y=self.y[index],
+                                genotypes=self.genotypes[index],
+                                birth_time=self.birth_time[index],
+                                sums=self.sums[index] if self.sums is not None else None)
+
+    def copy(self) -> 'PopulationArrays':
+        """Kopia niezależna od buforów źródła (np. widoków SimulationState)."""
+        return PopulationArrays(x=self.x.copy(), y=self.y.copy(), genotypes=self.genotypes.copy(),
+                                birth_time=self.birth_time.copy(),
+                                sums=self.sums.copy() if self.sums is not None else None)
+
+    def concat(self, other: 'PopulationArrays') -> 'PopulationArrays':
+        """Połączenie dwóch populacji (np. rodziców i potomków)."""
+        sums = None
+        if self.sums is not None or other.sums is not None:
+            sums = np.concatenate([self.genotype_sums(), other.genotype_sums()])
+        return PopulationArrays(x=np.concatenate([self.x, other.x]),
+                                y=np.concatenate([self.y, other.y]),
+                                genotypes=np.concatenate([self.genotypes, other.genotypes]),
+                                birth_time=np.concatenate([self.birth_time, other.birth_time]),
+                                sums=sums)
+
+
+def init_population_arrays(num_individuals: int, height: int, width: int,
+                           genome_length: int, initial_time: int = 0,
+                           rng: np.random.Generator = None) -> PopulationArrays:
+    """Odpowiednik init_population dla populacji tablicowej."""
+    rng = make_rng(rng)
+    return PopulationArrays(
+        x=rng.integers(0, width, size=num_individuals, dtype=np.int32),
+        y=rng.integers(0, height, size=num_individuals, dtype=np.int32),
+        genotypes=rng.integers(0, 3, size=(num_individuals, genome_length), dtype=np.uint8),
+        birth_time=np.full(num_individuals, initial_time, dtype=np.int32))
+
+
+def population_genotypes(population) -> np.ndarray:
+    """Macierz genotypów (N, L) dla listy Individual, PopulationArrays lub HaplotypePopulation."""
+    if isinstance(population, (PopulationArrays, HaplotypePopulation)):
+        return population.genotypes
+    return np.array([ind.genotype for ind in population])
+
+
+def population_positions(population) -> np.ndarray:
+    """Macierz współrzędnych (N, 2) [x, y] dla listy Individual, PopulationArrays lub HaplotypePopulation."""
+    if isinstance(population, (PopulationArrays, HaplotypePopulation)):
+        return np.column_stack([population.x, population.y])
+    return np.array([[ind.x, ind.y] for ind in population])
+
+
+# =========================
+# Tablice dopasowania
+# =========================
+
+# Wartości środowiska (init_environment losuje 0..2)
+NUM_ENV_VALUES = 3
+
+# Funkcje budujące tablice dopasowania: nazwa -> builder(genome_length)
+FITNESS_TABLE_BUILDERS = {}
+_FITNESS_TABLES = {}
+
+
+def register_fitness_table(name: str):
+    """
+    Dekorator rejestrujący funkcję dopasowania jako builder tablicy.
+
+    Builder dostaje długość genotypu i zwraca tablicę (max_sum + 1, NUM_ENV_VALUES)
+    dopasowania dla każdej sumy genotypu i wartości środowiska.
+    """
+    def decorator(builder):
+        FITNESS_TABLE_BUILDERS[name] = builder
+        return builder
+    return decorator
+
+
+def max_genotype_sum(genome_length: int) -> int:
+    """Największa możliwa suma genotypu"""
+    return (NUM_ALLELES - 1) * genome_length
+
+
+@register_fitness_table('distance')
+def distance_fitness_table(genome_length: int) -> np.ndarray:
+    """Tablica dla fitness: 1 / (1 + |suma - 2 * env|)"""
+    sums = np.arange(max_genotype_sum(genome_length) + 1)[:, None]
+    env_values = np.arange(NUM_ENV_VALUES)[None, :]
+    return 1.0 / (1.0 + np.abs(sums - 2 * env_values))
+
+
+def fitness_lookup_table(genome_length: int, name: str = 'distance') -> np.ndarray:
+    """Tablica dopasowania (suma genotypu, wartość środowiska), budowana raz i zapamiętywana"""
+    key = (name, genome_length)
+    if key not in _FITNESS_TABLES:
+        if name not in FITNESS_TABLE_BUILDERS:
+            raise ValueError(f"Nieznana funkcja dopasowania: {name}\nDostępne: {list(FITNESS_TABLE_BUILDERS)}")
+        table = np.asarray(FITNESS_TABLE_BUILDERS[name](genome_length), dtype=float)
+        expected = (max_genotype_sum(genome_length) + 1, NUM_ENV_VALUES)
+        if table.shape != expected:
+            raise ValueError(f"Tablica dopasowania '{name}' ma kształt {table.shape}, oczekiwano {expected}")
+        _FITNESS_TABLES[key] = table
+    return _FITNESS_TABLES[key]
+
+
+class FitnessEvaluator:
+    """
+    Dopasowanie populacji jako jedno indeksowanie tablicy.
+
+    Ostatnio policzony wektor (last) jest współdzielony przez rozród
+    i statystyki, więc dopasowanie liczone jest raz na generację.
+    """
+    def __init__(self, genome_length: int, name: str = 'distance'):
+        self.name = name
+        self.table = fitness_lookup_table(genome_length, name)
+        self.last = np.zeros(0)
+    
+    def __call__(self, sums: np.ndarray, env_values: np.ndarray) -> np.ndarray:
+        """Dopasowanie osobników z sum genotypów i wartości środowiska"""
+        self.last = self.table[sums, env_values]
+        return self.last
+    
+    def mean(self) -> float:
+        """Średnie dopasowanie z ostatniego wywołania"""
+        return float(self.last.mean()) if len(self.last) else 0.0
+
+
+def population_fitness(population, env: np.ndarray, fitness_name: str = 'distance') -> np.ndarray:
+    """Dopasowanie niepustej populacji z tablicy fitness_name (bez wektora FitnessEvaluator.last)"""
+    genotypes = population_genotypes(population)
+    positions = population_positions(population)
+    table = fitness_lookup_table(genotypes.shape[1], fitness_name)
+    return table[genotypes.sum(axis=1), env[positions[:, 1], positions[:, 0]]]
+
+
+# =========================
+# Kernele wsadowe
+# =========================
+
+# Przesunięcia w sąsiedztwie von Neumanna, w kolejności z get_neighbors
+_NEIGHBOR_DX = np.array([-1, 1, 0, 0], dtype=np.int32)
+_NEIGHBOR_DY = np.array([0, 0, -1, 1], dtype=np.int32)
+
+
+def _scratch(scratch: dict, name: str, shape: tuple, dtype) -> np.ndarray:
+    """Bufor pomocniczy: widok na scratch[name] (bez alokacji) albo nowa tablica"""
+    if scratch is None:
+        return np.empty(shape, dtype=dtype)
+    return scratch[name][:int(np.prod(shape))].reshape(shape)
+
+
+def migration_kernel(x: np.ndarray, y: np.ndarray, barrier: np.ndarray,
+                     p_mig: float, rng: np.random.Generator = None,
+                     replicate: np.ndarray = None, scratch: dict = None) -> np.ndarray:
+    """
+    Migracja całej populacji naraz (modyfikuje x, y w miejscu).
+
+    Rozkład jest taki sam jak w regule von Neumanna z simulation_step:
+    migrant wybiera równomiernie jednego z sąsiadów leżących w siatce
+    (na krawędzi 3, w rogu 2), a ruch na komórkę bariery jest odrzucany.
+    Z replicate (numer powtórzenia osobnika) barrier ma kształt (K, H, W)
+    i każdy osobnik porusza się po siatce swojego powtórzenia.
+    Z scratch (bufory SimulationState) tablice pośrednie zapisywane są
+    do istniejących buforów; nowe powstają tylko dla indeksów migrantów.
+    
+    Returns:
+        np.ndarray: indeksy osobników, które zmieniły komórkę
+    """
+    height, width = barrier.shape[-2:]
+    rng = make_rng(rng)
+    n = len(x)
+    random = rng.random(out=_scratch(scratch, 'random', (n,), np.float64))
+    movers = np.flatnonzero(np.less(random, p_mig, out=_scratch(scratch, 'mask', (n,), bool)))
+    k = len(movers)
+    new_x = np.take(x, movers, out=_scratch(scratch, 'new_x', (k,), x.dtype))
+    new_y = np.take(y, movers, out=_scratch(scratch, 'new_y', (k,), y.dtype))
+    
+    # Sąsiedzi w granicach siatki i losowanie jednego z nich
+    valid = _scratch(scratch, 'valid', (k, 4), bool)
+    np.greater(new_x, 0, out=valid[:, 0])
+    np.less(new_x, width - 1, out=valid[:, 1])
+    np.greater(new_y, 0, out=valid[:, 2])
+    np.less(new_y, height - 1, out=valid[:, 3])
+    n_valid = np.sum(valid, axis=1, out=_scratch(scratch, 'count', (k,), np.int64))
+    choice = rng.random(out=random[:k])
+    np.multiply(choice, n_valid, out=choice)
+    chosen = _scratch(scratch, 'choice', (k,), np.int64)
+    np.copyto(chosen, choice, casting='unsafe')
+    cumulative = np.cumsum(valid, axis=1, out=_scratch(scratch, 'cumsum', (k, 4), np.int64))
+    np.greater(cumulative, chosen[:, None], out=valid)
+    direction = np.argmax(valid, axis=1, out=_scratch(scratch, 'direction', (k,), np.int64))
+    offset = _scratch(scratch, 'offset', (k,), x.dtype)
+    np.add(new_x, np.take(_NEIGHBOR_DX, direction, out=offset), out=new_x)
+    np.add(new_y, np.take(_NEIGHBOR_DY, direction, out=offset), out=new_y)
+    
+    # Jedno odczytanie maski barier dla wszystkich migrantów
+    if replicate is None:
+        cell = np.multiply(new_y, width, out=_scratch(scratch, 'cell', (k,), np.int64), dtype=np.int64)
+        np.add(cell, new_x, out=cell)
+        blocked = np.take(barrier.ravel(), cell, out=_scratch(scratch, 'blocked', (k,), bool))
+    else:
+        blocked = barrier[replicate[movers], new_y, new_x]
+    ok = np.greater(n_valid, 0, out=_scratch(scratch, 'mask', (k,), bool))
+    np.logical_and(ok, np.logical_not(blocked, out=blocked), out=ok)
+    moved = movers[ok]
+    x[moved] = new_x[ok]
+    y[moved] = new_y[ok]
+    return moved
+
+
+def fitness_arrays(genotypes: np.ndarray, env_values: np.ndarray) -> np.ndarray:
+    """Wektorowa wersja fitness: sumy wierszy genotypów vs env_value * 2."""
+    diff = np.abs(genotypes.sum(axis=1, dtype=np.int64) - 2 * np.asarray(env_values, dtype=np.int64))
+    return 1.0 / (1.0 + diff)
+
+
+def mutation_kernel(genotypes: np.ndarray, p_mut: float, rng: np.random.Generator = None,
+                    scratch: dict = None):
+    """Mutacje całej macierzy genotypów jedną maską Bernoulliego (w miejscu)."""
+    rng = make_rng(rng)
+    random = rng.random(out=_scratch(scratch, 'mutation', genotypes.shape, np.float64))
+    mask = np.less(random, p_mut, out=_scratch(scratch, 'mutation_mask', genotypes.shape, bool))
+    # jak w mutate: nowa wartość genu losowana z zakresu 0..2
+    genotypes[mask] = rng.integers(0, 3, size=int(mask.sum()))
+    return genotypes
+
+
+def reproduction_kernel(genotypes: np.ndarray, env_values: np.ndarray,
+                        p_base_repro: float, p_mut: float, rng: np.random.Generator = None,
+                        fitness_values: np.ndarray = None):
+    """
+    Rozród całej populacji naraz.
+
+    Dopasowanie liczone jest z sum wierszy macierzy genotypów (albo podane
+    jako fitness_values, np. z FitnessEvaluator), decyzje o rozrodzie
+    losowane jednocześnie, genotypy rodziców kopiowane jednym indeksowaniem,
+    a mutacje nakładane jedną maską na macierz potomków.
+    
+    Returns:
+        tuple: (indeksy rodziców, macierz genotypów potomków)
+    """
+    rng = make_rng(rng)
+    fit = fitness_arrays(genotypes, env_values) if fitness_values is None else fitness_values
+    parents = np.flatnonzero(rng.random(len(genotypes)) < p_base_repro * fit)
+    child_genotypes = mutation_kernel(genotypes[parents], p_mut, rng)
+    return parents, child_genotypes
+
+
+def capacity_kernel(x: np.ndarray, y: np.ndarray, width: int,
+                    max_per_cell: int, rng: np.random.Generator = None,
+                    scratch: dict = None) -> np.ndarray:
+    """
+    Regulacja liczebności w komórkach w czasie O(N).
+
+    Komórki numerowane są liniowo (y * width + x), a ich obsada liczona przez
+    np.bincount. Osobniki z komórek mieszczących się w limicie zostają bez
+    losowania; w przepełnionych komórkach losowa permutacja i stabilne
+    sortowanie po zwartym numerze komórki wybierają max_per_cell osobników.
+    Z scratch numery komórek i maska zapisywane są do buforów SimulationState
+    (nowe tablice: obsada komórek rozmiaru siatki i indeksy ocalałych).
+    
+    Returns:
+        np.ndarray: rosnące indeksy osobników, które pozostają
+    """
+    n = len(x)
+    cell_ids = np.multiply(y, width, out=_scratch(scratch, 'cell', (n,), np.int64), dtype=np.int64)
+    np.add(cell_ids, x, out=cell_ids)
+    counts = np.bincount(cell_ids)
+    cell_counts = np.take(counts, cell_ids, out=_scratch(scratch, 'count', (n,), np.int64))
+    keep_mask = np.less_equal(cell_counts, max_per_cell, out=_scratch(scratch, 'mask', (n,), bool))
+    if keep_mask.all():
+        return np.flatnonzero(keep_mask)
+    
+    overfull = counts > max_per_cell
+    overfull_counts = counts[overfull]
+    # Zwarte numery przepełnionych komórek: małe klucze -> sortowanie pozycyjne
+    compact = (np.cumsum(overfull) - 1).astype(np.min_scalar_type(len(overfull_counts)))
+    
+    candidates = np.flatnonzero(~keep_mask)
+    candidates = candidates[make_rng(rng).permutation(len(candidates))]
+    candidates = candidates[np.argsort(compact[cell_ids[candidates]], kind='stable')]
+    group_start = np.cumsum(overfull_counts) - overfull_counts
+    rank = np.arange(len(candidates)) - np.repeat(group_start, overfull_counts)
+    keep_mask[candidates[rank < max_per_cell]] = True
+    return np.flatnonzero(keep_mask)
+
+
+def _removed_mask(n: int, keep: np.ndarray, out: np.ndarray = None) -> np.ndarray:
+    """Maska osobników usuniętych przez capacity_kernel."""
+    removed = np.ones(n, dtype=bool) if out is None else out[:n]
+    removed[:] = True
+    removed[keep] = False
+    return removed
+
+
+# =========================
+# Różnorodność genetyczna z częstości alleli
+# =========================
+
+NUM_ALLELES = 3  # allele 0..2
+
+
+def allele_counts(genotypes: np.ndarray, num_alleles: int = NUM_ALLELES) -> np.ndarray:
+    """Tablica (genome_length, num_alleles) liczebności alleli w każdym locus."""
+    return np.stack([(genotypes == a).sum(axis=0) for a in range(num_alleles)], axis=1)
+
+
+def diversity_from_allele_counts(counts: np.ndarray, n: int) -> float:
+    """
+    Średnia odległość Hamminga (jak pdist(..., 'hamming')) z liczebności alleli.
+
+    W locus l para osobników różni się, jeśli ma różne allele, więc liczba
+    takich par to (n^2 - sum_a c_la^2) / 2; dzielimy przez L * n(n-1) / 2.
+    """
+    if n < 2:
+        return 0.0
+    genome_length = counts.shape[0]
+    differing = n * n * genome_length - int((counts.astype(np.int64) ** 2).sum())
+    return differing / (genome_length * n * (n - 1))
+
+
+def mean_hamming_diversity(genotypes: np.ndarray) -> float:
+    """Różnorodność genetyczna populacji w O(N*L) zamiast O(N^2*L) dla pdist."""
+    if len(genotypes) < 2:
+        return 0.0
+    return diversity_from_allele_counts(allele_counts(genotypes), len(genotypes))
+
+
+class DiversityTracker:
+    """
+    Przyrostowe śledzenie różnorodności genetycznej.
+
+    Przechowuje tablicę liczebności alleli aktualizowaną o narodziny (add)
+    i zgony (remove), więc koszt kroku zależy od liczby zmian, a nie od
+    wielkości populacji.
+    """
+    def __init__(self, genome_length: int, num_alleles: int = NUM_ALLELES):
+        self.counts = np.zeros((genome_length, num_alleles), dtype=np.int64)
+        self.n = 0
+    
+    def add(self, genotypes: np.ndarray):
+        """Dodaje osobniki (macierz genotypów) do tablicy częstości."""
+        if len(genotypes):
+            self.counts += allele_counts(genotypes, self.counts.shape[1])
+            self.n += len(genotypes)
+    
+    def remove(self, genotypes: np.ndarray):
+        """Usuwa osobniki (macierz genotypów) z tablicy częstości."""
+        if len(genotypes):
+            self.counts -= allele_counts(genotypes, self.counts.shape[1])
+            self.n -= len(genotypes)
+    
+    def add_counts(self, counts: np.ndarray, n: int):
+        """Dodaje gotową tablicę liczebności alleli n osobników (ujemne n - usuwa)."""
+        self.counts += counts
+        self.n += n
+    
+    def diversity(self) -> float:
+        """Aktualna średnia odległość Hamminga."""
+        return diversity_from_allele_counts(self.counts, self.n)
+
+
+# =========================
+# Reprezentacja haplotypowa
+# =========================
+
+# Największa liczba możliwych genotypów kodowanych bezpośrednio (base-3);
+# dłuższe genotypy trafiają do rejestru haplotypów
+MAX_DENSE_HAPLOTYPES = 3 ** 10
+
+class HaplotypeCodec:
+    """
+    Kodowanie genotypów jako liczbowych identyfikatorów haplotypów.
+
+    Dla krótkich genotypów identyfikator to liczba w systemie o podstawie
+    num_alleles (genotyp[l] * 3^l), a tablica dekodowania obejmuje wszystkie
+    num_alleles^L genotypy. Dla dłuższych genotypów identyfikatory nadaje
+    rejestr w kolejności pojawiania się nowych haplotypów.
+
+    Dopasowanie to indeksowanie tablicy fitness_lookup_table sumami
+    genotypów haplotypów (zapamiętanymi dla każdego haplotypu).
+    """
+    def __init__(self, genome_length: int, num_alleles: int = NUM_ALLELES,
+                 max_dense: int = MAX_DENSE_HAPLOTYPES, fitness_name: str = 'distance'):
+        self.genome_length = genome_length
+        self.num_alleles = num_alleles
+        self.fitness_name = fitness_name
+        self.dense = num_alleles ** genome_length <= max_dense
+        self._powers = num_alleles ** np.arange(genome_length, dtype=np.int64)
+        if self.dense:
+            ids = np.arange(num_alleles ** genome_length, dtype=np.int64)
+            self._table = ((ids[:, None] // self._powers) % num_alleles).astype(np.uint8)
+            self.size = len(ids)
         else:
-            # Losowy wybór (można też zastosować selekcję wg dopasowania)
-            new_population.extend(random.sample(inds, config.max_per_cell))
+            self._table = np.zeros((1024, genome_length), dtype=np.uint8)
+            self._registry = {}
+            self.size = 0
+        self._sums = np.zeros(0, dtype=np.int32)
+    
+    @property
+    def table(self) -> np.ndarray:
+        """Tablica dekodowania (H, L): wiersz h to genotyp haplotypu h"""
+        return self._table[:self.size]
+    
+    def encode(self, genotypes: np.ndarray) -> np.ndarray:
+        """Identyfikatory haplotypów (N,) dla macierzy genotypów (N, L)"""
+        genotypes = np.asarray(genotypes)
+        if self.dense:
+            return (genotypes.astype(np.int64) @ self._powers).astype(np.int32)
+        if not len(genotypes):
+            return np.zeros(0, dtype=np.int32)
+        haplotypes, inverse, _ = unique_haplotypes(genotypes)
+        ids = np.array([self._register(row) for row in haplotypes], dtype=np.int32)
+        return ids[inverse]
+    
+    def _register(self, row: np.ndarray) -> int:
+        key = row.tobytes()
+        haplotype = self._registry.get(key)
+        if haplotype is None:
+            if self.size == len(self._table):
+                self._table = np.concatenate([self._table, np.zeros_like(self._table)])
+            haplotype = self._registry[key] = self.size
+            self._table[self.size] = row
+            self.size += 1
+        return haplotype
+    
+    def decode(self, haplotypes: np.ndarray) -> np.ndarray:
+        """Macierz genotypów (N, L) dla identyfikatorów haplotypów"""
+        return self._table[haplotypes]
+    
+    def haplotype_sums(self) -> np.ndarray:
+        """Sumy genotypów haplotypów (H,), uzupełniane o nowe haplotypy"""
+        known = len(self._sums)
+        if known < self.size:
+            self._sums = np.concatenate([self._sums, self.table[known:].sum(axis=1, dtype=np.int32)])
+        return self._sums
+    
+    def fitness_table(self) -> np.ndarray:
+        """Tablica dopasowania (H, NUM_ENV_VALUES) z tablicy fitness_lookup_table"""
+        return fitness_lookup_table(self.genome_length, self.fitness_name)[self.haplotype_sums()]
+    
+    def fitness(self, haplotypes: np.ndarray, env_values: np.ndarray) -> np.ndarray:
+        """Dopasowanie osobników (suma haplotypu, a potem tablica dopasowania)"""
+        table = fitness_lookup_table(self.genome_length, self.fitness_name)
+        return table[self.haplotype_sums()[haplotypes], env_values]
+    
+    def mutate(self, haplotypes: np.ndarray, p_mut: float,
+               rng: np.random.Generator = None) -> np.ndarray:
+        """
+        Mutacje haplotypów (jak mutation_kernel: każdy gen z prawdopodobieństwem
+        p_mut losuje nową wartość 0..2).
+
+        Liczba mutujących genów osobnika losowana jest z rozkładu dwumianowego,
+        więc dekodowane i kodowane ponownie są tylko haplotypy z mutacją.
+        """
+        rng = make_rng(rng)
+        haplotypes = np.array(haplotypes, dtype=np.int32)
+        num_mutations = rng.binomial(self.genome_length, p_mut, size=len(haplotypes))
+        mutated = np.flatnonzero(num_mutations)
+        if len(mutated):
+            rows = self.decode(haplotypes[mutated])
+            # Losowy podzbiór num_mutations genów (rangi losowych kluczy)
+            ranks = np.argsort(np.argsort(rng.random(rows.shape), axis=1), axis=1)
+            mask = ranks < num_mutations[mutated, None]
+            rows[mask] = rng.integers(0, self.num_alleles, size=int(mask.sum()))
+            haplotypes[mutated] = self.encode(rows)
+        return haplotypes
+    
+    def allele_counts(self, haplotypes: np.ndarray) -> np.ndarray:
+        """Tablica (L, num_alleles) liczebności alleli z liczebności haplotypów"""
+        counts = np.bincount(haplotypes, minlength=self.size)
+        present = np.flatnonzero(counts)
+        rows = self.table[present]
+        return np.stack([counts[present] @ (rows == a) for a in range(self.num_alleles)], axis=1)
+    
+    def diversity(self, haplotypes: np.ndarray) -> float:
+        """Średnia odległość Hamminga z liczebności haplotypów"""
+        return diversity_from_allele_counts(self.allele_counts(haplotypes), len(haplotypes))
+
+
+@dataclass
+class HaplotypePopulation:
+    """
+    Populacja z genotypami zakodowanymi jako identyfikatory haplotypów.
+
+    Osobnik zajmuje kilka bajtów (x, y, haplotyp, czas narodzin) niezależnie
+    od długości genotypu; genotypy dekodowane są na żądanie (genotypes).
+    """
+    x: np.ndarray           # int32 (N,)
+    y: np.ndarray           # int32 (N,)
+    haplotypes: np.ndarray  # int32 (N,) identyfikatory z HaplotypeCodec
+    birth_time: np.ndarray  # int32 (N,)
+    codec: HaplotypeCodec
+
+    def __len__(self) -> int:
+        return len(self.x)
+
+    @property
+    def genotypes(self) -> np.ndarray:
+        """Zdekodowana macierz genotypów (N, L)"""
+        return self.codec.decode(self.haplotypes)
+
+    @classmethod
+    def from_arrays(cls, population: PopulationArrays, codec: HaplotypeCodec = None):
+        """Konwersja z PopulationArrays (kodowanie genotypów)"""
+        codec = codec or HaplotypeCodec(population.genotypes.shape[1])
+        return cls(x=np.array(population.x, dtype=np.int32), y=np.array(population.y, dtype=np.int32),
+                   haplotypes=codec.encode(population.genotypes),
+                   birth_time=np.array(population.birth_time, dtype=np.int32), codec=codec)
+
+    def to_arrays(self) -> PopulationArrays:
+        """Konwersja do PopulationArrays (np. dla checkpointu)"""
+        return PopulationArrays(x=self.x, y=self.y, genotypes=self.genotypes,
+                                birth_time=self.birth_time)
+
+    def take(self, index) -> 'HaplotypePopulation':
+        """Podzbiór osobników wg maski logicznej lub tablicy indeksów."""
+        return HaplotypePopulation(x=self.x[index], y=self.y[index],
+                                   haplotypes=self.haplotypes[index],
+                                   birth_time=self.birth_time[index], codec=self.codec)
+
+    def concat(self, other: 'HaplotypePopulation') -> 'HaplotypePopulation':
+        """Połączenie dwóch populacji o wspólnym kodowaniu."""
+        return HaplotypePopulation(x=np.concatenate([self.x, other.x]),
+                                   y=np.concatenate([self.y, other.y]),
+                                   haplotypes=np.concatenate([self.haplotypes, other.haplotypes]),
+                                   birth_time=np.concatenate([self.birth_time, other.birth_time]),
+                                   codec=self.codec)
+
+
+def init_population_haplotypes(num_individuals: int, height: int, width: int, genome_length: int,
+                               initial_time: int = 0, rng: np.random.Generator = None,
+                               codec: HaplotypeCodec = None) -> HaplotypePopulation:
+    """Losowa populacja haplotypowa (te same losowania co init_population_arrays)"""
+    population = init_population_arrays(num_individuals, height, width, genome_length,
+                                        initial_time, rng)
+    return HaplotypePopulation.from_arrays(population, codec)
+
+
+def haplotype_reproduction_kernel(haplotypes: np.ndarray, env_values: np.ndarray,
+                                  codec: HaplotypeCodec, p_base_repro: float, p_mut: float,
+                                  rng: np.random.Generator = None,
+                                  fitness_values: np.ndarray = None):
+    """
+    Rozród populacji haplotypowej (odpowiednik reproduction_kernel).
+
+    Returns:
+        tuple: (indeksy rodziców, haplotypy potomków)
+    """
+    rng = make_rng(rng)
+    fit = codec.fitness(haplotypes, env_values) if fitness_values is None else fitness_values
+    parents = np.flatnonzero(rng.random(len(haplotypes)) < p_base_repro * fit)
+    return parents, codec.mutate(haplotypes[parents], p_mut, rng)
+
+
+# =========================
+# Profilowanie i haki (hooks)
+# =========================
+
+PHASE_LABELS = {
+    'migration': 'migracja',
+    'reproduction': 'rozród + mutacje',
+    'capacity': 'regulacja liczebności',
+    'statistics': 'statystyki',
+}
+
+COUNTER_LABELS = {
+    'migrants': 'migranci',
+    'births': 'narodziny',
+    'culled': 'usunięte osobniki',
+    'cells_over_capacity': 'przepełnione komórki',
+}
+
+
+class StepProfiler:
+    """
+    Czasy etapów i liczniki zdarzeń kroku symulacji.
+
+    Kroki symulacji wołają start() przed pierwszym etapem i lap() po każdym
+    kolejnym; gdy profiler nie jest przekazany (None), nie jest wykonywana
+    żadna dodatkowa praca.
+    """
+    def __init__(self):
+        self.times = dict.fromkeys(PHASE_LABELS, 0.0)
+        self.counters = dict.fromkeys(COUNTER_LABELS, 0)
+        self.steps = 0
+        self._mark = None
+    
+    def start(self):
+        """Początek pomiaru (przed pierwszym etapem)"""
+        self._mark = time.perf_counter()
+    
+    def lap(self, phase: str, **counters):
+        """Dolicza czas od poprzedniego znacznika do etapu phase oraz liczniki"""
+        now = time.perf_counter()
+        self.times[phase] += now - self._mark
+        self._mark = now
+        for name, value in counters.items():
+            self.counters[name] += int(value)
+    
+    def end_step(self):
+        """Zamyka krok symulacji"""
+        self.steps += 1
+    
+    def summary(self) -> dict:
+        """Podsumowanie jako słownik (czasy w sekundach, liczniki łącznie)"""
+        return {'steps': self.steps, 'times': dict(self.times), 'counters': dict(self.counters)}
+    
+    def summary_table(self) -> str:
+        """Tabela podsumowania przebiegu"""
+        steps = max(self.steps, 1)
+        total = sum(self.times.values()) or 1.0
+        lines = [f"PROFIL SYMULACJI (kroki: {self.steps})",
+                 f"  {'etap':<24}{'czas [s]':>10}{'udział':>9}{'na krok [ms]':>14}"]
+        for phase, label in PHASE_LABELS.items():
+            seconds = self.times[phase]
+            lines.append(f"  {label:<24}{seconds:>10.3f}{seconds / total:>9.1%}"
+                         f"{seconds / steps * 1e3:>14.3f}")
+        lines.append(f"  {'licznik':<24}{'suma':>10}{'':>9}{'na krok':>14}")
+        for name, label in COUNTER_LABELS.items():
+            value = self.counters[name]
+            lines.append(f"  {label:<24}{value:>10d}{'':>9}{value / steps:>14.1f}")
+        return "\n".join(lines)
+
+
+def count_overfull_cells(x: np.ndarray, y: np.ndarray, width: int, max_per_cell: int) -> int:
+    """Liczba komórek z więcej niż max_per_cell osobnikami (licznik profilera)"""
+    if not len(x):
+        return 0
+    return int(np.count_nonzero(np.bincount(y.astype(np.int64) * width + x) > max_per_cell))
+
+
+class SimulationHooks:
+    """
+    Rejestr funkcji wywoływanych przez run_simulation.
+
+    Zdarzenia:
+        'generation' - po każdej generacji: callback(gen, population, collection)
+                       (population można zachować - dla silnika 'fused' jest kopią)
+        'finish'     - po zakończeniu: callback(population, collection)
+    """
+    EVENTS = ('generation', 'finish')
     
-    return new_population
+    def __init__(self):
+        self._callbacks = {event: [] for event in self.EVENTS}
+    
+    def register(self, event: str, callback):
+        """Dodaje funkcję dla zdarzenia (zwraca ją, więc działa jako dekorator)"""
+        if event not in self._callbacks:
+            raise ValueError(f"Nieznane zdarzenie: {event}\nDostępne: {list(self.EVENTS)}")
+        self._callbacks[event].append(callback)
+        return callback
+    
+    def unregister(self, event: str, callback):
+        """Usuwa funkcję zarejestrowaną dla zdarzenia"""
+        self._callbacks[event].remove(callback)
+    
+    def emit(self, event: str, *args):
+        """Wywołuje wszystkie funkcje zarejestrowane dla zdarzenia"""
+        for callback in self._callbacks[event]:
+            callback(*args)
 
 
 # =========================
@@ -206,15 +945,30 @@ class SimulationStats:
 
 
 class DataCollector:
-    """Zbiera dane statystyczne z symulacji"""
-    def __init__(self, barrier: np.ndarray):
+    """
+    Zbiera dane statystyczne z symulacji.
+
+    Domyślnie genotypy każdego kroku trafiają do genotype_history w pamięci;
+    z snapshot_path są zapisywane (wraz z położeniami) co snapshot_stride
+    kroków do GenotypeSnapshotWriter i odczytywane przez snapshot_store().
+    """
+    def __init__(self, barrier: np.ndarray, snapshot_path: str = None, snapshot_stride: int = 1,
+                 fitness_name: str = 'distance'):
         self.barrier = barrier
+        self.fitness_name = fitness_name
         self.stats: List[SimulationStats] = []
         self.genotype_history: List[List[np.ndarray]] = []
+        self.snapshot_path = snapshot_path
+        self.snapshot_stride = snapshot_stride
+        self.snapshot_writer = None
     
     def collect(self, population: List[Individual], env: np.ndarray, 
-               current_time: int, config: SimulationConfig):
-        """Zbiera statystyki z danego kroku"""
+               current_time: int, config: SimulationConfig, fitnesses: np.ndarray = None):
+        """
+        Zbiera statystyki z danego kroku.
+        fitnesses: gotowy wektor dopasowania (np. FitnessEvaluator.last), żeby nie liczyć go ponownie;
+        bez niego dopasowanie liczone jest z tablicy fitness_name
+        """
         if not population:
             return
         
@@ -222,23 +976,20 @@ class DataCollector:
         pop_size = len(population)
         
         # Średnia wartość dopasowania
-        fitnesses = [fitness(ind, env[ind.y, ind.x]) for ind in population]
-        mean_fitness = np.mean(fitnesses) if fitnesses else 0
+        positions = population_positions(population)
+        if fitnesses is None:
+            fitnesses = population_fitness(population, env, self.fitness_name)
+        mean_fitness = np.mean(fitnesses) if len(fitnesses) else 0
         
-        # Różnorodność genetyczna (jako średnia odległość Hamminga)
-        if len(population) > 1:
-            genotypes = np.array([ind.genotype for ind in population])
-            # Odległość Hamminga (liczba różnych genów)
-            distances = pdist(genotypes, metric='hamming')
-            genetic_diversity = np.mean(distances) if len(distances) > 0 else 0
-        else:
-            genetic_diversity = 0
+        # Różnorodność genetyczna (jako średnia odległość Hamminga,
+        # liczona z częstości alleli zamiast pdist)
+        genetic_diversity = mean_hamming_diversity(population_genotypes(population))
         
         # Liczba osobników po każdej stronie bariery
         barrier_x = np.where(self.barrier[0])[0]
         if len(barrier_x) > 0:
             barrier_pos = barrier_x[0]
-            left_pop = sum(1 for ind in population if ind.x < barrier_pos)
+            left_pop = int((positions[:, 0] < barrier_pos).sum())
             right_pop = pop_size - left_pop
         else:
             left_pop = pop_size
@@ -255,23 +1006,798 @@ class DataCollector:
         )
         self.stats.append(stats)
         
-        # Zapisanie genotypów do historii
-        genotypes = [ind.genotype.copy() for ind in population]
-        self.genotype_history.append(genotypes)
+        # Zapisanie genotypów do historii (w pamięci lub w magazynie snapshotów)
+        if self.snapshot_path is not None:
+            if current_time % self.snapshot_stride == 0:
+                genotypes = population_genotypes(population)
+                if self.snapshot_writer is None:
+                    self.snapshot_writer = GenotypeSnapshotWriter(self.snapshot_path, genotypes.shape[1])
+                self.snapshot_writer.append(current_time, genotypes, positions)
+        else:
+            genotypes = [genotype.copy() for genotype in population_genotypes(population)]
+            self.genotype_history.append(genotypes)
+    
+    def snapshot_store(self) -> 'SnapshotStore':
+        """Odczyt zapisanych snapshotów (SnapshotStore)"""
+        if self.snapshot_writer is not None:
+            self.snapshot_writer.flush()
+        return SnapshotStore(self.snapshot_path)
+    
+    def close(self):
+        """Zamyka pliki snapshotów"""
+        if self.snapshot_writer is not None:
+            self.snapshot_writer.close()
+    
+    def series(self) -> Dict[str, np.ndarray]:
+        """Serie statystyk jako tablice (ten sam format co StreamingDataCollector)"""
+        return {name: np.array([getattr(s, name) for s in self.stats])
+                for name in STATS_FIELDS}
+
+
+# Pola SimulationStats w kolejności kolumn i ich typy w trybie strumieniowym
+STATS_FIELDS = {
+    'time': np.int32,
+    'population_size': np.int64,
+    'mean_fitness': np.float64,
+    'genetic_diversity': np.float64,
+    'left_pop_size': np.int64,
+    'right_pop_size': np.int64,
+}
+# Klucze 'collection' z run_simulation ('collector': 'streaming') -> pola STATS_FIELDS
+COLLECTION_FIELDS = {
+    'total_population': 'population_size',
+    'genetic_diversity': 'genetic_diversity',
+    'fitness': 'mean_fitness',
+    'left_pop_size': 'left_pop_size',
+    'right_pop_size': 'right_pop_size',
+}
+# Kolumny serii w series.csv/series.npz zbioru danych -> pola STATS_FIELDS
+EXPORT_FIELDS = {'generation': 'time', **COLLECTION_FIELDS}
+EXPORT_SERIES = tuple(EXPORT_FIELDS)
+# Co ile generacji series.csv jest opróżniany na dysk
+EXPORT_FLUSH_EVERY = 100
+
+
+class GenotypeSnapshotWriter:
+    """
+    Zapis snapshotów genotypów i położeń do katalogu na dysku (tylko dopisywanie).
+
+    Pliki:
+        genotypes.bin - kolejne macierze genotypów (uint8, wiersz = osobnik)
+        positions.bin - położenia osobników (int32, wiersz = [x, y])
+        index.bin     - rekordy int64 (czas, pierwszy wiersz, liczba wierszy)
+        meta.json     - długość genotypu
+
+    Odczyt: SnapshotStore (mapowanie pamięci, dostęp do dowolnej generacji).
+    """
+    def __init__(self, path: str, genome_length: int):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.genome_length = genome_length
+        with open(os.path.join(path, 'meta.json'), 'w') as f:
+            json.dump({'genome_length': genome_length}, f)
+        self._genotypes_file = open(os.path.join(path, 'genotypes.bin'), 'ab')
+        self._positions_file = open(os.path.join(path, 'positions.bin'), 'ab')
+        self._index_file = open(os.path.join(path, 'index.bin'), 'ab')
+        # Dopisywanie do istniejącego katalogu kontynuuje numerację wierszy
+        self.rows_written = self._genotypes_file.tell() // genome_length
+    
+    def append(self, current_time: int, genotypes: np.ndarray, positions: np.ndarray = None):
+        """
+        Dopisuje macierz genotypów z danego kroku.
+        positions: tablica (N, 2) [x, y]; brak położeń zapisywany jest jako -1.
+        """
+        genotypes = np.ascontiguousarray(genotypes, dtype=np.uint8)
+        if positions is None:
+            positions = np.full((len(genotypes), 2), -1, dtype=np.int32)
+        self._genotypes_file.write(genotypes.tobytes())
+        self._positions_file.write(np.ascontiguousarray(positions, dtype=np.int32).tobytes())
+        record = np.array([current_time, self.rows_written, len(genotypes)], dtype=np.int64)
+        self._index_file.write(record.tobytes())
+        self.rows_written += len(genotypes)
+    
+    def flush(self):
+        """Zapisuje bufory na dysk (np. przed odczytem przez SnapshotStore)"""
+        for file in (self._genotypes_file, self._positions_file, self._index_file):
+            file.flush()
+    
+    def truncate(self, current_time: int):
+        """
+        Usuwa snapshoty z czasem >= current_time (wznawianie z checkpointu,
+        żeby generacje po checkpoincie nie zostały zapisane dwukrotnie).
+        """
+        self.flush()
+        index = np.fromfile(os.path.join(self.path, 'index.bin'), dtype=np.int64).reshape(-1, 3)
+        index = index[index[:, 0] < current_time]
+        self.rows_written = int(index[:, 1:].sum(axis=1).max()) if len(index) else 0
+        self._genotypes_file.truncate(self.rows_written * self.genome_length)
+        self._positions_file.truncate(self.rows_written * 2 * np.dtype(np.int32).itemsize)
+        self._index_file.truncate(index.nbytes)
+    
+    def close(self):
+        self._genotypes_file.close()
+        self._positions_file.close()
+        self._index_file.close()
+
+
+class SnapshotStore:
+    """
+    Odczyt snapshotów zapisanych przez GenotypeSnapshotWriter.
+
+    Pliki danych są mapowane w pamięci (np.memmap), więc dostęp do dowolnej
+    generacji nie wczytuje całej historii. store[i] zwraca i-ty snapshot jako
+    PopulationArrays (widoki na mapowane pliki), który można przekazać
+    bezpośrednio do funkcji analizy (detect_species_clusters,
+    calculate_population_genetic_distance, analyze_genetic_divergence).
+    """
+    def __init__(self, path: str, genome_length: int = None):
+        self.path = path
+        meta_path = os.path.join(path, 'meta.json')
+        if genome_length is None and os.path.exists(meta_path):
+            with open(meta_path) as f:
+                genome_length = json.load(f)['genome_length']
+        self.genome_length = genome_length or 8
+        self.refresh()
+    
+    def refresh(self):
+        """Ponownie mapuje pliki (po dopisaniu kolejnych snapshotów)"""
+        self.index = np.fromfile(os.path.join(self.path, 'index.bin'), dtype=np.int64).reshape(-1, 3)
+        rows = int(self.index[:, 1:].sum(axis=1).max()) if len(self.index) else 0
+        self._genotypes = self._map('genotypes.bin', np.uint8, (rows, self.genome_length))
+        positions_path = os.path.join(self.path, 'positions.bin')
+        self._positions = self._map('positions.bin', np.int32, (rows, 2)) \
+            if os.path.exists(positions_path) else None
+    
+    def _map(self, name: str, dtype, shape):
+        if shape[0] == 0:
+            return np.zeros(shape, dtype=dtype)
+        return np.memmap(os.path.join(self.path, name), dtype=dtype, mode='r', shape=shape)
+    
+    def __len__(self) -> int:
+        return len(self.index)
+    
+    @property
+    def times(self) -> np.ndarray:
+        """Czasy (generacje) kolejnych snapshotów"""
+        return self.index[:, 0]
+    
+    def genotypes(self, snapshot: int) -> np.ndarray:
+        """Macierz genotypów (N, genome_length) jednego snapshotu"""
+        _, first_row, count = self.index[snapshot]
+        return self._genotypes[first_row:first_row + count]
+    
+    def positions(self, snapshot: int) -> np.ndarray:
+        """Położenia (N, 2) [x, y] jednego snapshotu"""
+        _, first_row, count = self.index[snapshot]
+        if self._positions is None:
+            return np.full((int(count), 2), -1, dtype=np.int32)
+        return self._positions[first_row:first_row + count]
+    
+    def __getitem__(self, snapshot: int) -> PopulationArrays:
+        positions = self.positions(snapshot)
+        genotypes = self.genotypes(snapshot)
+        return PopulationArrays(x=positions[:, 0], y=positions[:, 1], genotypes=genotypes,
+                                birth_time=np.zeros(len(genotypes), dtype=np.int32))
+    
+    def at_time(self, current_time: int) -> PopulationArrays:
+        """Snapshot z danej generacji (KeyError, jeśli nie został zapisany)"""
+        matches = np.flatnonzero(self.times == current_time)
+        if not len(matches):
+            raise KeyError(f"Brak snapshotu dla generacji {current_time}")
+        return self[int(matches[-1])]
+
+
+def read_genotype_snapshot(path: str, snapshot: int, genome_length: int = 8):
+    """
+    Odczytuje jeden snapshot zapisany przez GenotypeSnapshotWriter.
+    
+    Returns:
+        tuple: (czas, macierz genotypów (N, genome_length))
+    """
+    store = SnapshotStore(path, genome_length)
+    return int(store.times[snapshot]), np.array(store.genotypes(snapshot))
+
+
+class StreamingDataCollector:
+    """
+    Zbiera dane statystyczne przy stałym zużyciu pamięci.
+
+    Statystyki trafiają do prealokowanych tablic NumPy (po jednej na pole
+    SimulationStats), a genotypy - co snapshot_stride kroków - do
+    GenotypeSnapshotWriter zamiast do genotype_history w pamięci.
+    Z series_path każdy wiersz jest też dopisywany do pliku CSV (kolumny
+    EXPORT_SERIES, opróżniany co flush_every wierszy) - tak RunExporter
+    zapisuje series.csv. run_simulation używa go dla kluczy
+    'collector': 'streaming', 'snapshot_path' i 'export_path'.
+    """
+    def __init__(self, barrier: np.ndarray, steps: int,
+                 snapshot_path: str = None, snapshot_stride: int = 10, genome_length: int = None,
+                 series_path: str = None, flush_every: int = EXPORT_FLUSH_EVERY,
+                 fitness_name: str = 'distance'):
+        self.barrier = barrier
+        self.fitness_name = fitness_name
+        self.genome_length = genome_length
+        barrier_x = np.where(barrier[0])[0] if barrier is not None else []
+        self.barrier_pos = barrier_x[0] if len(barrier_x) > 0 else None
+        self.size = 0
+        self._arrays = {name: np.zeros(max(steps, 1), dtype=dtype)
+                        for name, dtype in STATS_FIELDS.items()}
+        self.snapshot_path = snapshot_path
+        self.snapshot_stride = snapshot_stride
+        self.snapshot_writer = None
+        self.series_path = series_path
+        self.flush_every = flush_every
+        self._series_file = None
+        self._pending = 0
+    
+    def collect(self, population, env: np.ndarray, current_time: int,
+               config: SimulationConfig = None, fitnesses: np.ndarray = None,
+               diversity: float = None):
+        """
+        Zbiera statystyki z danego kroku.
+        fitnesses - jak w DataCollector.collect; diversity - gotowa różnorodność
+        (np. DiversityTracker.diversity()). Pusta populacja daje wiersz zerowy.
+        """
+        pop_size = len(population)
+        if pop_size:
+            genotypes = population_genotypes(population)
+            positions = population_positions(population)
+        else:
+            genotypes = np.zeros((0, self.genome_length or 0), dtype=np.uint8)
+            positions = np.zeros((0, 2), dtype=np.int32)
+        if fitnesses is None:
+            fitnesses = population_fitness(population, env, self.fitness_name) if pop_size else np.zeros(0)
+        if diversity is None:
+            diversity = mean_hamming_diversity(genotypes) if pop_size else 0.0
+        if self.barrier_pos is not None:
+            left_pop = int((positions[:, 0] < self.barrier_pos).sum())
+        else:
+            left_pop = pop_size
+        
+        self._append_row(time=current_time, population_size=pop_size,
+                         mean_fitness=fitnesses.mean() if len(fitnesses) else 0.0,
+                         genetic_diversity=diversity, left_pop_size=left_pop,
+                         right_pop_size=pop_size - left_pop)
+        
+        # Snapshot genotypów na dysk co snapshot_stride kroków
+        if self.snapshot_path is not None and current_time % self.snapshot_stride == 0 \
+                and genotypes.shape[1]:
+            if self.snapshot_writer is None:
+                self.snapshot_writer = GenotypeSnapshotWriter(self.snapshot_path, genotypes.shape[1])
+            self.snapshot_writer.append(current_time, genotypes, positions)
+    
+    def _append_row(self, **values):
+        if self.size == len(self._arrays['time']):
+            for name, array in self._arrays.items():
+                self._arrays[name] = np.concatenate([array, np.zeros_like(array)])
+        for name, value in values.items():
+            self._arrays[name][self.size] = value
+        self.size += 1
+        if self.series_path is not None:
+            self._write_series_row(self.size - 1)
+    
+    def _write_series_row(self, row: int):
+        # Plik otwierany przy pierwszym wierszu, po ewentualnym resume()
+        if self._series_file is None:
+            self._series_file = open(self.series_path, 'w')
+            self._series_file.write(','.join(EXPORT_SERIES) + '\n')
+            for previous in range(row):
+                self._write_series_row(previous)
+        values = [self._arrays[field][row] for field in EXPORT_FIELDS.values()]
+        self._series_file.write(','.join(repr(float(value)) if isinstance(value, np.floating)
+                                         else str(int(value)) for value in values) + '\n')
+        self._pending += 1
+        if self._pending >= self.flush_every:
+            self._series_file.flush()
+            self._pending = 0
+    
+    def resume(self, current_time: int, collection: dict = None):
+        """
+        Wznowienie z checkpointu: snapshoty i wiersze series_path z czasem
+        >= current_time są usuwane, a pozostałe wiersze series_path (lub serie
+        z collection w formacie collection()) wpisywane na początek.
+        """
+        if self.snapshot_path is not None:
+            self.snapshot_writer = GenotypeSnapshotWriter(self.snapshot_path, self.genome_length)
+            self.snapshot_writer.truncate(current_time)
+        if self.series_path is not None and os.path.exists(self.series_path):
+            series = _read_series_csv(self.series_path)
+            kept = series['generation'] < current_time
+            for row in np.flatnonzero(kept):
+                self._append_row(**{field: series[name][row] for name, field in EXPORT_FIELDS.items()})
+        elif collection:
+            rows = len(collection['total_population'])
+            for row in range(rows):
+                self._append_row(time=current_time - rows + row,
+                                 **{field: collection[name][row]
+                                    for name, field in COLLECTION_FIELDS.items()})
+    
+    def last(self) -> dict:
+        """Ostatni zebrany wiersz statystyk"""
+        return {name: array[self.size - 1] for name, array in self._arrays.items()}
+    
+    def series(self) -> Dict[str, np.ndarray]:
+        """Serie statystyk (widoki na wypełnioną część tablic)"""
+        return {name: array[:self.size] for name, array in self._arrays.items()}
+    
+    def collection(self) -> Dict[str, np.ndarray]:
+        """Serie pod nazwami kluczy 'collection' z run_simulation (widoki)"""
+        return {name: self._arrays[field][:self.size] for name, field in COLLECTION_FIELDS.items()}
+    
+    def export_series(self) -> Dict[str, np.ndarray]:
+        """Serie pod nazwami kolumn EXPORT_SERIES (jak w series.csv)"""
+        return {name: self._arrays[field][:self.size] for name, field in EXPORT_FIELDS.items()}
+    
+    def close(self):
+        """Zamyka pliki snapshotów i series_path"""
+        if self.snapshot_writer is not None:
+            self.snapshot_writer.close()
+        if self._series_file is not None and not self._series_file.closed:
+            self._series_file.close()
+
+
+# =========================
+# Punkty kontrolne (checkpoint / resume)
+# =========================
+
+CHECKPOINT_PREFIX = 'checkpoint_'
+CHECKPOINT_ARRAYS = ('environment', 'barriers', 'x', 'y', 'genotypes', 'birth_time')
+
+
+def save_checkpoint(path: str, generation: int, environment: np.ndarray, barriers: np.ndarray,
+                    population, rng: np.random.Generator, collection: dict,
+                    genome_length: int = 8, keep_last: int = 1) -> str:
+    """
+    Zapisuje pełny stan symulacji jako katalog plików .npy.
+
+    Zapis trafia najpierw do katalogu tymczasowego, który jest następnie
+    przemianowywany, więc przerwanie w trakcie zapisu nie psuje ostatniego
+    poprawnego checkpointu. Pliki .npy można wczytać przez np.load(mmap_mode=...).
+
+    Args:
+        generation: numer następnej generacji do wykonania
+        population: lista Individual, PopulationArrays lub HaplotypePopulation
+        genome_length: długość genotypu (potrzebna dla pustej listy osobników)
+        keep_last: liczba zachowywanych najnowszych checkpointów
+
+    Returns:
+        str: ścieżka katalogu checkpointu
+    """
+    os.makedirs(path, exist_ok=True)
+    if isinstance(population, HaplotypePopulation):
+        population = population.to_arrays()
+    elif not isinstance(population, PopulationArrays):
+        population = PopulationArrays.from_individuals(population, genome_length)
+    final_dir = os.path.join(path, f"{CHECKPOINT_PREFIX}{generation:08d}")
+    tmp_dir = final_dir + '.tmp'
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    
+    arrays = {'environment': environment,
+              'barriers': barriers if barriers is not None else np.zeros((0, 0), dtype=bool),
+              'x': population.x, 'y': population.y,
+              'genotypes': population.genotypes, 'birth_time': population.birth_time}
+    for name, array in arrays.items():
+        np.save(os.path.join(tmp_dir, f"{name}.npy"), np.ascontiguousarray(array))
+    for name, values in collection.items():
+        np.save(os.path.join(tmp_dir, f"series_{name}.npy"), np.asarray(values))
+    
+    state = {'generation': generation,
+             'has_barriers': barriers is not None,
+             'genome_length': population.genotypes.shape[1],
+             'series': list(collection),
+             'rng_state': rng.bit_generator.state}
+    with open(os.path.join(tmp_dir, 'state.json'), 'w') as f:
+        json.dump(state, f)
+    
+    shutil.rmtree(final_dir, ignore_errors=True)
+    os.replace(tmp_dir, final_dir)
+    for old in list_checkpoints(path)[:-keep_last]:
+        shutil.rmtree(old, ignore_errors=True)
+    return final_dir
+
+
+def list_checkpoints(path: str) -> List[str]:
+    """Katalogi checkpointów w path, od najstarszego do najnowszego"""
+    if not os.path.isdir(path):
+        return []
+    names = sorted(name for name in os.listdir(path)
+                   if name.startswith(CHECKPOINT_PREFIX) and not name.endswith('.tmp'))
+    return [os.path.join(path, name) for name in names]
+
+
+def latest_checkpoint(path: str):
+    """Najnowszy checkpoint w path (None, jeśli brak)"""
+    checkpoints = list_checkpoints(path)
+    return checkpoints[-1] if checkpoints else None
+
+
+def load_checkpoint(checkpoint_dir: str, mmap_mode: str = 'c') -> dict:
+    """
+    Wczytuje checkpoint zapisany przez save_checkpoint.
+
+    Domyślny mmap_mode='c' mapuje pliki w trybie copy-on-write: wczytanie
+    dużego stanu jest natychmiastowe, a tablice pozostają zapisywalne.
+
+    Returns:
+        dict: generation, environment, barriers, population (PopulationArrays),
+              collection (słownik list) oraz rng_state
+    """
+    with open(os.path.join(checkpoint_dir, 'state.json')) as f:
+        state = json.load(f)
+    arrays = {name: np.load(os.path.join(checkpoint_dir, f"{name}.npy"), mmap_mode=mmap_mode)
+              for name in CHECKPOINT_ARRAYS}
+    collection = {name: np.load(os.path.join(checkpoint_dir, f"series_{name}.npy")).tolist()
+                  for name in state['series']}
+    return {'generation': state['generation'],
+            'environment': arrays['environment'],
+            'barriers': arrays['barriers'] if state['has_barriers'] else None,
+            'population': PopulationArrays(x=arrays['x'], y=arrays['y'],
+                                           genotypes=arrays['genotypes'],
+                                           birth_time=arrays['birth_time']),
+            'collection': collection,
+            'rng_state': state['rng_state']}
+
+
+# =========================
+# Eksport wyników (kolumnowy zbiór danych)
+# =========================
+
+# Kolumny końcowej populacji (jeden plik .npy na kolumnę w katalogu population/)
+EXPORT_POPULATION_COLUMNS = ('x', 'y', 'birth_time', 'genotypes', 'group')
+
+
+def export_config_key(config: dict) -> str:
+    """Klucz konfiguracji w zbiorze danych: skrót resolved_config bez ziarna"""
+    resolved = resolved_config(config)
+    resolved.pop('seed', None)
+    return config_hash(resolved, ENGINE_VERSION)
+
+
+def _write_atomic(path: str, text: str):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+def _read_series_csv(path: str) -> Dict[str, np.ndarray]:
+    """Kolumny series.csv jako tablice (także dla przerwanego uruchomienia)"""
+    table = np.loadtxt(path, delimiter=',', skiprows=1, ndmin=2).reshape(-1, len(EXPORT_SERIES))
+    return {name: table[:, i].astype(np.int64) if np.issubdtype(STATS_FIELDS[field], np.integer)
+            else table[:, i] for i, (name, field) in enumerate(EXPORT_FIELDS.items())}
+
+
+class RunExporter:
+    """
+    Zapis wyników jednego uruchomienia do zbioru danych.
+
+    Układ katalogu path (wspólnego dla wielu przeglądów parametrów):
+        <klucz konfiguracji>/config.json
+        <klucz konfiguracji>/seed_<ziarno>/series.csv  - wiersz na generację, dopisywany w trakcie
+        <klucz konfiguracji>/seed_<ziarno>/series.npz  - te same serie kolumnowo (po zakończeniu)
+        <klucz konfiguracji>/seed_<ziarno>/population/ - końcowa populacja, plik .npy na kolumnę
+
+    Klucz konfiguracji to export_config_key (bez ziarna), więc powtórzenia
+    jednej konfiguracji trafiają do wspólnego katalogu. Wiersze series.csv
+    dopisuje StreamingDataCollector (series_path=series_path, obcinanie
+    przy wznowieniu w jego resume()). Odczyt: ResultsDataset.
+
+    Args:
+        path: katalog zbioru danych
+        config: konfiguracja uruchomienia (jak w run_simulation)
+        start_generation: wznowienie - series.csv zostaje do obcięcia przez kolektor
+        flush_every: co ile generacji series.csv trafia na dysk
+    """
+    def __init__(self, path: str, config: dict, start_generation: int = None,
+                 flush_every: int = EXPORT_FLUSH_EVERY):
+        config = dict(RUN_DEFAULTS, **config)
+        self.config_key = export_config_key(config)
+        config_dir = os.path.join(path, self.config_key)
+        seed = config['seed']
+        run_name = f"seed_{seed}" if seed is not None else f"run_{time.time_ns()}"
+        self.run_dir = os.path.join(config_dir, run_name)
+        self.series_path = os.path.join(self.run_dir, 'series.csv')
+        self.flush_every = flush_every
+        os.makedirs(self.run_dir, exist_ok=True)
+        _write_atomic(os.path.join(config_dir, 'config.json'), canonical_json(resolved_config(config)))
+        
+        # Nowe uruchomienie zastępuje poprzedni wynik; wznowienie zachowuje series.csv
+        stale_names = ['series.npz', 'population']
+        if start_generation is None:
+            stale_names.append('series.csv')
+        for name in stale_names:
+            stale = os.path.join(self.run_dir, name)
+            if os.path.isdir(stale):
+                shutil.rmtree(stale)
+            elif os.path.exists(stale):
+                os.remove(stale)
+    
+    def finish(self, populations: list, series: Dict[str, np.ndarray], genome_length: int = 8):
+        """Zapisuje series.npz (series jak StreamingDataCollector.export_series()) i końcową populację"""
+        tmp_path = os.path.join(self.run_dir, f"series.{os.getpid()}.tmp.npz")
+        np.savez(tmp_path, **{name: values.astype(np.int64) if np.issubdtype(values.dtype, np.integer)
+                              else values for name, values in series.items()})
+        os.replace(tmp_path, os.path.join(self.run_dir, 'series.npz'))
+        
+        columns = {name: [] for name in EXPORT_POPULATION_COLUMNS}
+        for group, population in enumerate(populations):
+            if isinstance(population, HaplotypePopulation):
+                population = population.to_arrays()
+            elif not isinstance(population, PopulationArrays):
+                population = PopulationArrays.from_individuals(population, genome_length)
+            for name in EXPORT_POPULATION_COLUMNS[:-1]:
+                columns[name].append(getattr(population, name))
+            columns['group'].append(np.full(len(population), group, dtype=np.int32))
+        if not populations:
+            empty = PopulationArrays.empty(genome_length)
+            columns = {name: [getattr(empty, name)] for name in EXPORT_POPULATION_COLUMNS[:-1]}
+            columns['group'] = [np.zeros(0, dtype=np.int32)]
+        population_dir = os.path.join(self.run_dir, 'population')
+        tmp_dir = f"{population_dir}.{os.getpid()}.tmp"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+        for name, parts in columns.items():
+            np.save(os.path.join(tmp_dir, f"{name}.npy"), np.concatenate(parts))
+        os.replace(tmp_dir, population_dir)
+
+
+class ExportedRun:
+    """Jedno uruchomienie w zbiorze danych (odczyt leniwy: pliki czytane przy dostępie)"""
+    def __init__(self, run_dir: str, config_key: str):
+        self.run_dir = run_dir
+        self.config_key = config_key
+        self.name = os.path.basename(run_dir)
+    
+    @property
+    def seed(self):
+        return int(self.name[len('seed_'):]) if self.name.startswith('seed_') else None
+    
+    @property
+    def complete(self) -> bool:
+        """Czy uruchomienie zakończyło się (series.npz i populacja zapisane)"""
+        return os.path.exists(os.path.join(self.run_dir, 'series.npz'))
+    
+    def series(self) -> Dict[str, np.ndarray]:
+        """Serie generacji (EXPORT_SERIES); dla trwającego uruchomienia z series.csv"""
+        if self.complete:
+            with np.load(os.path.join(self.run_dir, 'series.npz')) as data:
+                return {name: data[name] for name in data.files}
+        return _read_series_csv(os.path.join(self.run_dir, 'series.csv'))
+    
+    def population(self, mmap_mode: str = 'r') -> Tuple[PopulationArrays, np.ndarray]:
+        """Końcowa populacja (kolumny mapowane w pamięci) i numer grupy każdego osobnika"""
+        columns = {name: np.load(os.path.join(self.run_dir, 'population', f"{name}.npy"),
+                                 mmap_mode=mmap_mode)
+                   for name in EXPORT_POPULATION_COLUMNS}
+        group = columns.pop('group')
+        return PopulationArrays(**columns), group
+    
+    def populations(self) -> List[PopulationArrays]:
+        """Końcowe populacje pogrupowane jak w wyniku run_simulation"""
+        population, group = self.population()
+        return [population.take(group == g) for g in np.unique(group)]
+
+
+class ResultsDataset:
+    """
+    Odczyt zbioru danych zapisanego przez RunExporter (klucz 'export_path').
+
+    Katalogi są przeglądane przy każdym wywołaniu, więc widać także
+    uruchomienia dopisane przez trwające przeglądy parametrów.
+    """
+    def __init__(self, path: str):
+        self.path = path
+    
+    def config_keys(self) -> List[str]:
+        """Klucze konfiguracji obecnych w zbiorze"""
+        if not os.path.isdir(self.path):
+            return []
+        return sorted(name for name in os.listdir(self.path)
+                      if os.path.exists(os.path.join(self.path, name, 'config.json')))
+    
+    def config(self, config_key: str) -> dict:
+        with open(os.path.join(self.path, config_key, 'config.json')) as f:
+            return json.load(f)
+    
+    def runs(self, config=None) -> List[ExportedRun]:
+        """Uruchomienia jednej konfiguracji (słownik lub klucz) albo wszystkie"""
+        if config is None:
+            keys = self.config_keys()
+        else:
+            keys = [config if isinstance(config, str) else export_config_key(config_to_dict(config))]
+        runs = []
+        for key in keys:
+            config_dir = os.path.join(self.path, key)
+            if not os.path.isdir(config_dir):
+                continue
+            runs.extend(ExportedRun(os.path.join(config_dir, name), key)
+                        for name in sorted(os.listdir(config_dir))
+                        if os.path.exists(os.path.join(config_dir, name, 'series.csv')))
+        return runs
+    
+    def stack(self, name: str, config) -> np.ndarray:
+        """Seria name zakończonych uruchomień konfiguracji jako tablica (uruchomienia, generacje)"""
+        return np.array([run.series()[name] for run in self.runs(config) if run.complete])
+
+
+# =========================
+# Klastrowanie gatunków (haplotypy + union-find)
+# =========================
+
+# Maksymalny rozmiar bloku odległości (bajty) w find_close_haplotype_pairs
+CLUSTER_BLOCK_BYTES = 16 * 2**20
+
+if hasattr(np, 'bitwise_count'):
+    _popcount = np.bitwise_count
+else:
+    _POPCOUNT_TABLE = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+    
+    def _popcount(values: np.ndarray) -> np.ndarray:
+        bytes_ = values.view(np.uint8).reshape(values.shape + (values.itemsize,))
+        return _POPCOUNT_TABLE[bytes_].sum(axis=-1)
+
+
+def unique_haplotypes(genotypes: np.ndarray):
+    """
+    Zwija identyczne genotypy w unikalne haplotypy.
+
+    Returns:
+        tuple: (haplotypy (H, L), indeks haplotypu każdego osobnika (N,), liczebności (H,))
+    """
+    genotypes = np.ascontiguousarray(genotypes, dtype=np.uint8)
+    rows = genotypes.view(np.dtype((np.void, genotypes.shape[1]))).ravel()
+    _, first, inverse, counts = np.unique(rows, return_index=True, return_inverse=True,
+                                          return_counts=True)
+    return genotypes[first], inverse.ravel(), counts
+
+
+def pack_haplotypes(haplotypes: np.ndarray, num_alleles: int = NUM_ALLELES) -> np.ndarray:
+    """
+    Kodowanie one-hot alleli spakowane w słowa uint64 (H, ceil(L * num_alleles / 64)).
+    Dla dwóch haplotypów popcount(a ^ b) / 2 to liczba różniących się loci.
+    """
+    one_hot = haplotypes[:, :, None] == np.arange(num_alleles, dtype=haplotypes.dtype)
+    packed = np.packbits(one_hot.reshape(len(haplotypes), -1), axis=1)
+    # Dopełnienie do pełnych słów 64-bitowych (XOR i popcount na uint64)
+    padding = -packed.shape[1] % 8
+    packed = np.pad(packed, ((0, 0), (0, padding)))
+    return np.ascontiguousarray(packed).view(np.uint64)
+
+
+def max_differing_loci(threshold: float, genome_length: int) -> int:
+    """Największa liczba różnych loci k, dla której k / L < threshold (jak pdist 'hamming')"""
+    k = np.arange(genome_length + 1)
+    allowed = k[k / genome_length < threshold]
+    return int(allowed[-1]) if len(allowed) else -1
+
+
+def find_close_haplotype_pairs(haplotypes: np.ndarray, threshold: float,
+                               block_bytes: int = CLUSTER_BLOCK_BYTES):
+    """
+    Generator par (i, j), i < j, haplotypów o odległości Hamminga < threshold.
+
+    Odległości liczone są blokami wierszy na bitowo spakowanych haplotypach,
+    więc pamięć zależy od rozmiaru bloku, a nie od kwadratu liczby haplotypów.
+    """
+    num_haplotypes, genome_length = haplotypes.shape
+    max_diff = max_differing_loci(threshold, genome_length)
+    if max_diff < 0 or num_haplotypes < 2:
+        return
+    packed = pack_haplotypes(haplotypes)
+    block = max(1, block_bytes // (8 * num_haplotypes))
+    for start in range(0, num_haplotypes - 1, block):
+        stop = min(start + block, num_haplotypes)
+        # Tylko kolumny j > start (górny trójkąt); sumowanie po kolejnych słowach
+        differing = np.zeros((stop - start, num_haplotypes - start - 1), dtype=np.int32)
+        for word in range(packed.shape[1]):
+            column = packed[start + 1:, word]
+            differing += _popcount(packed[start:stop, word, None] ^ column[None, :])
+        differing //= 2
+        rows, cols = np.nonzero(differing <= max_diff)
+        i = rows + start
+        j = cols + start + 1
+        upper = j > i
+        yield i[upper], j[upper]
+
+
+def union_find_components(n: int, pairs) -> np.ndarray:
+    """
+    Spójne składowe grafu o n wierzchołkach (union-find na tablicach).
+
+    pairs: iterowalne pary tablic (u, v) krawędzi. Łączenie (hooking)
+    wykonywane jest wsadowo dla całej paczki krawędzi, a ścieżki są
+    kompresowane przez skoki wskaźników (parent = parent[parent]).
+
+    Returns:
+        np.ndarray: (n,) reprezentant (najmniejszy indeks) składowej wierzchołka
+    """
+    parent = np.arange(n)
+    
+    def compress():
+        while True:
+            grandparent = parent[parent]
+            if np.array_equal(grandparent, parent):
+                return
+            parent[:] = grandparent
+    
+    for u, v in pairs:
+        while len(u):
+            pu, pv = parent[u], parent[v]
+            differ = pu != pv
+            if not differ.any():
+                break
+            u, v, pu, pv = u[differ], v[differ], pu[differ], pv[differ]
+            np.minimum.at(parent, np.maximum(pu, pv), np.minimum(pu, pv))
+            compress()
+    compress()
+    return parent
+
+
+@dataclass
+class SpeciesClusters:
+    """Wynik klastrowania gatunków (cluster_species)"""
+    labels: np.ndarray       # (N,) numer klastra osobnika
+    sizes: np.ndarray        # (K,) liczebność klastrów
+    centroids: np.ndarray    # (K, L) średnia wartość allelu w każdym locus
+    mean_distance: float     # średnia odległość Hamminga (jak mean(squareform(pdist)))
+    
+    @property
+    def num_clusters(self) -> int:
+        return len(self.sizes)
+    
+    def members(self, cluster: int) -> np.ndarray:
+        """Indeksy osobników należących do klastra"""
+        return np.flatnonzero(self.labels == cluster)
+
+
+def cluster_species(genotypes: np.ndarray, threshold: float = 0.3) -> SpeciesClusters:
+    """
+    Klastrowanie gatunków jako spójne składowe grafu "odległość < threshold".
+
+    Identyczne genotypy są zwijane w haplotypy (alfabet alleli 0..2 daje ich
+    niewiele), pary bliskich haplotypów wyznaczane są blokowo na bitach,
+    a składowe - przez union-find. Klastry numerowane są w kolejności
+    pierwszego wystąpienia osobnika.
+    """
+    genotypes = np.asarray(genotypes)
+    n = len(genotypes)
+    if n == 0:
+        return SpeciesClusters(labels=np.zeros(0, dtype=np.int64), sizes=np.zeros(0, dtype=np.int64),
+                               centroids=np.zeros((0, genotypes.shape[1])), mean_distance=0.0)
+    
+    haplotypes, inverse, _ = unique_haplotypes(genotypes)
+    roots = union_find_components(len(haplotypes), find_close_haplotype_pairs(haplotypes, threshold))
+    
+    # Numeracja klastrów w kolejności pierwszego osobnika
+    individual_roots = roots[inverse]
+    _, first, root_labels = np.unique(individual_roots, return_index=True, return_inverse=True)
+    order = np.argsort(np.argsort(first))
+    labels = order[root_labels.ravel()]
+    
+    sizes = np.bincount(labels)
+    centroids = np.zeros((len(sizes), genotypes.shape[1]))
+    np.add.at(centroids, labels, genotypes)
+    centroids /= sizes[:, None]
+    mean_distance = mean_hamming_diversity(genotypes) * (n - 1) / n
+    return SpeciesClusters(labels=labels, sizes=sizes, centroids=centroids,
+                           mean_distance=mean_distance)
 
 
 # =========================
 # Analiza genetyki populacji
 # =========================
 
-def calculate_population_genetic_distance(population_left: List[Individual], 
-                                         population_right: List[Individual]) -> float:
-    """Oblicza średnią odległość genetyczną między dwiema populacjami."""
-    if not population_left or not population_right:
+def calculate_population_genetic_distance(population_left, population_right) -> float:
+    """
+    Oblicza średnią odległość genetyczną między dwiema populacjami
+    (listy Individual, PopulationArrays lub snapshoty z SnapshotStore).
+    """
+    if not len(population_left) or not len(population_right):
         return 0
     
-    genotypes_left = np.array([ind.genotype for ind in population_left])
-    genotypes_right = np.array([ind.genotype for ind in population_right])
+    genotypes_left = population_genotypes(population_left)
+    genotypes_right = population_genotypes(population_right)
     
     # Średnia różnica w genotypach
     mean_left = np.mean(genotypes_left, axis=0)
@@ -281,153 +1807,48 @@ def calculate_population_genetic_distance(population_left: List[Individual],
     return genetic_distance
 
 
-def detect_species_clusters(population: List[Individual], 
-                           threshold: float = 0.3) -> Tuple[List[List[Individual]], float]:
+def detect_species_clusters(population, threshold: float = 0.3) -> Tuple[list, float]:
     """
     Detektuje potencjalne skupiska (incipient species) na podstawie podobieństwa genetycznego.
     Zwraca listę klastrów oraz średnią różnorodność wewnątrz i między klastrami.
+    population: lista Individual, PopulationArrays lub snapshot z SnapshotStore
+    (wtedy klastry są PopulationArrays).
+    
+    Klastry to spójne składowe grafu osobników o odległości < threshold
+    (patrz cluster_species - także liczebności i centroidy klastrów).
     """
     if len(population) < 2:
         return [population], 0
     
-    genotypes = np.array([ind.genotype for ind in population])
-    distances = squareform(pdist(genotypes, metric='hamming'))
-    
-    # Prosty algorytm klastrowania: osobniki o podobieństwie > (1-threshold) 
-    # są w tym samym klastrze
-    clusters = []
-    assigned = set()
-    
-    for i, ind in enumerate(population):
-        if i in assigned:
-            continue
-        
-        cluster = [ind]
-        assigned.add(i)
-        
-        for j in range(i + 1, len(population)):
-            if j in assigned:
-                continue
-            if distances[i, j] < threshold:
-                cluster.append(population[j])
-                assigned.add(j)
-        
-        clusters.append(cluster)
+    result = cluster_species(population_genotypes(population), threshold)
+    order = np.argsort(result.labels, kind='stable')
+    members = np.split(order, np.cumsum(result.sizes)[:-1])
     
-    return clusters, np.mean(distances)
+    if isinstance(population, PopulationArrays):
+        clusters = [population.take(cluster) for cluster in members]
+    else:
+        clusters = [[population[j] for j in cluster] for cluster in members]
+    return clusters, result.mean_distance
 
 
 # =========================
-# Wizualizacja
+# Wizualizacja (import leniwy)
 # =========================
 
-def plot_simulation_snapshot(population: List[Individual], env: np.ndarray,
-                            barrier: np.ndarray, title: str = "Snapshot"):
-    """Rysuje snapshota stanu symulacji"""
-    height, width = env.shape
-    
-    fig, axes = plt.subplots(1, 2, figsize=(14, 6))
-    
-    # Lewy panel: Środowisko i rozmieszczenie populacji
-    ax = axes[0]
-    im = ax.imshow(env, cmap='YlGn', origin='lower', alpha=0.3)
-    
-    # Narysuj bariery
-    for x in range(width):
-        for y in range(height):
-            if barrier[y, x]:
-                ax.add_patch(Rectangle((x - 0.5, y - 0.5), 1, 1, 
-                                       fill=True, color='red', alpha=0.5))
-    
-    # Narysuj osobniki (kolor zależy od genotypu)
-    if population:
-        xs = [ind.x for ind in population]
-        ys = [ind.y for ind in population]
-        colors = [np.mean(ind.genotype) for ind in population]
-        scatter = ax.scatter(xs, ys, c=colors, cmap='RdYlBu', s=30, alpha=0.6, edgecolors='black', linewidth=0.5)
-        plt.colorbar(scatter, ax=ax, label='Średni genotyp')
-    
-    ax.set_xlabel('X')
-    ax.set_ylabel('Y')
-    ax.set_title(f'{title}\nRozmieszczenie populacji (liczba: {len(population)})')
-    ax.set_xlim(-0.5, width - 0.5)
-    ax.set_ylim(-0.5, height - 0.5)
-    
-    # Prawy panel: Histogram genotypów
-    ax = axes[1]
-    if population:
-        all_alleles = np.concatenate([ind.genotype for ind in population])
-        ax.hist(all_alleles, bins=3, color='skyblue', edgecolor='black', alpha=0.7)
-        ax.set_xlabel('Wartość allelu')
-        ax.set_ylabel('Liczba alleli')
-        ax.set_title('Rozkład alleli w populacji')
-    
-    plt.tight_layout()
-    return fig
-
-
-def plot_simulation_results(collector: DataCollector, barrier: np.ndarray, 
-                           config: SimulationConfig):
-    """Rysuje wykresy wyników symulacji"""
-    if not collector.stats:
-        print("Brak danych do wykreślenia!")
-        return
-    
-    times = [s.time for s in collector.stats]
-    pop_sizes = [s.population_size for s in collector.stats]
-    fitnesses = [s.mean_fitness for s in collector.stats]
-    diversities = [s.genetic_diversity for s in collector.stats]
-    left_pops = [s.left_pop_size for s in collector.stats]
-    right_pops = [s.right_pop_size for s in collector.stats]
-    
-    fig, axes = plt.subplots(2, 2, figsize=(14, 10))
-    
-    # Liczba osobników w populacji
-    ax = axes[0, 0]
-    ax.plot(times, pop_sizes, 'b-', linewidth=2, label='Razem')
-    if config.barrier_type != "none":
-        ax.plot(times, left_pops, 'r--', linewidth=1.5, label='Lewa strona')
-        ax.plot(times, right_pops, 'g--', linewidth=1.5, label='Prawa strona')
-    ax.set_xlabel('Czas (kroki)')
-    ax.set_ylabel('Liczba osobników')
-    ax.set_title('Dynamika liczebności populacji')
-    ax.legend()
-    ax.grid(True, alpha=0.3)
-    
-    # Średnie dopasowanie
-    ax = axes[0, 1]
-    ax.plot(times, fitnesses, 'g-', linewidth=2)
-    ax.set_xlabel('Czas (kroki)')
-    ax.set_ylabel('Średnie dopasowanie')
-    ax.set_title('Ewolucja średniego dopasowania')
-    ax.grid(True, alpha=0.3)
-    
-    # Różnorodność genetyczna
-    ax = axes[1, 0]
-    ax.plot(times, diversities, 'purple', linewidth=2)
-    ax.set_xlabel('Czas (kroki)')
-    ax.set_ylabel('Różnorodność genetyczna')
-    ax.set_title('Zmienność genetyczna w populacji')
-    ax.grid(True, alpha=0.3)
-    
-    # Liczba osobników po każdej stronie bariery (jeśli istnieje)
-    ax = axes[1, 1]
-    if config.barrier_type != "none" and (any(left_pops) or any(right_pops)):
-        ax.stackplot(times, left_pops, right_pops, 
-                    labels=['Lewa strona', 'Prawa strona'],
-                    colors=['red', 'green'], alpha=0.6)
-        ax.set_xlabel('Czas (kroki)')
-        ax.set_ylabel('Liczba osobników')
-        ax.set_title('Rozkład populacji w zależności od bariery')
-        ax.legend(loc='upper left')
-    else:
-        ax.text(0.5, 0.5, 'Brak bariery', ha='center', va='center', 
-               transform=ax.transAxes, fontsize=12)
-        ax.set_title('Rozkład populacji')
-    ax.grid(True, alpha=0.3)
-    
-    plt.tight_layout()
-    return fig
+# Rastry i funkcje rysujące są w module wizualizacja (importuje matplotlib).
+# Dostępne są też jako symulacja.<nazwa>; moduł ładowany jest dopiero przy
+# pierwszym odwołaniu, więc sam rdzeń symulacji nie importuje matplotlib.
+VISUALIZATION_NAMES = ('RASTER_TOP_HAPLOTYPES', 'cell_indices', 'merge_populations', 'density_raster',
+                       'mean_genotype_raster', 'dominant_haplotype_raster', 'draw_barrier_overlay',
+                       'draw_haplotype_raster', 'plot_simulation_snapshot', 'plot_simulation_results',
+                       'visualize_comparison')
+
+
+def __getattr__(name):
+    if name in VISUALIZATION_NAMES:
+        import wizualizacja
+        return getattr(wizualizacja, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 # =========================
@@ -440,10 +1861,11 @@ def run_simulation(config: SimulationConfig = None, verbose: bool = True):
         config = SimulationConfig()
     
     # Inicjalizacja
-    env, barrier = init_environment(config.height, config.width, config.barrier_type)
+    rng = make_rng(config.seed)
+    env, barrier = init_environment(config.height, config.width, config.barrier_type, rng)
     population = init_population(config.num_individuals, config.height, 
-                                config.width, config.genome_length)
-    collector = DataCollector(barrier)
+                                config.width, config.genome_length, rng=rng)
+    collector = DataCollector(barrier, fitness_name=config.fitness)
     
     if verbose:
         print(f"=== SYMULACJA FORMOWANIA SIĘ GATUNKÓW ===")
@@ -457,7 +1879,7 @@ def run_simulation(config: SimulationConfig = None, verbose: bool = True):
     
     # Główna pętla
     for t in range(config.steps):
-        population = simulation_step(population, env, barrier, t, config)
+        population = simulation_step(population, env, barrier, t, config, rng)
         collector.collect(population, env, t, config)
         
         if verbose and t % 20 == 0:
@@ -477,6 +1899,9 @@ def run_simulation(config: SimulationConfig = None, verbose: bool = True):
 # =========================
 
 if __name__ == "__main__":
+    import matplotlib.pyplot as plt
+    from wizualizacja import plot_simulation_snapshot, plot_simulation_results
+    
     # Test 1: Symulacja z pionową barierą
     print("\n" + "="*60)
     print("TEST 1: SYMULACJA Z PIONOWĄ BARIERĄ")
@@ -548,13 +1973,15 @@ if __name__ == "__main__":
 # Inicjalizacja populacji
 # =========================
 
-def init_population(num_individuals: int, height: int, width: int, genome_length: int):
+def init_population(num_individuals: int, height: int, width: int, genome_length: int,
+                    rng: np.random.Generator = None):
     """Losowo rozmieszcza osobniki i nadaje im losowe genotypy."""
+    rng = make_rng(rng)
     population = []
     for _ in range(num_individuals):
-        x = random.randrange(width)
-        y = random.randrange(height)
-        genotype = np.random.randint(0, 3, size=genome_length)
+        x = int(rng.integers(width))
+        y = int(rng.integers(height))
+        genotype = rng.integers(0, 3, size=genome_length)
         population.append(Individual(x=x, y=y, genotype=genotype))
     return population
 
@@ -588,13 +2015,14 @@ def fitness(ind: Individual, env_value: int):
     return 1.0 / (1.0 + diff)
 
 
-def mutate(genotype: np.ndarray, p_mut: float):
+def mutate(genotype: np.ndarray, p_mut: float, rng: np.random.Generator = None):
     """Mutacje genotypu: losowa zmiana wybranych genów."""
+    rng = make_rng(rng)
     new_genotype = genotype.copy()
     for i in range(len(new_genotype)):
-        if random.random() < p_mut:
+        if rng.random() < p_mut:
             # losowa nowa wartość genu z zakresu 0..2
-            new_genotype[i] = random.randint(0, 2)
+            new_genotype[i] = rng.integers(0, 3)
     return new_genotype
 
 
@@ -604,50 +2032,598 @@ def mutate(genotype: np.ndarray, p_mut: float):
 
 def simulation_step(population, env, barrier,
                     p_mig=0.2, p_base_repro=0.1, p_mut=0.01,
-                    max_per_cell=20):
+                    max_per_cell=20, tracker=None, rng=None, profiler=None, fitness=None):
     height, width = env.shape
+    rng = make_rng(rng)
+    if not population:
+        # Pusty wektor dopasowania, żeby statystyki nie powtarzały poprzedniej generacji
+        if fitness is not None:
+            fitness.last = np.zeros(0)
+        return population
+    if profiler is not None:
+        profiler.start()
+
+    # 1. Migracja (wsadowo dla całej populacji, patrz migration_kernel)
+    xs = np.fromiter((ind.x for ind in population), dtype=np.int32, count=len(population))
+    ys = np.fromiter((ind.y for ind in population), dtype=np.int32, count=len(population))
+    moved = migration_kernel(xs, ys, barrier, p_mig, rng)
+    for i in moved:
+        population[i].x, population[i].y = int(xs[i]), int(ys[i])
+    if profiler is not None:
+        profiler.lap('migration', migrants=len(moved))
+
+    # 2. Rozród + mutacje (wsadowo, patrz reproduction_kernel);
+    #    sumy genotypów zapamiętane w osobnikach, liczone tylko dla potomków
+    genotypes = np.array([ind.genotype for ind in population])
+    sums = np.fromiter((ind.genotype_sum() for ind in population), dtype=np.int64, count=len(population))
+    fitness = fitness or FitnessEvaluator(genotypes.shape[1])
+    fit = fitness(sums, env[ys, xs])
+    parents, child_genotypes = reproduction_kernel(genotypes, None, p_base_repro, p_mut, rng,
+                                                   fitness_values=fit)
+    child_sums = child_genotypes.sum(axis=1)
+    offspring = [Individual(x=population[i].x, y=population[i].y, genotype=genotype, sum=int(child_sum))
+                 for i, genotype, child_sum in zip(parents, child_genotypes, child_sums)]
+
+    # 3. Dodanie potomków
+    population.extend(offspring)
+    if profiler is not None:
+        profiler.lap('reproduction', births=len(parents))
+
+    # 4. Regulacja liczebności w komórkach (kapacity limit, patrz capacity_kernel)
+    #    potomkowie zajmują komórki swoich rodziców
+    all_xs = np.concatenate([xs, xs[parents]])
+    all_ys = np.concatenate([ys, ys[parents]])
+    keep = capacity_kernel(all_xs, all_ys, width, max_per_cell, rng)
+    
+    # Aktualizacja częstości alleli o narodziny i zgony (DiversityTracker)
+    if tracker is not None:
+        removed = _removed_mask(len(population), keep)
+        tracker.add(child_genotypes)
+        tracker.remove(np.concatenate([genotypes, child_genotypes])[removed])
+
+    new_population = [population[i] for i in keep]
+    if profiler is not None:
+        profiler.lap('capacity', culled=len(population) - len(keep),
+                     cells_over_capacity=count_overfull_cells(all_xs, all_ys, width, max_per_cell))
+    return new_population
+
+
+# =========================
+# Jeden krok symulacji (populacja tablicowa)
+# =========================
+
+def simulation_step_arrays(population: PopulationArrays, env, barrier, current_time=0,
+                           p_mig=0.2, p_base_repro=0.1, p_mut=0.01,
+                           max_per_cell=20, tracker: DiversityTracker = None,
+                           rng: np.random.Generator = None,
+                           profiler: StepProfiler = None,
+                           fitness: FitnessEvaluator = None) -> PopulationArrays:
+    """
+    Jeden krok symulacji na populacji tablicowej.
+
+    Etapy są takie same jak w simulation_step (migracja, rozród z mutacją,
+    regulacja liczebności), ale każdy wykonywany jest jedną operacją na
+    całych tablicach zamiast pętli po osobnikach. Opcjonalny tracker
+    otrzymuje genotypy narodzonych i usuniętych osobników. Dopasowanie
+    liczone jest z zapamiętanych sum genotypów przez FitnessEvaluator
+    (fitness.last - wektor współdzielony ze statystykami).
+    """
+    rng = make_rng(rng)
+    if profiler is not None:
+        profiler.start()
 
     # 1. Migracja
-    for ind in population:
-        if random.random() < p_mig:
-            neighbors = get_neighbors(ind.x, ind.y, width, height)
-            if neighbors:
-                new_x, new_y = random.choice(neighbors)
-                # ruch zabroniony, jeśli to bariera
-                if not barrier[new_y, new_x]:
-                    ind.x, ind.y = new_x, new_y
-
-    # 2. Rozród + mutacje (tworzymy listę potomków)
-    offspring = []
-    for ind in population:
-        env_val = env[ind.y, ind.x]
-        fit = fitness(ind, env_val)
-        # prawdopodobieństwo rozrodu zależy od dopasowania
-        p_repro = p_base_repro * fit
-        if random.random() < p_repro:
-            child_genotype = mutate(ind.genotype, p_mut)
-            offspring.append(Individual(x=ind.x, y=ind.y, genotype=child_genotype))
+    moved = migration_kernel(population.x, population.y, barrier, p_mig, rng)
+    if profiler is not None:
+        profiler.lap('migration', migrants=len(moved))
+
+    return local_step_arrays(population, env, current_time, p_base_repro=p_base_repro,
+                             p_mut=p_mut, max_per_cell=max_per_cell, tracker=tracker,
+                             rng=rng, profiler=profiler, fitness=fitness)
+
+
+def local_step_arrays(population: PopulationArrays, env, current_time=0,
+                      p_base_repro=0.1, p_mut=0.01, max_per_cell=20,
+                      tracker: DiversityTracker = None, rng: np.random.Generator = None,
+                      profiler: StepProfiler = None,
+                      fitness: FitnessEvaluator = None) -> PopulationArrays:
+    """
+    Etapy kroku simulation_step_arrays po migracji (rozród z mutacją i regulacja
+    liczebności). Wszystkie działają w obrębie komórki, więc można je wykonać
+    osobno na fragmencie siatki (env i współrzędne osobników lokalne dla fragmentu).
+    """
+    height, width = env.shape
+    rng = make_rng(rng)
+
+    # 2. Rozród + mutacje (sumy genotypów liczone tylko dla nowych osobników)
+    fitness = fitness or FitnessEvaluator(population.genotypes.shape[1])
+    fit = fitness(population.genotype_sums(), env[population.y, population.x])
+    parents, child_genotypes = reproduction_kernel(population.genotypes, None,
+                                                   p_base_repro, p_mut, rng, fitness_values=fit)
+    offspring = PopulationArrays(x=population.x[parents], y=population.y[parents],
+                                 genotypes=child_genotypes,
+                                 birth_time=np.full(len(parents), current_time, dtype=np.int32),
+                                 sums=child_genotypes.sum(axis=1, dtype=np.int32))
 
     # 3. Dodanie potomków
-    population.extend(offspring)
+    population = population.concat(offspring)
+    if profiler is not None:
+        profiler.lap('reproduction', births=len(parents))
 
-    # 4. Regulacja liczebności w komórkach (kapacity limit)
-    #    grupujemy osobniki wg komórki i przycinamy do max_per_cell
-    cell_map = {}
-    for ind in population:
-        cell_map.setdefault((ind.x, ind.y), []).append(ind)
+    # 4. Regulacja liczebności w komórkach
+    keep = capacity_kernel(population.x, population.y, width, max_per_cell, rng)
+    
+    if tracker is not None:
+        tracker.add(child_genotypes)
+        tracker.remove(population.genotypes[_removed_mask(len(population), keep)])
 
-    new_population = []
-    for cell, inds in cell_map.items():
-        if len(inds) <= max_per_cell:
-            new_population.extend(inds)
-        else:
-            # wybieramy losowo max_per_cell osobników (można też wg dopasowania)
-            new_population.extend(random.sample(inds, max_per_cell))
+    new_population = population.take(keep)
+    if profiler is not None:
+        profiler.lap('capacity', culled=len(population) - len(keep),
+                     cells_over_capacity=count_overfull_cells(population.x, population.y,
+                                                              width, max_per_cell))
+    return new_population
+
+
+# =========================
+# Jeden krok symulacji (populacja haplotypowa)
+# =========================
+
+def simulation_step_haplotypes(population: HaplotypePopulation, env, barrier, current_time=0,
+                               p_mig=0.2, p_base_repro=0.1, p_mut=0.01,
+                               max_per_cell=20, tracker: DiversityTracker = None,
+                               rng: np.random.Generator = None,
+                               profiler: StepProfiler = None,
+                               fitness: FitnessEvaluator = None) -> HaplotypePopulation:
+    """
+    Jeden krok symulacji na populacji haplotypowej.
+
+    Etapy jak w simulation_step_arrays; dopasowanie to indeksowanie tablicy
+    dopasowania sumami haplotypów (HaplotypeCodec.haplotype_sums), a tracker
+    aktualizowany jest liczebnościami alleli wyliczonymi z liczebności haplotypów.
+    """
+    height, width = env.shape
+    rng = make_rng(rng)
+    codec = population.codec
+    if profiler is not None:
+        profiler.start()
+
+    # 1. Migracja
+    moved = migration_kernel(population.x, population.y, barrier, p_mig, rng)
+    if profiler is not None:
+        profiler.lap('migration', migrants=len(moved))
+
+    # 2. Rozród + mutacje
+    fitness = fitness or FitnessEvaluator(codec.genome_length, codec.fitness_name)
+    fit = fitness(codec.haplotype_sums()[population.haplotypes], env[population.y, population.x])
+    parents, child_haplotypes = haplotype_reproduction_kernel(
+        population.haplotypes, None, codec, p_base_repro, p_mut, rng, fitness_values=fit)
+    offspring = HaplotypePopulation(x=population.x[parents], y=population.y[parents],
+                                    haplotypes=child_haplotypes,
+                                    birth_time=np.full(len(parents), current_time, dtype=np.int32),
+                                    codec=codec)
+
+    # 3. Dodanie potomków
+    population = population.concat(offspring)
+    if profiler is not None:
+        profiler.lap('reproduction', births=len(parents))
 
+    # 4. Regulacja liczebności w komórkach
+    keep = capacity_kernel(population.x, population.y, width, max_per_cell, rng)
+    
+    if tracker is not None:
+        removed = population.haplotypes[_removed_mask(len(population), keep)]
+        tracker.add_counts(codec.allele_counts(child_haplotypes), len(child_haplotypes))
+        tracker.add_counts(-codec.allele_counts(removed), -len(removed))
+
+    new_population = population.take(keep)
+    if profiler is not None:
+        profiler.lap('capacity', culled=len(population) - len(keep),
+                     cells_over_capacity=count_overfull_cells(population.x, population.y,
+                                                              width, max_per_cell))
     return new_population
 
 
+# =========================
+# Fuzja kroku (bufory wielokrotnego użytku)
+# =========================
+
+# Kolumny populacji przechowywane w buforach SimulationState
+STATE_COLUMNS = ('x', 'y', 'genotypes', 'birth_time', 'sums')
+
+
+@dataclass
+class StepParams:
+    """Parametry kroku symulacji dla step_kernel"""
+    p_mig: float = 0.2
+    p_base_repro: float = 0.1
+    p_mut: float = 0.01
+    max_per_cell: int = 20
+
+
+class SimulationState:
+    """
+    Stan populacji w prealokowanych buforach dla step_kernel.
+
+    Kolumny populacji trzymane są w dwóch zestawach buforów (bieżący
+    i docelowy): potomkowie dopisywani są za bieżącymi wierszami, a po
+    regulacji liczebności ocalałe wiersze kopiowane do drugiego zestawu,
+    który staje się bieżącym. Bufory pomocnicze (komórki, dopasowanie,
+    liczby losowe, maski) również są wielokrotnie używane; pojemność
+    podwaja się tylko wtedy, gdy populacja przekroczy dotychczasowe maksimum.
+    """
+    def __init__(self, population: PopulationArrays, current_time: int = 0,
+                 tracker: DiversityTracker = None, fitness: FitnessEvaluator = None,
+                 capacity: int = 0):
+        self.genome_length = population.genotypes.shape[1]
+        self.size = len(population)
+        self.current_time = current_time
+        self.tracker = tracker
+        self.fitness = fitness or FitnessEvaluator(self.genome_length)
+        self.capacity = 0
+        self._env = None
+        self._reserve(max(capacity, 2 * self.size, 64))
+        for name, column in zip(STATE_COLUMNS, (population.x, population.y, population.genotypes,
+                                                population.birth_time, population.genotype_sums())):
+            self.front[name][:self.size] = column
+    
+    def _allocate(self, capacity: int) -> dict:
+        return {'x': np.zeros(capacity, dtype=np.int32),
+                'y': np.zeros(capacity, dtype=np.int32),
+                'genotypes': np.zeros((capacity, self.genome_length), dtype=np.uint8),
+                'birth_time': np.zeros(capacity, dtype=np.int32),
+                'sums': np.zeros(capacity, dtype=np.int32)}
+    
+    def _reserve(self, capacity: int):
+        """Zapewnia pojemność buforów co najmniej capacity wierszy"""
+        if capacity <= self.capacity:
+            return
+        capacity = max(capacity, 2 * self.capacity)
+        front = self._allocate(capacity)
+        if self.capacity:
+            for name in STATE_COLUMNS:
+                front[name][:self.size] = self.front[name][:self.size]
+        self.front = front
+        self.back = self._allocate(capacity)
+        self.scratch = {'cell': np.zeros(capacity, dtype=np.int64),
+                        'env': np.zeros(capacity, dtype=np.int64),
+                        'fit': np.zeros(capacity),
+                        'prob': np.zeros(capacity),
+                        'random': np.zeros(capacity),
+                        'mask': np.zeros(capacity, dtype=bool),
+                        'removed': np.zeros(capacity, dtype=bool),
+                        # migracja
+                        'new_x': np.zeros(capacity, dtype=np.int32),
+                        'new_y': np.zeros(capacity, dtype=np.int32),
+                        'offset': np.zeros(capacity, dtype=np.int32),
+                        'valid': np.zeros(4 * capacity, dtype=bool),
+                        'cumsum': np.zeros(4 * capacity, dtype=np.int64),
+                        'count': np.zeros(capacity, dtype=np.int64),
+                        'choice': np.zeros(capacity, dtype=np.int64),
+                        'direction': np.zeros(capacity, dtype=np.int64),
+                        'blocked': np.zeros(capacity, dtype=bool),
+                        # mutacje potomków
+                        'mutation': np.zeros(capacity * self.genome_length),
+                        'mutation_mask': np.zeros(capacity * self.genome_length, dtype=bool)}
+        self.capacity = capacity
+    
+    def env_flat(self, env: np.ndarray) -> np.ndarray:
+        """Spłaszczone środowisko int64 (przeliczane tylko przy zmianie tablicy)"""
+        if self._env is None or self._env[0] is not env:
+            self._env = (env, np.ascontiguousarray(env, dtype=np.int64).ravel())
+        return self._env[1]
+    
+    def column(self, name: str) -> np.ndarray:
+        """Widok na wypełnioną część bieżącej kolumny"""
+        return self.front[name][:self.size]
+    
+    def population(self) -> PopulationArrays:
+        """
+        Bieżąca populacja jako PopulationArrays (widoki na bufory, bez kopiowania).
+        Bufory są nadpisywane w kolejnych krokach - wynik, który ma przetrwać
+        dłużej niż jeden krok, trzeba skopiować (PopulationArrays.copy).
+        """
+        return PopulationArrays(x=self.column('x'), y=self.column('y'),
+                                genotypes=self.column('genotypes'),
+                                birth_time=self.column('birth_time'), sums=self.column('sums'))
+    
+    def __len__(self) -> int:
+        return self.size
+
+
+def step_kernel(state: SimulationState, env: np.ndarray, barrier: np.ndarray,
+                params: StepParams, rng: np.random.Generator = None,
+                profiler: StepProfiler = None) -> SimulationState:
+    """
+    Jeden krok symulacji (migracja, rozród, mutacje, regulacja liczebności)
+    na buforach SimulationState.
+
+    Wynik jest identyczny z simulation_step_arrays dla tego samego generatora:
+    kolejność losowań jest ta sama, ale pośrednie tablice wszystkich etapów
+    (migracji, rozrodu, mutacji i regulacji liczebności: komórki, wartości
+    środowiska, dopasowanie, liczby losowe, maski oraz kolumny populacji)
+    zapisywane są do buforów state.scratch przez out=. Nowe tablice powstają
+    tylko dla indeksów migrantów, rodziców, osobników z przepełnionych komórek
+    i ocalałych, nowych wartości zmutowanych genów oraz obsady komórek
+    (rozmiar siatki).
+    """
+    rng = make_rng(rng)
+    width = env.shape[1]
+    n = state.size
+    state._reserve(2 * n)
+    front, back, scratch = state.front, state.back, state.scratch
+    x, y = front['x'][:n], front['y'][:n]
+    if profiler is not None:
+        profiler.start()
+    
+    # 1. Migracja (w miejscu na widokach buforów)
+    moved = migration_kernel(x, y, barrier, params.p_mig, rng, scratch=scratch)
+    if profiler is not None:
+        profiler.lap('migration', migrants=len(moved))
+    
+    # 2. Rozród: dopasowanie z tablicy (suma genotypu, środowisko) przez indeks liniowy
+    cell = np.multiply(y, width, out=scratch['cell'][:n])
+    np.add(cell, x, out=cell)
+    env_values = np.take(state.env_flat(env), cell, out=scratch['env'][:n])
+    np.multiply(front['sums'][:n], NUM_ENV_VALUES, out=cell)
+    np.add(cell, env_values, out=cell)
+    fit = np.take(state.fitness.table.ravel(), cell, out=scratch['fit'][:n])
+    state.fitness.last = fit
+    
+    random = rng.random(out=scratch['random'][:n])
+    prob = np.multiply(fit, params.p_base_repro, out=scratch['prob'][:n])
+    parents = np.flatnonzero(np.less(random, prob, out=scratch['mask'][:n]))
+    
+    # 3. Potomkowie dopisywani za bieżącymi wierszami
+    births = len(parents)
+    m = n + births
+    for name in ('x', 'y', 'genotypes'):
+        np.take(front[name][:n], parents, axis=0, out=front[name][n:m])
+    children = front['genotypes'][n:m]
+    mutation_kernel(children, params.p_mut, rng, scratch=scratch)
+    np.sum(children, axis=1, dtype=np.int32, out=front['sums'][n:m])
+    front['birth_time'][n:m] = state.current_time
+    if profiler is not None:
+        profiler.lap('reproduction', births=births)
+    
+    # 4. Regulacja liczebności; ocalali kopiowani do drugiego zestawu buforów
+    keep = capacity_kernel(front['x'][:m], front['y'][:m], width, params.max_per_cell, rng,
+                           scratch=scratch)
+    if state.tracker is not None:
+        state.tracker.add(children)
+        state.tracker.remove(front['genotypes'][:m][_removed_mask(m, keep, out=scratch['removed'])])
+    k = len(keep)
+    for name in STATE_COLUMNS:
+        np.take(front[name][:m], keep, axis=0, out=back[name][:k])
+    if profiler is not None:
+        profiler.lap('capacity', culled=m - k,
+                     cells_over_capacity=count_overfull_cells(front['x'][:m], front['y'][:m],
+                                                              width, params.max_per_cell))
+    
+    state.front, state.back = back, front
+    state.size = k
+    state.current_time += 1
+    return state
+
+
+# =========================
+# Powtórzenia w jednej populacji (batched)
+# =========================
+
+def replicate_allele_counts(replicate: np.ndarray, genotypes: np.ndarray,
+                            num_replicates: int, num_alleles: int = NUM_ALLELES) -> np.ndarray:
+    """Tablica (K, L, num_alleles) liczebności alleli osobno dla każdego powtórzenia"""
+    genome_length = genotypes.shape[1]
+    index = (replicate.astype(np.int64)[:, None] * genome_length
+             + np.arange(genome_length)) * num_alleles + genotypes
+    counts = np.bincount(index.ravel(), minlength=num_replicates * genome_length * num_alleles)
+    return counts.reshape(num_replicates, genome_length, num_alleles)
+
+
+class ReplicateDiversityTracker:
+    """DiversityTracker dla K powtórzeń naraz (różnorodność jako wektor (K,))"""
+    def __init__(self, num_replicates: int, genome_length: int, num_alleles: int = NUM_ALLELES):
+        self.counts = np.zeros((num_replicates, genome_length, num_alleles), dtype=np.int64)
+        self.n = np.zeros(num_replicates, dtype=np.int64)
+    
+    def add(self, replicate: np.ndarray, genotypes: np.ndarray, sign: int = 1):
+        """Dodaje osobniki (sign=-1 - usuwa) z podziałem na powtórzenia"""
+        num_replicates, _, num_alleles = self.counts.shape
+        self.counts += sign * replicate_allele_counts(replicate, genotypes, num_replicates, num_alleles)
+        self.n += sign * np.bincount(replicate, minlength=num_replicates)
+    
+    def remove(self, replicate: np.ndarray, genotypes: np.ndarray):
+        self.add(replicate, genotypes, sign=-1)
+    
+    def diversity(self) -> np.ndarray:
+        """Średnia odległość Hamminga w każdym powtórzeniu (jak diversity_from_allele_counts)"""
+        genome_length = self.counts.shape[1]
+        n = self.n.astype(float)
+        differing = n * n * genome_length - (self.counts.astype(float) ** 2).sum(axis=(1, 2))
+        pairs = genome_length * n * (n - 1)
+        return np.divide(differing, pairs, out=np.zeros_like(n), where=self.n >= 2)
+
+
+@dataclass
+class ReplicateBatch:
+    """
+    K niezależnych symulacji w jednej populacji tablicowej.
+
+    Kolumna replicate wskazuje powtórzenie osobnika; każde powtórzenie ma
+    własne środowisko i barierę (environments, barriers o kształcie (K, H, W)).
+    """
+    population: PopulationArrays
+    replicate: np.ndarray       # int32 (N,)
+    environments: np.ndarray    # (K, H, W)
+    barriers: np.ndarray        # bool (K, H, W)
+
+    @property
+    def num_replicates(self) -> int:
+        return len(self.environments)
+
+    def sizes(self) -> np.ndarray:
+        """Liczebność każdego powtórzenia (K,)"""
+        return np.bincount(self.replicate, minlength=self.num_replicates)
+
+    def split(self) -> List[PopulationArrays]:
+        """Osobne populacje powtórzeń (w kolejności osobników)"""
+        order = np.argsort(self.replicate, kind='stable')
+        return [self.population.take(index)
+                for index in np.split(order, np.cumsum(self.sizes())[:-1])]
+
+
+def simulation_step_batched(batch: ReplicateBatch, current_time=0,
+                            p_mig=0.2, p_base_repro=0.1, p_mut=0.01, max_per_cell=20,
+                            tracker: ReplicateDiversityTracker = None,
+                            rng: np.random.Generator = None,
+                            fitness: FitnessEvaluator = None) -> ReplicateBatch:
+    """
+    Jeden krok K powtórzeń naraz (etapy jak w simulation_step_arrays).
+
+    Komórki powtórzenia k numerowane są z przesunięciem k * H wierszy,
+    więc regulacja liczebności nie miesza osobników różnych powtórzeń,
+    a migracja czyta barierę z siatki własnego powtórzenia.
+    """
+    rng = make_rng(rng)
+    _, height, width = batch.environments.shape
+    population, replicate = batch.population, batch.replicate
+
+    # 1. Migracja
+    migration_kernel(population.x, population.y, batch.barriers, p_mig, rng, replicate=replicate)
+
+    # 2. Rozród + mutacje
+    fitness = fitness or FitnessEvaluator(population.genotypes.shape[1])
+    fit = fitness(population.genotype_sums(), batch.environments[replicate, population.y, population.x])
+    parents, child_genotypes = reproduction_kernel(population.genotypes, None,
+                                                   p_base_repro, p_mut, rng, fitness_values=fit)
+    offspring = PopulationArrays(x=population.x[parents], y=population.y[parents],
+                                 genotypes=child_genotypes,
+                                 birth_time=np.full(len(parents), current_time, dtype=np.int32),
+                                 sums=child_genotypes.sum(axis=1, dtype=np.int32))
+
+    # 3. Dodanie potomków
+    population = population.concat(offspring)
+    child_replicate = replicate[parents]
+    replicate = np.concatenate([replicate, child_replicate])
+
+    # 4. Regulacja liczebności w komórkach (wiersze siatek kolejnych powtórzeń)
+    keep = capacity_kernel(population.x, replicate * height + population.y, width, max_per_cell, rng)
+    
+    if tracker is not None:
+        removed = _removed_mask(len(population), keep)
+        tracker.add(child_replicate, child_genotypes)
+        tracker.remove(replicate[removed], population.genotypes[removed])
+
+    return ReplicateBatch(population=population.take(keep), replicate=replicate[keep],
+                          environments=batch.environments, barriers=batch.barriers)
+
+
+def run_simulation_batched(config=None, seeds=None, replicates: int = None) -> list:
+    """
+    Uruchamia K powtórzeń jednej konfiguracji w jednej populacji tablicowej.
+
+    Środowisko i populacja początkowa powtórzenia k powstają z generatora
+    make_rng(seeds[k]) tak samo jak w run_simulation (silnik 'arrays'),
+    a kroki wszystkich powtórzeń losowane są z jednego generatora
+    default_rng(seeds), więc trajektorie nie są identyczne z osobnymi
+    uruchomieniami, ale są powtarzalne i od siebie niezależne.
+
+    Args:
+        config: jak w run_simulation (klucze snapshot/checkpoint są pomijane;
+            'cache' zapisuje całą paczkę powtórzeń jako jeden wpis - tylko
+            z podanymi seeds lub config['seed'])
+        seeds: ziarna powtórzeń; None - wyprowadzone z config['seed']
+        replicates: liczba powtórzeń, gdy seeds nie są podane
+
+    Returns:
+        list: dla każdego powtórzenia (populations, environment, barriers, collection)
+              jak w run_simulation
+    """
+    config = dict(RUN_DEFAULTS, **config_to_dict(config))
+    # Bez ziaren (ani jawnych, ani config['seed']) wynik nie jest powtarzalny
+    cache = open_result_cache(config.get('cache'))
+    if seeds is None and config['seed'] is None:
+        cache = None
+    if seeds is None:
+        children = np.random.SeedSequence(config['seed']).spawn(replicates or 1)
+        seeds = [int(child.generate_state(1)[0]) for child in children]
+    seeds = [int(seed) for seed in seeds]
+    
+    # Pamięć podręczna: cała paczka powtórzeń jest jednym wpisem
+    if cache is not None:
+        key = result_cache_key(config, seeds=seeds)
+        arrays = cache.get(key)
+        if arrays is not None:
+            # Paczka powtórzeń zawsze w reprezentacji tablicowej (jak _run_simulation_batched)
+            return results_from_arrays(arrays, dict(config, engine='arrays'))
+    results = _run_simulation_batched(config, seeds)
+    if cache is not None:
+        cache.put(key, results_to_arrays(results, config['genome_length']))
+    return results
+
+
+def _run_simulation_batched(config: dict, seeds: list) -> list:
+    """Właściwe uruchomienie run_simulation_batched (bez pamięci podręcznej)"""
+    grid_size = config['grid_size']
+    initial_pop_size = config['initial_pop_size']
+    generations = config['generations']
+    genome_length = config['genome_length']
+    barrier_type = config['barrier_type']
+    num_replicates = len(seeds)
+    
+    # Inicjalizacja powtórzeń jak w run_simulation
+    environments, barriers, populations = [], [], []
+    for seed in seeds:
+        replicate_rng = make_rng(seed)
+        environment, barrier = config_environment(config, replicate_rng)
+        environments.append(environment)
+        barriers.append(barrier)
+        populations.append(init_population_arrays(initial_pop_size, grid_size, grid_size,
+                                                  genome_length, rng=replicate_rng))
+    population = populations[0]
+    for other in populations[1:]:
+        population = population.concat(other)
+    batch = ReplicateBatch(population=population,
+                           replicate=np.repeat(np.arange(num_replicates, dtype=np.int32),
+                                               [len(p) for p in populations]),
+                           environments=np.stack(environments), barriers=np.stack(barriers))
+    
+    rng = np.random.default_rng(list(seeds))
+    fitness_evaluator = FitnessEvaluator(genome_length, config['fitness'])
+    tracker = ReplicateDiversityTracker(num_replicates, genome_length)
+    tracker.add(batch.replicate, batch.population.genotypes)
+    
+    total_population = np.zeros((generations, num_replicates), dtype=np.int64)
+    genetic_diversity = np.zeros((generations, num_replicates))
+    mean_fitness = np.zeros((generations, num_replicates))
+    for gen in range(generations):
+        replicate_before = batch.replicate
+        batch = simulation_step_batched(batch, gen,
+                                        p_mig=config['migration_rate'],
+                                        p_base_repro=config['reproduction_rate'],
+                                        p_mut=config['mutation_rate'],
+                                        max_per_cell=config['max_per_cell'],
+                                        tracker=tracker, rng=rng, fitness=fitness_evaluator)
+        total_population[gen] = batch.sizes()
+        genetic_diversity[gen] = tracker.diversity()
+        # Średnie dopasowanie w chwili rozrodu, osobno dla każdego powtórzenia
+        counts = np.bincount(replicate_before, minlength=num_replicates)
+        sums = np.bincount(replicate_before, weights=fitness_evaluator.last, minlength=num_replicates)
+        mean_fitness[gen] = np.divide(sums, counts, out=np.zeros(num_replicates), where=counts > 0)
+    
+    results = []
+    for k, population in enumerate(batch.split()):
+        collection = {
+            'total_population': total_population[:, k].tolist(),
+            'genetic_diversity': genetic_diversity[:, k].tolist(),
+            'fitness': mean_fitness[:, k].tolist(),
+            'num_populations': []
+        }
+        results.append((split_at_barrier(population, barriers[k], barrier_type),
+                        environments[k], barriers[k], collection))
+    return results
+
+
 # =========================
 # Analiza genetyki populacji (DODANE)
 # =========================
@@ -676,8 +2652,8 @@ def analyze_genetic_divergence(populations):
                 continue
             
             # Obliczenie średniej różnicy alleli między populacjami
-            genotypes_i = np.array([ind.genotype for ind in pop_i])
-            genotypes_j = np.array([ind.genotype for ind in pop_j])
+            genotypes_i = population_genotypes(pop_i)
+            genotypes_j = population_genotypes(pop_j)
             
             avg_genotype_i = np.mean(genotypes_i, axis=0)
             avg_genotype_j = np.mean(genotypes_j, axis=0)
@@ -691,142 +2667,262 @@ def analyze_genetic_divergence(populations):
     return 0.0
 
 
-def visualize_comparison(populations, environment, barriers, collection, title, filename):
-    """
-    Wizualizuje stan końcowy populacji.
-    
-    Args:
-        populations: lista populacji
-        environment: mapa środowiska
-        barriers: mapa barier
-        collection: dane zbierane podczas symulacji
-        title: tytuł wykresu
-        filename: nazwa pliku do zapisania
-    """
-    fig, axes = plt.subplots(2, 2, figsize=(12, 10))
-    fig.suptitle(title, fontsize=14, fontweight='bold')
-    
-    # 1. Rozkład populacji na mapie
-    ax = axes[0, 0]
-    grid_size = environment.shape[0]
-    
-    # Pokaż środowisko (note: imshow shows (y,x) with y increasing downward by default)
-    im = ax.imshow(environment, cmap='RdYlBu_r', alpha=0.6, origin='lower')
-    plt.colorbar(im, ax=ax, label='Warunki środowiska')
-    
-    # Pokaż bariery
-    if barriers is not None:
-        for y in range(grid_size):
-            for x in range(grid_size):
-                if barriers[y, x] > 0:
-                    ax.add_patch(Rectangle((x - 0.5, y - 0.5), 1, 1, 
-                                          fill=True, color='black', alpha=0.5))
-    
-    # Pokaż populacje (różne kolory)
-    colors = plt.cm.Set3(np.linspace(0, 1, len(populations)))
-    for pop_idx, population in enumerate(populations):
-        if len(population) > 0:
-            positions = np.array([[ind.x, ind.y] for ind in population])
-            ax.scatter(positions[:, 0], positions[:, 1], c=[colors[pop_idx]], 
-                      s=50, alpha=0.7, label=f'Pop {pop_idx + 1}')
-    
-    ax.set_xlabel('X')
-    ax.set_ylabel('Y')
-    ax.set_title('Rozkład przestrzenny populacji')
-    ax.legend(loc='upper right', fontsize=8)
-    ax.set_xlim(-0.5, grid_size - 0.5)
-    ax.set_ylim(-0.5, grid_size - 0.5)
-    
-    # 2. Dynamika liczby osobników
-    ax = axes[0, 1]
-    if 'total_population' in collection:
-        ax.plot(collection['total_population'], linewidth=2, color='#2ecc71')
-        ax.fill_between(range(len(collection['total_population'])), 
-                        collection['total_population'], alpha=0.3, color='#2ecc71')
-        ax.set_xlabel('Generacja')
-        ax.set_ylabel('Liczba osobników')
-        ax.set_title('Dynamika populacji')
-        ax.grid(True, alpha=0.3)
-    
-    # 3. Różnorodność genetyczna
-    ax = axes[1, 0]
-    if 'genetic_diversity' in collection:
-        ax.plot(collection['genetic_diversity'], linewidth=2, color='#3498db')
-        ax.fill_between(range(len(collection['genetic_diversity'])), 
-                        collection['genetic_diversity'], alpha=0.3, color='#3498db')
-        ax.set_xlabel('Generacja')
-        ax.set_ylabel('Różnorodność genetyczna')
-        ax.set_title('Ewolucja różnorodności')
-        ax.grid(True, alpha=0.3)
-    
-    # 4. Statystyki
-    ax = axes[1, 1]
-    ax.axis('off')
-    
-    stats_text = f"""
-    STATYSTYKI KOŃCOWE
-    {'='*40}
-    
-    Liczba populacji: {len(populations)}
-    
-    Rozmiary populacji:
-    """
-    
-    for i, pop in enumerate(populations):
-        stats_text += f"\n  Populacja {i + 1}: {len(pop)} osobników"
-    
-    total_pop = sum(len(p) for p in populations)
-    stats_text += f"\n\n  RAZEM: {total_pop} osobników"
-    
-    # Divergencja genetyczna
-    div = analyze_genetic_divergence(populations)
-    stats_text += f"\n\nDywergencja genetyczna: {div:.4f}"
-    
-    if len(populations) > 1:
-        stats_text += "\n(Wyższa wartość → więcej specjacji)"
-    
-    ax.text(0.1, 0.5, stats_text, fontsize=10, family='monospace',
-            verticalalignment='center', bbox=dict(boxstyle='round', facecolor='wheat', alpha=0.5))
-    
-    plt.tight_layout()
-    plt.savefig(filename, dpi=150, bbox_inches='tight')
-    plt.close()
-    
-    print(f"  Wizualizacja zapisana: {filename}")
-
-
 # =========================
 # Główna pętla symulacji
 # =========================
 
-def run_simulation(config=None):
+SIMULATION_ENGINES = ('list', 'arrays', 'haplotypes', 'fused')
+
+# Tryby zbierania serii w run_simulation (klucz 'collector')
+COLLECTOR_MODES = ('lists', 'streaming')
+
+# Domyślne parametry modelu (run_simulation i run_simulation_batched)
+RUN_DEFAULTS = {
+    'grid_size': 10,
+    'initial_pop_size': 100,
+    'generations': 100,
+    'genome_length': 8,
+    'mutation_rate': 0.05,
+    'migration_rate': 0.15,
+    'reproduction_rate': 0.12,
+    'max_per_cell': 25,
+    'barrier_type': 'none',
+    'barrier_position': 5,
+    'engine': 'list',
+    'fitness': 'distance',
+    'seed': None,
+}
+
+# Wersja silnika w kluczu pamięci podręcznej wyników - podbić przy każdej
+# zmianie, po której to samo ziarno daje inne wyniki
+ENGINE_VERSION = 1
+
+# Klucze konfiguracji, które nie wpływają na wyniki (pomijane w kluczu cache)
+UNCACHED_CONFIG_KEYS = ('cache', 'profile', 'snapshot_path', 'snapshot_stride',
+                        'checkpoint_path', 'checkpoint_every', 'resume',
+                        'export_path', 'export_flush_every')
+
+
+def config_to_dict(config) -> dict:
+    """
+    Zamienia SimulationConfig na słownik w formacie run_simulation.
+    Słowniki zwracane są bez zmian (jako kopia).
+    """
+    if config is None:
+        return {}
+    if isinstance(config, dict):
+        return dict(config)
+    return {
+        'grid_size': config.height,
+        'initial_pop_size': config.num_individuals,
+        'generations': config.steps,
+        'genome_length': config.genome_length,
+        'mutation_rate': config.p_mutation,
+        'migration_rate': config.p_migration,
+        'reproduction_rate': config.p_base_repro,
+        'max_per_cell': config.max_per_cell,
+        'barrier_type': config.barrier_type,
+        'seed': config.seed,
+    }
+
+
+def config_environment(config: dict, rng: np.random.Generator = None) -> tuple:
+    """
+    Środowisko i bariery uruchomienia: wspólne środowisko z klucza 'landscape'
+    (obiekt z metodą arrays(), np. env_registry.SharedEnvironment - widoki tylko
+    do odczytu, bez losowania) lub nowe z init_environment.
+    """
+    config = dict(RUN_DEFAULTS, **config)
+    grid_size = config['grid_size']
+    landscape = config.get('landscape')
+    if landscape is None:
+        return init_environment(grid_size, grid_size, config['barrier_type'], rng)
+    environment, barriers = landscape.arrays()
+    if environment.shape != (grid_size, grid_size):
+        raise ValueError(f"Wymiary wspólnego środowiska {environment.shape} "
+                         f"nie pasują do grid_size={grid_size}")
+    return environment, barriers
+
+
+def result_cache_key(config: dict, seeds: list = None) -> str:
+    """
+    Klucz wyniku w ResultCache: skrót pełnej konfiguracji (z domyślnymi
+    wartościami), ziarna i ENGINE_VERSION. Klucze z UNCACHED_CONFIG_KEYS
+    są pomijane; seeds (lista ziaren) oznacza uruchomienie run_simulation_batched.
+    """
+    resolved = resolved_config(config)
+    if seeds is not None:
+        resolved['seed'] = None
+        resolved['batched_seeds'] = [int(seed) for seed in seeds]
+    return config_hash(resolved, ENGINE_VERSION)
+
+
+def resolved_config(config: dict) -> dict:
+    """
+    Konfiguracja z wartościami domyślnymi, bez kluczy z UNCACHED_CONFIG_KEYS;
+    wspólne środowisko ('landscape') zastąpione skrótem zawartości.
+    """
+    resolved = {name: value for name, value in dict(RUN_DEFAULTS, **config).items()
+                if name not in UNCACHED_CONFIG_KEYS}
+    if resolved.get('landscape') is not None:
+        resolved['landscape'] = resolved['landscape'].fingerprint
+    return resolved
+
+
+def results_to_arrays(results: list, genome_length: int = 8) -> dict:
+    """
+    Zamienia wyniki uruchomień (populations, environment, barriers, collection)
+    na płaski słownik tablic do zapisu w pliku .npz.
+    """
+    arrays = {'num_runs': np.array(len(results))}
+    for run, (populations, environment, barriers, collection) in enumerate(results):
+        prefix = f"run{run}_"
+        arrays[prefix + 'environment'] = environment
+        if barriers is not None:
+            arrays[prefix + 'barriers'] = barriers
+        arrays[prefix + 'num_groups'] = np.array(len(populations))
+        for group, population in enumerate(populations):
+            if isinstance(population, HaplotypePopulation):
+                population = population.to_arrays()
+            elif not isinstance(population, PopulationArrays):
+                population = PopulationArrays.from_individuals(population, genome_length)
+            for name in CHECKPOINT_ARRAYS[2:]:
+                arrays[f"{prefix}group{group}_{name}"] = getattr(population, name)
+        for name, values in collection.items():
+            arrays[f"{prefix}series_{name}"] = np.asarray(values)
+    return arrays
+
+
+def results_from_arrays(arrays: dict, config: dict) -> list:
+    """
+    Odwrotność results_to_arrays: populacje w reprezentacji silnika
+    config['engine'] (lista Individual, HaplotypePopulation lub PopulationArrays).
+    """
+    config = dict(RUN_DEFAULTS, **config)
+    engine = config['engine']
+    results = []
+    for run in range(int(arrays['num_runs'])):
+        prefix = f"run{run}_"
+        populations = []
+        for group in range(int(arrays[prefix + 'num_groups'])):
+            population = PopulationArrays(**{name: arrays[f"{prefix}group{group}_{name}"]
+                                             for name in CHECKPOINT_ARRAYS[2:]})
+            if engine == 'list':
+                population = population.to_individuals()
+            elif engine == 'haplotypes':
+                population = HaplotypePopulation.from_arrays(
+                    population, HaplotypeCodec(config['genome_length'], fitness_name=config['fitness']))
+            populations.append(population)
+        streaming = config.get('collector', 'lists') == 'streaming'
+        collection = {name[len(prefix + 'series_'):]: arrays[name] if streaming else arrays[name].tolist()
+                      for name in arrays if name.startswith(prefix + 'series_')}
+        results.append((populations, arrays[prefix + 'environment'],
+                        arrays.get(prefix + 'barriers'), collection))
+    return results
+
+
+def run_simulation(config=None, hooks: SimulationHooks = None, profiler: StepProfiler = None):
     """
     Uruchamia główną symulację.
     
     Args:
-        config: słownik z parametrami lub None dla domyślnych
+        config: słownik z parametrami, SimulationConfig lub None dla domyślnych.
+            Klucz 'engine' wybiera reprezentację populacji:
+            'list' (domyślnie, lista Individual), 'arrays' (PopulationArrays),
+            'haplotypes' (HaplotypePopulation) lub 'fused' (step_kernel na
+            buforach SimulationState, wyniki jak 'arrays').
+            Klucz 'seed' ustala generator losowości całego uruchomienia.
+            Klucz 'collector': 'streaming' zbiera serie w typowanych tablicach
+            StreamingDataCollector (collection zawiera wtedy tablice NumPy,
+            także 'left_pop_size' i 'right_pop_size', bez 'num_populations', zamiast list).
+            Klucz 'snapshot_path' włącza zapis genotypów na dysk
+            (GenotypeSnapshotWriter) co 'snapshot_stride' generacji.
+            Klucz 'profile': True tworzy StepProfiler i drukuje tabelę
+            czasów etapów na końcu uruchomienia.
+            Klucz 'fitness' wybiera funkcję dopasowania zarejestrowaną przez
+            register_fitness_table (domyślnie 'distance').
+            Klucz 'checkpoint_path' włącza zapis pełnego stanu (save_checkpoint)
+            co 'checkpoint_every' generacji; 'resume': True wznawia uruchomienie
+            od najnowszego checkpointu w tym katalogu (kontynuacja identyczna
+            z nieprzerwanym uruchomieniem o tym samym ziarnie).
+            Klucz 'landscape' (np. env_registry.SharedEnvironment) podaje
+            wspólne środowisko i bariery zamiast losowania ich z ziarna
+            ('barrier_type' powinien opisywać te bariery).
+            Klucz 'cache' (True - katalog DEFAULT_CACHE_DIR, ścieżka lub
+            ResultCache) zwraca zapisany wynik uruchomienia o tej samej
+            konfiguracji, ziarnie i ENGINE_VERSION zamiast liczyć go ponownie.
+            Pamięć podręczna jest pomijana bez ziarna, z hooks/profiler oraz
+            przy zapisie snapshotów, checkpointów lub eksporcie.
+            Klucz 'export_path' dopisuje uruchomienie do kolumnowego zbioru
+            danych (RunExporter, odczyt: ResultsDataset): serie generacji
+            strumieniowo do series.csv (StreamingDataCollector) opróżnianego
+            co 'export_flush_every' generacji i zamykanego także po przerwaniu,
+            po zakończeniu series.npz i końcowa populacja jako pliki .npy.
+        hooks: SimulationHooks - funkcje wołane po każdej generacji i na końcu
+        profiler: StepProfiler zbierający czasy etapów i liczniki zdarzeń
     
     Returns:
         tuple: (populations, environment, barriers, collection)
     """
+    config = config_to_dict(config)
+    cache = open_result_cache(config.get('cache'))
+    side_effects = any(config.get(name) for name in ('profile', 'snapshot_path', 'checkpoint_path', 'resume',
+                                                    'export_path'))
+    if cache is None or config.get('seed') is None or hooks is not None \
+            or profiler is not None or side_effects:
+        return _run_simulation(config, hooks, profiler)
+    
+    key = result_cache_key(config)
+    arrays = cache.get(key)
+    if arrays is not None:
+        return results_from_arrays(arrays, config)[0]
+    result = _run_simulation(config)
+    cache.put(key, results_to_arrays([result], config.get('genome_length', RUN_DEFAULTS['genome_length'])))
+    return result
+
+
+def _run_simulation(config: dict, hooks: SimulationHooks = None, profiler: StepProfiler = None):
+    """Właściwe uruchomienie run_simulation (bez pamięci podręcznej)"""
     # Parametry domyślne
-    if config is None:
-        config = {}
-    
-    grid_size = config.get('grid_size', 10)
-    initial_pop_size = config.get('initial_pop_size', 100)
-    generations = config.get('generations', 100)
-    mutation_rate = config.get('mutation_rate', 0.05)
-    barrier_type = config.get('barrier_type', 'none')
-    barrier_position = config.get('barrier_position', 5)
-    
-    # Inicjalizacja
+    config = dict(RUN_DEFAULTS, **config)
+    
+    grid_size = config['grid_size']
+    initial_pop_size = config['initial_pop_size']
+    generations = config['generations']
+    genome_length = config['genome_length']
+    mutation_rate = config['mutation_rate']
+    migration_rate = config['migration_rate']
+    reproduction_rate = config['reproduction_rate']
+    max_per_cell = config['max_per_cell']
+    barrier_type = config['barrier_type']
+    barrier_position = config['barrier_position']
+    engine = config['engine']
+    snapshot_path = config.get('snapshot_path')
+    snapshot_stride = config.get('snapshot_stride', 10)
+    checkpoint_path = config.get('checkpoint_path')
+    checkpoint_every = config.get('checkpoint_every', 100)
+    fitness_name = config['fitness']
+    collector_mode = config.get('collector', 'lists')
+    if engine not in SIMULATION_ENGINES:
+        raise ValueError(f"Nieznany silnik symulacji: {engine}\nDostępne: {list(SIMULATION_ENGINES)}")
+    if collector_mode not in COLLECTOR_MODES:
+        raise ValueError(f"Nieznany tryb zbierania danych: {collector_mode}\nDostępne: {list(COLLECTOR_MODES)}")
+    print_profile = profiler is None and config.get('profile', False)
+    if print_profile:
+        profiler = StepProfiler()
+    
+    # Inicjalizacja (cała losowość z jednego generatora)
+    rng = make_rng(config['seed'])
     height = width = grid_size
-    environment = init_environment(height, width, barrier_type)
-    barriers = environment[1] if isinstance(environment, tuple) else None
-    environment = environment[0] if isinstance(environment, tuple) else environment
+    environment, barriers = config_environment(config, rng)
     
-    population = init_population(initial_pop_size, height, width, genome_length=8)
+    if engine in ('arrays', 'fused'):
+        population = init_population_arrays(initial_pop_size, height, width, genome_length, rng=rng)
+    elif engine == 'haplotypes':
+        population = init_population_haplotypes(initial_pop_size, height, width, genome_length, rng=rng,
+                                                codec=HaplotypeCodec(genome_length, fitness_name=fitness_name))
+    else:
+        population = init_population(initial_pop_size, height, width, genome_length, rng=rng)
     
     # Zbiór danych
     collection = {
@@ -836,43 +2932,140 @@ def run_simulation(config=None):
         'num_populations': []
     }
     
-    # Symulacja
-    for gen in range(generations):
-        population = simulation_step(population, environment, barriers, 
-                                    p_mig=0.15, p_base_repro=0.12, p_mut=mutation_rate,
-                                    max_per_cell=25)
-        
-        # Zbieranie danych
-        total_pop = len(population)
-        collection['total_population'].append(total_pop)
-        
-        # Różnorodność genetyczna
-        if len(population) > 0:
-            genotypes = np.array([ind.genotype for ind in population])
-            if len(genotypes) > 1:
-                distances = pdist(genotypes, metric='hamming')
-                diversity = np.mean(distances) if len(distances) > 0 else 0
+    # Wznowienie od najnowszego checkpointu (zastępuje stan początkowy)
+    start_gen = 0
+    checkpoint_dir = latest_checkpoint(checkpoint_path) if checkpoint_path and config.get('resume') else None
+    if checkpoint_dir is not None:
+        checkpoint = load_checkpoint(checkpoint_dir)
+        start_gen = checkpoint['generation']
+        environment, barriers = checkpoint['environment'], checkpoint['barriers']
+        population = checkpoint['population']
+        if engine == 'haplotypes':
+            population = HaplotypePopulation.from_arrays(
+                population, HaplotypeCodec(genome_length, fitness_name=fitness_name))
+        elif engine == 'list':
+            population = population.to_individuals()
+        collection = checkpoint['collection']
+        rng.bit_generator.state = checkpoint['rng_state']
+    
+    # Dopasowanie z tablicy (wektor współdzielony przez rozród i statystyki)
+    fitness_evaluator = FitnessEvaluator(genome_length, fitness_name)
+    
+    # Różnorodność śledzona przyrostowo z częstości alleli
+    tracker = DiversityTracker(genome_length)
+    tracker.add(population_genotypes(population))
+    
+    # Eksport do zbioru danych: układ katalogów RunExporter, series.csv z kolektora
+    exporter = None
+    if config.get('export_path'):
+        exporter = RunExporter(config['export_path'], config,
+                               start_generation=start_gen if checkpoint_dir is not None else None,
+                               flush_every=config.get('export_flush_every', EXPORT_FLUSH_EVERY))
+    
+    # Statystyki w tablicach, snapshoty i series.csv na dysku (StreamingDataCollector);
+    # w trybie 'streaming' collection to widoki na jego tablice zamiast list
+    streaming = collector_mode == 'streaming'
+    collector = None
+    if streaming or snapshot_path or exporter is not None:
+        collector = StreamingDataCollector(barriers, generations, snapshot_path, snapshot_stride,
+                                           genome_length=genome_length,
+                                           series_path=exporter.series_path if exporter else None,
+                                           flush_every=exporter.flush_every if exporter else EXPORT_FLUSH_EVERY,
+                                           fitness_name=fitness_name)
+        if checkpoint_dir is not None:
+            collector.resume(start_gen, collection if streaming else None)
+    if streaming:
+        collection = collector.collection()
+    if engine == 'fused':
+        state = SimulationState(population, current_time=start_gen, tracker=tracker,
+                                fitness=fitness_evaluator)
+        step_params = StepParams(p_mig=migration_rate, p_base_repro=reproduction_rate,
+                                 p_mut=mutation_rate, max_per_cell=max_per_cell)
+    
+    # Symulacja (pliki kolektora zamykane także po wyjątku lub przerwaniu)
+    try:
+        for gen in range(start_gen, generations):
+            if engine == 'arrays':
+                population = simulation_step_arrays(population, environment, barriers, gen,
+                                                    p_mig=migration_rate, p_base_repro=reproduction_rate,
+                                                    p_mut=mutation_rate, max_per_cell=max_per_cell,
+                                                    tracker=tracker, rng=rng, profiler=profiler,
+                                                    fitness=fitness_evaluator)
+            elif engine == 'haplotypes':
+                population = simulation_step_haplotypes(population, environment, barriers, gen,
+                                                        p_mig=migration_rate, p_base_repro=reproduction_rate,
+                                                        p_mut=mutation_rate, max_per_cell=max_per_cell,
+                                                        tracker=tracker, rng=rng, profiler=profiler,
+                                                        fitness=fitness_evaluator)
+            elif engine == 'fused':
+                population = step_kernel(state, environment, barriers, step_params, rng,
+                                         profiler).population()
             else:
-                diversity = 0
-            collection['genetic_diversity'].append(diversity)
-        else:
-            collection['genetic_diversity'].append(0)
-    
-    # Grupowanie populacji po stronach bariery (jeśli istnieje)
+                population = simulation_step(population, environment, barriers, 
+                                            p_mig=migration_rate, p_base_repro=reproduction_rate,
+                                            p_mut=mutation_rate, max_per_cell=max_per_cell,
+                                            tracker=tracker, rng=rng, profiler=profiler,
+                                            fitness=fitness_evaluator)
+            if profiler is not None:
+                profiler.start()
+            
+            # Zbieranie danych: dopasowanie w chwili rozrodu (wektor z kroku symulacji)
+            # i różnorodność z DiversityTracker; snapshoty genotypów co snapshot_stride
+            if collector is not None:
+                collector.collect(population, environment, gen, fitnesses=fitness_evaluator.last,
+                                  diversity=tracker.diversity())
+            if streaming:
+                collection = collector.collection()
+            else:
+                collection['total_population'].append(len(population))
+                collection['genetic_diversity'].append(tracker.diversity())
+                collection['fitness'].append(fitness_evaluator.mean())
+            
+            if profiler is not None:
+                profiler.lap('statistics')
+                profiler.end_step()
+            if hooks is not None:
+                # Silnik 'fused' zwraca widoki na bufory nadpisywane w kolejnych krokach
+                hooks.emit('generation', gen, population.copy() if engine == 'fused' else population,
+                           collection)
+            
+            if checkpoint_path and (gen + 1) % checkpoint_every == 0:
+                save_checkpoint(checkpoint_path, gen + 1, environment, barriers, population,
+                                rng, collection, genome_length)
+    finally:
+        if collector is not None:
+            collector.close()
+    
+    if hooks is not None:
+        hooks.emit('finish', population, collection)
+    if print_profile:
+        print(profiler.summary_table())
+    
+    populations = split_at_barrier(population, barriers, barrier_type)
+    if exporter is not None:
+        exporter.finish(populations, collector.export_series(), genome_length)
+    return populations, environment, barriers, collection
+
+
+def split_at_barrier(population, barriers, barrier_type: str) -> list:
+    """Grupowanie populacji po stronach bariery pionowej (jeśli istnieje)"""
     populations = []
     if barrier_type == 'vertical' and barriers is not None:
         barrier_x = np.where(barriers[0])[0]
         if len(barrier_x) > 0:
             barrier_pos = barrier_x[0]
-            left_pop = [ind for ind in population if ind.x < barrier_pos]
-            right_pop = [ind for ind in population if ind.x >= barrier_pos]
-            if left_pop:
+            if isinstance(population, list):
+                left_pop = [ind for ind in population if ind.x < barrier_pos]
+                right_pop = [ind for ind in population if ind.x >= barrier_pos]
+            else:
+                left_pop = population.take(population.x < barrier_pos)
+                right_pop = population.take(population.x >= barrier_pos)
+            if len(left_pop):
                 populations.append(left_pop)
-            if right_pop:
+            if len(right_pop):
                 populations.append(right_pop)
         else:
             populations = [population]
     else:
         populations = [population]
-    
-    return populations, environment, barriers, collection
\ No newline at end of file
+    return populations
\ No newline at end of file
@@ -91,6 +91,8 @@ def test_quick_simulation():
         
         total_pop = collection['total_population'][-1] if collection['total_population'] else 0
         diversity = collection['genetic_diversity'][-1] if collection['genetic_diversity'] else 0
+        # Sumy genotypów zapamiętane w osobnikach aktualne po mutacjach
+        assert all(ind.sum == int(ind.genotype.sum()) for pop in populations for ind in pop)
         print(f"✓ Symulacja zakończona pomyślnie")
         print(f"  - Liczba osobników: {total_pop}")
         print(f"  - Różnorodność genetyczna: {diversity:.4f}")
@@ -105,6 +107,874 @@ def test_quick_simulation():
         return False
 
 
+def test_array_engine():
+    """Test silnika tablicowego (PopulationArrays)"""
+    print("\n" + "=" * 70)
+    print("TEST 5: Silnik tablicowy (10 kroków)")
+    print("=" * 70)
+    
+    try:
+        from symulacja import run_simulation, PopulationArrays
+        
+        config = {
+            'grid_size': 20,
+            'initial_pop_size': 50,
+            'generations': 10,
+            'mutation_rate': 0.05,
+            'barrier_type': 'vertical',
+            'engine': 'arrays',
+        }
+        
+        print("Uruchamianie symulacji...")
+        populations, env, barriers, collection = run_simulation(config)
+        
+        assert len(collection['total_population']) == config['generations']
+        assert len(collection['genetic_diversity']) == config['generations']
+        assert len(collection['fitness']) == config['generations']
+        assert all(0 < f <= 1 for f in collection['fitness'])
+        assert all(isinstance(p, PopulationArrays) for p in populations)
+        assert sum(len(p) for p in populations) == collection['total_population'][-1]
+        for pop in populations:
+            assert pop.genotypes.shape == (len(pop), 8)
+            assert (pop.genotype_sums() == pop.genotypes.sum(axis=1)).all()
+            assert (pop.x >= 0).all() and (pop.x < config['grid_size']).all()
+            assert (pop.y >= 0).all() and (pop.y < config['grid_size']).all()
+        
+        print(f"✓ Symulacja zakończona pomyślnie")
+        print(f"  - Liczba osobników: {collection['total_population'][-1]}")
+        
+        return True
+        
+    except Exception as e:
+        print(f"✗ Błąd silnika tablicowego:")
+        print(f"  {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_diversity_tracker():
+    """Test zgodności przyrostowej różnorodności z pdist"""
+    print("\n" + "=" * 70)
+    print("TEST 6: Różnorodność genetyczna z częstości alleli")
+    print("=" * 70)
+    
+    try:
+        import numpy as np
+        from scipy.spatial.distance import pdist
+        from symulacja import run_simulation, population_genotypes, SIMULATION_ENGINES
+        
+        for engine in SIMULATION_ENGINES:
+            config = {
+                'grid_size': 12,
+                'initial_pop_size': 80,
+                'generations': 15,
+                'barrier_type': 'vertical',
+                'engine': engine,
+            }
+            populations, env, barriers, collection = run_simulation(config)
+            genotypes = np.concatenate([population_genotypes(p) for p in populations])
+            expected = pdist(genotypes, metric='hamming').mean()
+            assert np.isclose(collection['genetic_diversity'][-1], expected)
+            print(f"✓ {engine:<10} różnorodność={expected:.4f} (zgodna z pdist)")
+        
+        return True
+        
+    except Exception as e:
+        print(f"✗ Błąd śledzenia różnorodności:")
+        print(f"  {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_seeded_runs():
+    """Test powtarzalności uruchomień z tym samym ziarnem"""
+    print("\n" + "=" * 70)
+    print("TEST 7: Powtarzalność (seed)")
+    print("=" * 70)
+    
+    try:
+        import numpy as np
+        from symulacja import run_simulation, SIMULATION_ENGINES
+        
+        for engine in SIMULATION_ENGINES:
+            config = {'grid_size': 12, 'generations': 15, 'barrier_type': 'vertical',
+                      'engine': engine, 'seed': 123}
+            _, env1, _, col1 = run_simulation(config)
+            _, env2, _, col2 = run_simulation(config)
+            assert np.array_equal(env1, env2)
+            assert col1['total_population'] == col2['total_population']
+            assert col1['genetic_diversity'] == col2['genetic_diversity']
+            print(f"✓ {engine:<10} identyczne wyniki dla seed=123")
+        
+        return True
+        
+    except Exception as e:
+        print(f"✗ Błąd powtarzalności:")
+        print(f"  {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_checkpoint_resume():
+    """Test wznawiania symulacji z checkpointu"""
+    print("\n" + "=" * 70)
+    print("TEST 8: Checkpoint i wznowienie")
+    print("=" * 70)
+    
+    try:
+        import tempfile
+        from symulacja import run_simulation, latest_checkpoint, SIMULATION_ENGINES
+        
+        for engine in SIMULATION_ENGINES:
+            config = {'grid_size': 12, 'generations': 30, 'barrier_type': 'vertical',
+                      'engine': engine, 'seed': 7}
+            _, _, _, expected = run_simulation(config)
+            with tempfile.TemporaryDirectory() as path:
+                # Przerwane uruchomienie: ostatni checkpoint po 20 generacjach
+                run_simulation(dict(config, generations=25, checkpoint_path=path, checkpoint_every=10))
+                assert latest_checkpoint(path).endswith('00000020')
+                _, _, _, resumed = run_simulation(dict(config, checkpoint_path=path,
+                                                       checkpoint_every=10, resume=True))
+            assert resumed['total_population'] == expected['total_population']
+            assert resumed['genetic_diversity'] == expected['genetic_diversity']
+            print(f"✓ {engine:<10} wznowienie identyczne z pełnym uruchomieniem")
+        
+        return True
+        
+    except Exception as e:
+        print(f"✗ Błąd checkpointu:")
+        print(f"  {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_species_clusters():
+    """Test klastrowania gatunków (porównanie ze składowymi macierzy pdist)"""
+    print("\n" + "=" * 70)
+    print("TEST 9: Klastrowanie gatunków")
+    print("=" * 70)
+    
+    try:
+        import numpy as np
+        from scipy.spatial.distance import pdist, squareform
+        from scipy.sparse.csgraph import connected_components
+        from symulacja import cluster_species
+        
+        rng = np.random.default_rng(0)
+        ancestors = rng.integers(0, 3, size=(4, 12))
+        genotypes = ancestors[rng.integers(0, 4, size=300)]
+        mutated = rng.random(genotypes.shape) < 0.1
+        genotypes[mutated] = rng.integers(0, 3, size=mutated.sum())
+        
+        distances = squareform(pdist(genotypes, metric='hamming'))
+        for threshold in (0.1, 0.2, 0.3):
+            expected, labels = connected_components(distances < threshold, directed=False)
+            result = cluster_species(genotypes, threshold)
+            assert result.num_clusters == expected
+            assert len(set(zip(labels, result.labels))) == expected
+            assert abs(result.mean_distance - distances.mean()) < 1e-12
+            assert result.sizes.sum() == len(genotypes)
+            print(f"✓ threshold={threshold}: {expected} klastrów jak dla pełnej macierzy odległości")
+        
+        return True
+        
+    except Exception as e:
+        print(f"✗ Błąd klastrowania:")
+        print(f"  {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_batched_replicates():
+    """Test powtórzeń w jednej populacji (run_simulation_batched)"""
+    print("\n" + "=" * 70)
+    print("TEST 10: Powtórzenia w jednej populacji")
+    print("=" * 70)
+    
+    try:
+        import numpy as np
+        from scipy.spatial.distance import pdist
+        from symulacja import run_simulation, run_simulation_batched
+        
+        config = {'grid_size': 10, 'generations': 20, 'barrier_type': 'vertical'}
+        seeds = [11, 12, 13, 14]
+        results = run_simulation_batched(config, seeds=seeds)
+        assert len(results) == len(seeds)
+        for seed, (populations, env, barriers, collection) in zip(seeds, results):
+            # Środowisko powtórzenia jak w osobnym uruchomieniu z tym ziarnem
+            _, expected_env, _, _ = run_simulation(dict(config, seed=seed, generations=1))
+            assert np.array_equal(env, expected_env)
+            genotypes = np.concatenate([p.genotypes for p in populations])
+            assert len(genotypes) == collection['total_population'][-1]
+            assert np.isclose(collection['genetic_diversity'][-1], pdist(genotypes, metric='hamming').mean())
+        print(f"✓ {len(seeds)} powtórzeń: własne środowiska, statystyki zgodne z populacjami")
+        
+        return True
+        
+    except Exception as e:
+        print(f"✗ Błąd powtórzeń w jednej populacji:")
+        print(f"  {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_result_cache():
+    """Test pamięci podręcznej wyników (klucz 'cache')"""
+    print("\n" + "=" * 70)
+    print("TEST 11: Pamięć podręczna wyników")
+    print("=" * 70)
+    
+    try:
+        import tempfile
+        import numpy as np
+        from symulacja import (run_simulation, run_simulation_batched, result_cache_key,
+                               PopulationArrays, SIMULATION_ENGINES)
+        from result_cache import ResultCache
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = ResultCache(tmp)
+            for engine in SIMULATION_ENGINES:
+                config = {'grid_size': 8, 'generations': 10, 'seed': 5,
+                          'barrier_type': 'vertical', 'engine': engine, 'cache': cache}
+                computed = run_simulation(config)
+                cached = run_simulation(config)
+                assert result_cache_key(config) in cache
+                assert cached[3] == computed[3]
+                assert np.array_equal(cached[1], computed[1])
+                assert [len(p) for p in cached[0]] == [len(p) for p in computed[0]]
+                assert type(cached[0][0]) is type(computed[0][0])
+            # Paczka powtórzeń: trafienie zwraca PopulationArrays jak liczenie,
+            # a uruchomienia bez ziarna nie są zapisywane
+            config = {'grid_size': 8, 'generations': 10, 'seed': 5, 'cache': cache}
+            entries = len(cache)
+            computed = run_simulation_batched(config, replicates=3)
+            cached = run_simulation_batched(config, replicates=3)
+            assert len(cache) == entries + 1
+            assert [result[3] for result in cached] == [result[3] for result in computed]
+            assert all(isinstance(population, PopulationArrays)
+                       for result in cached + computed for population in result[0])
+            run_simulation_batched(dict(config, seed=None), replicates=3)
+            assert len(cache) == entries + 1
+            
+            # Parametry spoza modelu nie zmieniają klucza, ziarno - zmienia
+            assert result_cache_key(config) == result_cache_key(dict(config, profile=False))
+            assert result_cache_key(config) != result_cache_key(dict(config, seed=6))
+            
+            # Usuwanie najdawniej używanych wpisów ponad limit
+            cache.max_entries = 2
+            cache.evict()
+            assert len(cache) == 2
+        print(f"✓ Wyniki z pamięci podręcznej identyczne dla silników {list(SIMULATION_ENGINES)} i paczek powtórzeń")
+        
+        return True
+        
+    except Exception as e:
+        print(f"✗ Błąd pamięci podręcznej wyników:")
+        print(f"  {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_tiled_simulation():
+    """Test dekompozycji siatki na kafelki w osobnych procesach"""
+    print("\n" + "=" * 70)
+    print("TEST 12: Dekompozycja przestrzenna (kafelki)")
+    print("=" * 70)
+    
+    try:
+        import numpy as np
+        from symulacja import mean_hamming_diversity
+        from domain import run_simulation_tiled
+        
+        config = {'grid_size': 12, 'generations': 20, 'seed': 4, 'barrier_type': 'vertical'}
+        populations, env, barriers, collection = run_simulation_tiled(config, tiles=3)
+        genotypes = np.concatenate([p.genotypes for p in populations])
+        assert len(genotypes) == collection['total_population'][-1]
+        assert np.isclose(collection['genetic_diversity'][-1], mean_hamming_diversity(genotypes))
+        assert run_simulation_tiled(config, tiles=3)[3] == collection
+        
+        # Bez rozrodu i limitu komórek migranci między kafelkami nie giną ani się nie mnożą
+        moving = dict(config, barrier_type='none', reproduction_rate=0.0,
+                      migration_rate=0.9, max_per_cell=10**6)
+        sizes = run_simulation_tiled(moving, tiles=4)[3]['total_population']
+        assert set(sizes) == {100}
+        
+        # Bufory migrantów rosną, gdy populacja przekracza początkową pojemność
+        growing = dict(config, barrier_type='none', initial_pop_size=10, reproduction_rate=0.9,
+                       migration_rate=0.9)
+        populations, _, _, collection = run_simulation_tiled(growing, tiles=3)
+        assert collection['total_population'][-1] == sum(len(p) for p in populations) > 100
+        print("✓ Statystyki kafelków zgodne z populacją, wymiana migrantów bez strat")
+        print("✓ Bufory migrantów powiększane przy przepełnieniu")
+        
+        return True
+        
+    except Exception as e:
+        print(f"✗ Błąd dekompozycji przestrzennej:")
+        print(f"  {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_shared_environment():
+    """Test wspólnego środowiska w pamięci współdzielonej (EnvironmentRegistry)"""
+    print("\n" + "=" * 70)
+    print("TEST 13: Wspólne środowisko dla procesów")
+    print("=" * 70)
+    
+    try:
+        import os
+        import numpy as np
+        from symulacja import init_environment, make_rng
+        from sweep import run_sweep
+        from env_registry import EnvironmentRegistry
+        
+        env, barrier = init_environment(12, 12, 'vertical', make_rng(7))
+        with EnvironmentRegistry() as registry:
+            landscape = registry.publish(env, barrier)
+            configs = [{'grid_size': 12, 'generations': 5, 'barrier_type': 'vertical',
+                        'mutation_rate': rate, 'landscape': landscape} for rate in (0.01, 0.1)]
+            for _, result_env, result_barrier, _ in run_sweep(configs, replicates=2, workers=2, base_seed=1):
+                assert np.array_equal(result_env, env) and np.array_equal(result_barrier, barrier)
+            shared_env, _ = landscape.arrays()
+            assert not shared_env.flags.writeable
+        assert not os.path.exists(os.path.join('/dev/shm', landscape.env.name))
+        print("✓ Procesy korzystają z jednego środowiska, bloki usunięte po zamknięciu rejestru")
+        
+        return True
+        
+    except Exception as e:
+        print(f"✗ Błąd wspólnego środowiska:")
+        print(f"  {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_results_export():
+    """Test strumieniowego eksportu wyników (export_path, ResultsDataset)"""
+    print("\n" + "=" * 70)
+    print("TEST 14: Eksport wyników do zbioru danych")
+    print("=" * 70)
+    
+    try:
+        import tempfile
+        import numpy as np
+        from symulacja import run_simulation, ResultsDataset, SimulationHooks
+        from sweep import run_sweep
+        
+        with tempfile.TemporaryDirectory() as path:
+            config = {'grid_size': 15, 'initial_pop_size': 60, 'generations': 12,
+                      'engine': 'arrays', 'seed': 5, 'export_path': path, 'export_flush_every': 5}
+            populations, _, _, collection = run_simulation(config)
+            dataset = ResultsDataset(path)
+            run = dataset.runs(config)[0]
+            series = run.series()
+            assert run.complete and run.seed == 5
+            assert series['total_population'].tolist() == collection['total_population']
+            assert np.array_equal(series['generation'], np.arange(12))
+            population, group = run.population()
+            assert len(population) == len(group) == sum(len(pop) for pop in populations)
+            
+            # Przerwane uruchomienie zostawia kompletne wiersze series.csv
+            def interrupt(gen, population, collection):
+                if gen == 7:
+                    raise KeyboardInterrupt
+            hooks = SimulationHooks()
+            hooks.register('generation', interrupt)
+            try:
+                run_simulation(dict(config, seed=6, export_flush_every=100), hooks=hooks)
+            except KeyboardInterrupt:
+                pass
+            interrupted = [run for run in dataset.runs(config) if run.seed == 6][0]
+            assert not interrupted.complete
+            assert np.array_equal(interrupted.series()['generation'], np.arange(8))
+            
+            # Kolejny przegląd dopisuje uruchomienia do tego samego zbioru
+            configs = [{'grid_size': 15, 'generations': 6, 'mutation_rate': rate} for rate in (0.01, 0.1)]
+            run_sweep(configs, replicates=2, workers=1, base_seed=3, export_path=path)
+            assert len(dataset.config_keys()) == 3 and len(dataset.runs()) == 6
+            assert dataset.stack('total_population', configs[1]).shape == (2, 6)
+        print("✓ Serie i populacje zapisane kolumnowo, przeglądy dopisują do zbioru")
+        print("✓ Przerwane uruchomienie zostawia zapisane wiersze series.csv")
+        
+        return True
+        
+    except Exception as e:
+        print(f"✗ Błąd eksportu wyników:")
+        print(f"  {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_batch_runner():
+    """Test przeglądów wsadowych z pliku definicji (batch.py)"""
+    print("\n" + "=" * 70)
+    print("TEST 15: Przeglądy wsadowe")
+    print("=" * 70)
+    
+    try:
+        import json
+        import os
+        import tempfile
+        from batch import load_batch_file, expand_batch, expand_sweep, run_batch
+        from config_gallery import ConfigGallery
+        
+        spec = {
+            'base_seed': 11,
+            'replicates': 2,
+            'defaults': {'generations': 5},
+            'sweeps': [{'name': 'mutacja', 'base': 'high_mutation', 'params': {'grid_size': 10},
+                        'grid': {'mutation_rate': [0.01, 0.1]}}],
+        }
+        with tempfile.TemporaryDirectory() as path:
+            spec_path = os.path.join(path, 'przeglad.json')
+            with open(spec_path, 'w') as f:
+                json.dump(spec, f)
+            jobs = expand_batch(load_batch_file(spec_path))
+            assert len(jobs) == 4 and jobs[1].config['initial_pop_size'] == 100
+            assert all(job.config['generations'] == 5 for job in jobs)
+            output = os.path.join(path, 'wyniki')
+            manifest = run_batch(jobs, output, workers=1)
+            assert manifest['counts']['done'] == 4
+            # Ponowne uruchomienie pomija gotowe zadania
+            manifest = run_batch(expand_batch(spec), output, workers=1)
+            assert manifest['counts']['skipped'] == 4
+            with open(os.path.join(output, 'manifest.json')) as f:
+                assert json.load(f)['counts']['skipped'] == 4
+        print("✓ Zadania rozwinięte z pliku, gotowe wyniki pominięte, manifest zapisany")
+        
+        # Pierwszeństwo: base < defaults < params < punkt siatki
+        base = ConfigGallery.get('high_mutation')
+        defaults = {'generations': 7, 'grid_size': 12, 'mutation_rate': 0.3}
+        sweep = {'base': 'high_mutation', 'params': {'grid_size': 10},
+                 'grid': {'mutation_rate': [0.01]}}
+        (params, config), = expand_sweep(sweep, defaults)
+        assert params == {'mutation_rate': 0.01}
+        assert config == {**base, 'generations': 7, 'grid_size': 10, 'mutation_rate': 0.01}
+        print("✓ Pierwszeństwo parametrów: base < defaults < params < siatka")
+        
+        return True
+        
+    except Exception as e:
+        print(f"✗ Błąd przeglądu wsadowego:")
+        print(f"  {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_import_budget():
+    """Test czasu importu rdzenia (bez matplotlib i scipy)"""
+    print("\n" + "=" * 70)
+    print("TEST 16: Czas importu rdzenia symulacji")
+    print("=" * 70)
+    
+    # Najlepszy z kilku pomiarów w świeżym interpreterze; wcześniej sam import
+    # symulacja (z matplotlib) trwał ok. 0.7 s, rdzeń bez wykresów ok. 0.2 s
+    budget = 0.5
+    modules = 'symulacja, sweep, ensemble, batch, domain, env_registry, result_cache'
+    
+    try:
+        import json
+        import os
+        import subprocess
+        
+        code = (f"import sys, time, json\n"
+                f"start = time.perf_counter()\n"
+                f"import {modules}\n"
+                f"elapsed = time.perf_counter() - start\n"
+                f"print(json.dumps([elapsed, [name for name in ('matplotlib', 'scipy') if name in sys.modules]]))")
+        timings = []
+        for _ in range(3):
+            output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True,
+                                    cwd=os.path.dirname(os.path.abspath(__file__))).stdout
+            elapsed, heavy = json.loads(output)
+            assert not heavy, f"Import rdzenia załadował: {heavy}"
+            timings.append(elapsed)
+        assert min(timings) < budget, f"Import trwał {min(timings):.3f} s (budżet {budget} s)"
+        print(f"✓ Import rdzenia: {min(timings) * 1e3:.0f} ms (budżet {budget * 1e3:.0f} ms), bez matplotlib i scipy")
+        
+        return True
+        
+    except Exception as e:
+        print(f"✗ Błąd budżetu importu:")
+        print(f"  {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_fused_engine():
+    """Test zgodności silnika 'fused' (step_kernel) z silnikiem 'arrays'"""
+    print("\n" + "=" * 70)
+    print("TEST 17: Silnik 'fused' zgodny z 'arrays'")
+    print("=" * 70)
+    
+    try:
+        import numpy as np
+        from symulacja import run_simulation, SimulationHooks
+        
+        config = {'grid_size': 15, 'initial_pop_size': 200, 'generations': 25,
+                  'barrier_type': 'vertical', 'max_per_cell': 3, 'seed': 21}
+        expected = run_simulation(dict(config, engine='arrays'))
+        
+        # Populacje zachowane przez hook nie mogą być nadpisywane przez bufory
+        kept = []
+        hooks = SimulationHooks()
+        hooks.register('generation', lambda gen, population, collection: kept.append(population))
+        result = run_simulation(dict(config, engine='fused'), hooks=hooks)
+        
+        assert result[3] == expected[3]
+        for fused, arrays in zip(result[0], expected[0]):
+            for name in ('x', 'y', 'genotypes', 'birth_time'):
+                assert np.array_equal(getattr(fused, name), getattr(arrays, name))
+        assert [len(population) for population in kept] == expected[3]['total_population']
+        assert [int(population.birth_time.max()) for population in kept] == list(range(config['generations']))
+        print("✓ Wyniki identyczne dla tego samego ziarna, populacje z hooków nienaruszone")
+        
+        return True
+        
+    except Exception as e:
+        print(f"✗ Błąd silnika 'fused':")
+        print(f"  {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_streaming_collector():
+    """Test zgodności StreamingDataCollector z DataCollector"""
+    print("\n" + "=" * 70)
+    print("TEST 18: Strumieniowe zbieranie danych")
+    print("=" * 70)
+    
+    try:
+        import numpy as np
+        from symulacja import (run_simulation, SimulationHooks, DataCollector,
+                               StreamingDataCollector, FITNESS_TABLE_BUILDERS,
+                               SIMULATION_ENGINES, COLLECTOR_MODES)
+        
+        config = {'grid_size': 15, 'initial_pop_size': 200, 'generations': 20,
+                  'barrier_type': 'vertical', 'engine': 'arrays', 'seed': 8}
+        populations = []
+        hooks = SimulationHooks()
+        hooks.register('generation', lambda gen, population, collection: populations.append(population))
+        _, environment, barriers, collection = run_simulation(config, hooks=hooks)
+        
+        # Te same populacje podane obu kolektorom dają te same serie
+        collector = DataCollector(barriers)
+        streaming = StreamingDataCollector(barriers, steps=4)
+        for gen, population in enumerate(populations):
+            collector.collect(population, environment, gen, None)
+            streaming.collect(population, environment, gen)
+        expected = collector.series()
+        series = streaming.series()
+        assert set(series) == set(expected)
+        for name in expected:
+            assert np.allclose(series[name], expected[name]), name
+        print(f"✓ Serie zgodne z DataCollector.series() ({len(series['time'])} generacji)")
+        
+        # Bez wektora dopasowania kolektory używają tablicy fitness_name
+        FITNESS_TABLE_BUILDERS['test_flat'] = lambda genome_length: np.full((2 * genome_length + 1, 3), 0.5)
+        try:
+            for collector in (DataCollector(barriers, fitness_name='test_flat'),
+                              StreamingDataCollector(barriers, steps=1, fitness_name='test_flat')):
+                collector.collect(populations[-1], environment, 0, None)
+                assert collector.series()['mean_fitness'][0] == 0.5
+        finally:
+            del FITNESS_TABLE_BUILDERS['test_flat']
+        print("✓ Dopasowanie z tablicy fitness_name")
+        
+        # 'collector': 'streaming' w run_simulation daje te same wartości co listy
+        streamed = run_simulation(dict(config, collector='streaming'))[3]
+        for name in ('total_population', 'genetic_diversity', 'fitness'):
+            values = collection[name]
+            assert isinstance(streamed[name], np.ndarray)
+            assert np.allclose(streamed[name], values), name
+        print("✓ run_simulation z 'collector': 'streaming' zgodne z trybem list")
+        
+        # Po wymarciu populacji dopasowanie spada do zera (bez wektora z poprzedniej generacji)
+        for engine in SIMULATION_ENGINES:
+            for mode in COLLECTOR_MODES:
+                extinct = run_simulation(dict(config, engine=engine, collector=mode, max_per_cell=0,
+                                              generations=4))[3]
+                assert list(extinct['total_population']) == [0, 0, 0, 0]
+                assert list(extinct['fitness'][1:]) == [0.0, 0.0, 0.0], (engine, mode)
+        print("✓ Pusta populacja daje zerowe dopasowanie we wszystkich silnikach")
+        
+        return True
+        
+    except Exception as e:
+        print(f"✗ Błąd strumieniowego zbierania danych:")
+        print(f"  {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_snapshot_store():
+    """Test zapisu snapshotów na dysk i dostępu do dowolnej generacji"""
+    print("\n" + "=" * 70)
+    print("TEST 19: Magazyn snapshotów (SnapshotStore)")
+    print("=" * 70)
+    
+    try:
+        import tempfile
+        import numpy as np
+        from symulacja import (run_simulation, SimulationHooks, SnapshotStore, GenotypeSnapshotWriter,
+                               detect_species_clusters, calculate_population_genetic_distance,
+                               analyze_genetic_divergence)
+        
+        with tempfile.TemporaryDirectory() as path:
+            config = {'grid_size': 15, 'initial_pop_size': 120, 'generations': 20, 'engine': 'arrays',
+                      'seed': 13, 'snapshot_path': path, 'snapshot_stride': 3}
+            populations = {}
+            hooks = SimulationHooks()
+            hooks.register('generation', lambda gen, population, collection:
+                           populations.__setitem__(gen, population.copy()))
+            run_simulation(config, hooks=hooks)
+            
+            # Ponowne otwarcie: długość genotypu z meta.json, indeks przesunięć wierszy
+            store = SnapshotStore(path)
+            assert store.genome_length == 8
+            assert store.times.tolist() == list(range(0, 20, 3))
+            counts = store.index[:, 2]
+            assert np.array_equal(store.index[:, 1], np.concatenate([[0], np.cumsum(counts)[:-1]]))
+            
+            # Środkowa generacja bez wczytywania pozostałych
+            middle = len(store) // 2
+            snapshot = store[middle]
+            expected = populations[int(store.times[middle])]
+            assert isinstance(snapshot.genotypes, np.memmap)
+            assert np.array_equal(snapshot.genotypes, expected.genotypes)
+            assert np.array_equal(snapshot.x, expected.x) and np.array_equal(snapshot.y, expected.y)
+            assert np.array_equal(store.at_time(9).genotypes, populations[9].genotypes)
+            
+            # Funkcje analizy przyjmują snapshot bezpośrednio
+            clusters, _ = detect_species_clusters(snapshot)
+            assert sum(len(cluster) for cluster in clusters) == len(snapshot)
+            assert calculate_population_genetic_distance(snapshot, expected) == 0
+            assert 0 <= analyze_genetic_divergence([store[0], snapshot]) <= 1
+            
+            # Dopisanie do istniejącego magazynu kontynuuje numerację wierszy
+            writer = GenotypeSnapshotWriter(path, 8)
+            writer.append(100, expected.genotypes, np.column_stack([expected.x, expected.y]))
+            writer.close()
+            store.refresh()
+            assert len(store) == 8 and store.index[-1, 1] == counts.sum()
+            assert np.array_equal(store.at_time(100).genotypes, snapshot.genotypes)
+        print(f"✓ Snapshoty {len(counts)} generacji, odczyt dowolnej generacji z mapowania pamięci")
+        
+        return True
+        
+    except Exception as e:
+        print(f"✗ Błąd magazynu snapshotów:")
+        print(f"  {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_profiler_hooks():
+    """Test liczników StepProfiler i zdarzeń SimulationHooks"""
+    print("\n" + "=" * 70)
+    print("TEST 20: Profiler etapów i hooki generacji")
+    print("=" * 70)
+    
+    try:
+        from symulacja import run_simulation, SimulationHooks, StepProfiler, SIMULATION_ENGINES
+        
+        config = {'grid_size': 12, 'initial_pop_size': 150, 'generations': 15,
+                  'max_per_cell': 3, 'seed': 5}
+        for engine in SIMULATION_ENGINES:
+            profiler = StepProfiler()
+            generations, finished = [], []
+            hooks = SimulationHooks()
+            hooks.register('generation', lambda gen, population, collection:
+                           generations.append((gen, len(population), dict(profiler.counters))))
+            hooks.register('finish', lambda population, collection: finished.append(len(population)))
+            run_simulation(dict(config, engine=engine), hooks=hooks, profiler=profiler)
+            
+            # Hook 'generation' raz na generację, 'finish' raz na końcu
+            assert [gen for gen, _, _ in generations] == list(range(config['generations']))
+            assert finished == [generations[-1][1]]
+            assert profiler.steps == config['generations']
+            
+            # Zmiana liczebności w każdej generacji = narodziny - usunięte osobniki
+            size, previous = config['initial_pop_size'], dict.fromkeys(profiler.counters, 0)
+            for gen, new_size, counters in generations:
+                step = {name: counters[name] - previous[name] for name in counters}
+                assert new_size == size + step['births'] - step['culled'], (engine, gen)
+                assert step['migrants'] <= size
+                assert step['culled'] >= step['cells_over_capacity']
+                size, previous = new_size, counters
+            
+            # Bez migracji i rozrodu liczniki tych etapów pozostają zerowe
+            still = StepProfiler()
+            run_simulation(dict(config, engine=engine, migration_rate=0.0, reproduction_rate=0.0),
+                           profiler=still)
+            assert still.counters['migrants'] == still.counters['births'] == 0
+            print(f"✓ {engine:<10} liczniki zgodne ze zmianą populacji, hooki raz na generację")
+        
+        return True
+        
+    except Exception as e:
+        print(f"✗ Błąd profilera lub hooków:")
+        print(f"  {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_visualization_rasters():
+    """Test rastrów populacji i rysowania na płótnie Agg (wizualizacja.py)"""
+    print("\n" + "=" * 70)
+    print("TEST 21: Rastry populacji i wizualizacja")
+    print("=" * 70)
+    
+    try:
+        import os
+        import tempfile
+        import numpy as np
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        from matplotlib.figure import Figure
+        from symulacja import PopulationArrays, run_simulation
+        from wizualizacja import (density_raster, mean_genotype_raster, dominant_haplotype_raster,
+                                  draw_barrier_overlay, visualize_comparison)
+        
+        # Haplotypy: A = [0, 0] (4 osobniki), B = [1, 1] (3), C = [2, 2] (1) -> ranking A, B, C
+        a, b, c = [0, 0], [1, 1], [2, 2]
+        individuals = [(0, 0, b), (0, 0, a),              # remis 1:1 -> częstszy w populacji (A)
+                       (1, 0, b), (1, 0, a), (1, 0, b),   # B wygrywa 2:1
+                       (2, 1, c),
+                       (3, 2, a), (3, 2, a)]
+        population = PopulationArrays(x=np.array([i[0] for i in individuals], dtype=np.int32),
+                                      y=np.array([i[1] for i in individuals], dtype=np.int32),
+                                      genotypes=np.array([i[2] for i in individuals], dtype=np.uint8),
+                                      birth_time=np.zeros(len(individuals), dtype=np.int32))
+        height, width = 3, 4
+        
+        density = density_raster(population, height, width)
+        expected = np.zeros((height, width), dtype=np.int64)
+        expected[0, 0], expected[0, 1], expected[1, 2], expected[2, 3] = 2, 3, 1, 2
+        assert density.sum() == len(population) and np.array_equal(density, expected)
+        
+        mean = mean_genotype_raster(population, height, width)
+        assert np.isclose(mean[0, 0], 0.5) and np.isclose(mean[0, 1], 2 / 3)
+        assert np.isnan(mean[1, 1])
+        
+        dominant = dominant_haplotype_raster(population, height, width)
+        assert dominant[0, 0] == 0 and dominant[0, 1] == 1 and dominant[1, 2] == 2 and dominant[2, 3] == 0
+        assert (dominant[density == 0] == -1).all()
+        # Miejsca od top wzwyż kodowane jako top ("pozostałe")
+        assert dominant_haplotype_raster(population, height, width, top=1)[0, 1] == 1
+        assert dominant_haplotype_raster(population, height, width, top=1)[1, 2] == 1
+        
+        empty = PopulationArrays.empty(2)
+        assert (dominant_haplotype_raster(empty, height, width) == -1).all()
+        assert density_raster(empty, height, width).sum() == 0
+        print("✓ Rastry liczebności, średniego genotypu i dominującego haplotypu poprawne")
+        
+        # Bariera jako jedna zamaskowana warstwa
+        fig = Figure()
+        FigureCanvasAgg(fig)
+        ax = fig.subplots()
+        barrier = np.zeros((height, width), dtype=bool)
+        assert draw_barrier_overlay(ax, barrier) is None
+        barrier[:, 2] = True
+        image = draw_barrier_overlay(ax, barrier)
+        assert np.array_equal(~np.ma.getmaskarray(image.get_array()), barrier)
+        
+        # Zapis PNG bez pyplot (płótno Agg)
+        populations, environment, barriers, collection = run_simulation(
+            {'grid_size': 10, 'generations': 5, 'engine': 'arrays', 'seed': 2})
+        with tempfile.TemporaryDirectory() as path:
+            filename = os.path.join(path, 'haplotypy.png')
+            visualize_comparison(populations, environment, barriers, collection, 'Test', filename,
+                                 raster='haplotypes')
+            with open(filename, 'rb') as f:
+                assert f.read(8) == b'\x89PNG\r\n\x1a\n'
+        print("✓ Nakładka bariery i zapis PNG (raster='haplotypes')")
+        
+        return True
+        
+    except Exception as e:
+        print(f"✗ Błąd wizualizacji:")
+        print(f"  {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_ensemble():
+    """Test zespołów powtórzeń (ensemble.run_ensemble)"""
+    print("\n" + "=" * 70)
+    print("TEST 22: Zespoły powtórzeń")
+    print("=" * 70)
+    
+    try:
+        import numpy as np
+        from scipy import stats
+        from symulacja import run_simulation_batched
+        from ensemble import run_ensemble, ENSEMBLE_SERIES
+        
+        config = {'grid_size': 10, 'generations': 12, 'barrier_type': 'vertical', 'engine': 'arrays'}
+        serial = run_ensemble(config, replicates=3, workers=1, base_seed=7)
+        assert serial.replicates == 3
+        for name in ENSEMBLE_SERIES:
+            assert serial.series[name].shape == (3, config['generations'])
+        
+        # Pula procesów: te same ziarna i serie co uruchomienie szeregowe
+        pooled = run_ensemble(config, replicates=3, workers=2, base_seed=7)
+        assert np.array_equal(pooled.seeds, serial.seeds)
+        for name in ENSEMBLE_SERIES:
+            assert np.array_equal(pooled.series[name], serial.series[name])
+        
+        # Tryb batched: te same ziarna, serie jak run_simulation_batched dla tych ziaren
+        # (kroki z jednego generatora, więc trajektorie różnią się od osobnych uruchomień)
+        batched = run_ensemble(config, replicates=3, base_seed=7, batched=True)
+        assert np.array_equal(batched.seeds, serial.seeds)
+        expected = run_simulation_batched(config, seeds=serial.seeds.tolist())
+        for name in ENSEMBLE_SERIES:
+            assert batched.series[name].shape == (3, config['generations'])
+            assert np.allclose(batched.series[name], [collection[name] for *_, collection in expected])
+        
+        # Przedział t-Studenta dla średniej divergencji
+        summary = serial.summary()
+        half_width = stats.t.ppf(0.975, 2) * serial.divergence.std(ddof=1) / np.sqrt(3)
+        low, high = summary['divergence']['ci']
+        assert np.isclose(low, serial.divergence.mean() - half_width)
+        assert np.isclose(high, serial.divergence.mean() + half_width)
+        
+        # Jedno powtórzenie: zerowe odchylenie, przedział zwinięty do średniej
+        single = run_ensemble(config, replicates=1, base_seed=7)
+        mean = single.mean('total_population')
+        assert (single.std('total_population') == 0).all()
+        low, high = single.confidence_band('total_population')
+        assert np.array_equal(low, mean) and np.array_equal(high, mean)
+        assert single.summary()['divergence']['std'] == 0.0
+        print("✓ Kształty (K, generacje), zgodność puli i trybu batched, przedziały ufności")
+        
+        return True
+        
+    except Exception as e:
+        print(f"✗ Błąd zespołów powtórzeń:")
+        print(f"  {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
 def test_helper_scripts():
     """Test dostępności skryptów pomocniczych"""
     print("\n" + "=" * 70)
@@ -118,6 +988,8 @@ def test_helper_scripts():
         'run_simulations.py',
         'quickstart.py',
         'config_gallery.py',
+        'batch.py',
+        'wizualizacja.py',
     ]
     
     docs = [
@@ -210,6 +1082,60 @@ def main():
     # Test 4: Skrypty
     results.append(("Skrypty i dokumentacja", test_helper_scripts()))
     
+    # Test 5: Silnik tablicowy
+    results.append(("Silnik tablicowy", test_array_engine()))
+    
+    # Test 6: Różnorodność genetyczna
+    results.append(("Różnorodność genetyczna", test_diversity_tracker()))
+    
+    # Test 7: Powtarzalność
+    results.append(("Powtarzalność (seed)", test_seeded_runs()))
+    
+    # Test 8: Checkpoint
+    results.append(("Checkpoint i wznowienie", test_checkpoint_resume()))
+    
+    # Test 9: Klastrowanie
+    results.append(("Klastrowanie gatunków", test_species_clusters()))
+    
+    # Test 10: Powtórzenia w jednej populacji
+    results.append(("Powtórzenia w jednej populacji", test_batched_replicates()))
+    
+    # Test 11: Pamięć podręczna wyników
+    results.append(("Pamięć podręczna wyników", test_result_cache()))
+    
+    # Test 12: Dekompozycja przestrzenna
+    results.append(("Dekompozycja przestrzenna", test_tiled_simulation()))
+    
+    # Test 13: Wspólne środowisko
+    results.append(("Wspólne środowisko", test_shared_environment()))
+    
+    # Test 14: Eksport wyników
+    results.append(("Eksport wyników", test_results_export()))
+    
+    # Test 15: Przeglądy wsadowe
+    results.append(("Przeglądy wsadowe", test_batch_runner()))
+    
+    # Test 16: Czas importu
+    results.append(("Czas importu rdzenia", test_import_budget()))
+    
+    # Test 17: Silnik 'fused'
+    results.append(("Silnik 'fused'", test_fused_engine()))
+    
+    # Test 18: Strumieniowe zbieranie danych
+    results.append(("Strumieniowe zbieranie", test_streaming_collector()))
+    
+    # Test 19: Magazyn snapshotów
+    results.append(("Magazyn snapshotów", test_snapshot_store()))
+    
+    # Test 20: Profiler i hooki
+    results.append(("Profiler i hooki", test_profiler_hooks()))
+    
+    # Test 21: Rastry i wizualizacja
+    results.append(("Rastry i wizualizacja", test_visualization_rasters()))
+    
+    # Test 22: Zespoły powtórzeń
+    results.append(("Zespoły powtórzeń", test_ensemble()))
+    
     # Podsumowanie
     print("\n" + "=" * 70)
     print("WYNIKI TESTÓW")
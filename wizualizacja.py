@@ -0,0 +1,331 @@
+"""
+Wizualizacja wyników symulacji (warstwa rysowania, oddzielona od rdzenia).
+
+Rastry populacji (liczebność, średni genotyp, dominujący haplotyp w komórce)
+liczone są w NumPy, a rysowane jedną warstwą imshow niezależnie od liczby
+osobników. Moduł importuje matplotlib, dlatego rdzeń (symulacja) ładuje go
+dopiero przy pierwszym użyciu funkcji rysujących - procesy robocze i zadania
+wsadowe bez wykresów nie płacą kosztu importu matplotlib.
+"""
+
+from typing import List
+
+import numpy as np
+import matplotlib.pyplot as plt
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.colors import ListedColormap
+from matplotlib.figure import Figure
+
+from symulacja import (NUM_ALLELES, DataCollector, Individual, SimulationConfig,
+                       analyze_genetic_divergence, population_genotypes, population_positions,
+                       unique_haplotypes)
+
+
+# =========================
+# Rastry populacji
+# =========================
+
+# Liczba najczęstszych haplotypów z osobnym kolorem na rastrze (pozostałe: jeden kolor)
+RASTER_TOP_HAPLOTYPES = 10
+
+
+def cell_indices(population, width: int) -> np.ndarray:
+    """Indeks komórki y * width + x każdego osobnika"""
+    positions = population_positions(population).reshape(-1, 2).astype(np.int64)
+    return positions[:, 1] * width + positions[:, 0]
+
+
+def merge_populations(populations: list):
+    """Łączy niepuste populacje jednego typu (listy Individual lub tablice z concat)"""
+    merged = populations[0]
+    for population in populations[1:]:
+        merged = merged + population if isinstance(merged, list) else merged.concat(population)
+    return merged
+
+
+def density_raster(population, height: int, width: int) -> np.ndarray:
+    """Liczba osobników w każdej komórce (height, width) - jeden np.bincount"""
+    return np.bincount(cell_indices(population, width), minlength=height * width).reshape(height, width)
+
+
+def mean_genotype_raster(population, height: int, width: int) -> np.ndarray:
+    """Średnia wartość allelu osobników w każdej komórce (NaN dla pustych komórek)"""
+    cells = cell_indices(population, width)
+    counts = np.bincount(cells, minlength=height * width)
+    if len(cells):
+        sums = np.bincount(cells, weights=population_genotypes(population).mean(axis=1),
+                           minlength=height * width)
+    else:
+        sums = np.zeros(height * width)
+    raster = np.divide(sums, counts, out=np.full(height * width, np.nan), where=counts > 0)
+    return raster.reshape(height, width)
+
+
+def dominant_haplotype_raster(population, height: int, width: int,
+                              top: int = RASTER_TOP_HAPLOTYPES) -> np.ndarray:
+    """
+    Najczęstszy haplotyp w każdej komórce jako miejsce w rankingu liczebności
+    haplotypów całej populacji: 0 = najczęstszy, top = pozostałe, -1 = pusta komórka.
+    """
+    raster = np.full(height * width, -1, dtype=np.int64)
+    if len(population) == 0:
+        return raster.reshape(height, width)
+    _, inverse, counts = unique_haplotypes(population_genotypes(population))
+    rank = np.empty(len(counts), dtype=np.int64)
+    rank[np.argsort(-counts, kind='stable')] = np.arange(len(counts))
+    
+    # Liczebności par (komórka, haplotyp); w komórce wygrywa najliczniejsza,
+    # przy remisie haplotyp częstszy w całej populacji
+    pairs, pair_counts = np.unique(cell_indices(population, width) * len(counts) + rank[inverse],
+                                   return_counts=True)
+    pair_cells, pair_ranks = np.divmod(pairs, len(counts))
+    order = np.lexsort((pair_ranks, -pair_counts, pair_cells))
+    first = order[np.r_[True, pair_cells[order][1:] != pair_cells[order][:-1]]]
+    raster[pair_cells[first]] = np.minimum(pair_ranks[first], top)
+    return raster.reshape(height, width)
+
+
+# =========================
+# Rysowanie
+# =========================
+
+def draw_barrier_overlay(ax, barrier: np.ndarray, color: str = 'black', alpha: float = 0.5):
+    """Bariery jako jedna zamaskowana warstwa imshow (zamiast prostokąta na komórkę)"""
+    if barrier is None or not np.any(barrier):
+        return None
+    barrier = np.asarray(barrier) > 0
+    overlay = np.ma.masked_where(~barrier, np.ones(barrier.shape))
+    return ax.imshow(overlay, cmap=ListedColormap([color]), vmin=0, vmax=1, alpha=alpha,
+                     origin='lower', interpolation='nearest')
+
+
+def draw_haplotype_raster(ax, raster: np.ndarray, top: int = RASTER_TOP_HAPLOTYPES):
+    """Raster dominant_haplotype_raster: kolory tab10/tab20 dla najczęstszych, szary dla pozostałych"""
+    base = plt.cm.tab10 if top <= 10 else plt.cm.tab20
+    cmap = ListedColormap([base(i % base.N) for i in range(top)] + ['lightgrey'])
+    return ax.imshow(np.ma.masked_less(raster, 0), cmap=cmap, vmin=-0.5, vmax=top + 0.5,
+                     origin='lower', interpolation='nearest')
+
+
+def plot_simulation_snapshot(population: List[Individual], env: np.ndarray,
+                            barrier: np.ndarray, title: str = "Snapshot"):
+    """Rysuje snapshota stanu symulacji"""
+    height, width = env.shape
+    
+    fig, axes = plt.subplots(1, 2, figsize=(14, 6))
+    
+    # Lewy panel: Środowisko i rozmieszczenie populacji
+    ax = axes[0]
+    im = ax.imshow(env, cmap='YlGn', origin='lower', alpha=0.3)
+    
+    # Osobniki jako raster średniego genotypu w komórkach (kolor zależy od genotypu)
+    if len(population):
+        raster = mean_genotype_raster(population, height, width)
+        genotype_im = ax.imshow(np.ma.masked_invalid(raster), cmap='RdYlBu', alpha=0.8,
+                                origin='lower', interpolation='nearest')
+        plt.colorbar(genotype_im, ax=ax, label='Średni genotyp')
+    
+    # Narysuj bariery
+    draw_barrier_overlay(ax, barrier, color='red')
+    
+    ax.set_xlabel('X')
+    ax.set_ylabel('Y')
+    ax.set_title(f'{title}\nRozmieszczenie populacji (liczba: {len(population)})')
+    ax.set_xlim(-0.5, width - 0.5)
+    ax.set_ylim(-0.5, height - 0.5)
+    
+    # Prawy panel: Histogram genotypów
+    ax = axes[1]
+    if len(population):
+        allele_totals = np.bincount(population_genotypes(population).ravel(), minlength=NUM_ALLELES)
+        ax.bar(np.arange(len(allele_totals)), allele_totals, width=0.6,
+               color='skyblue', edgecolor='black', alpha=0.7)
+        ax.set_xticks(np.arange(len(allele_totals)))
+        ax.set_xlabel('Wartość allelu')
+        ax.set_ylabel('Liczba alleli')
+        ax.set_title('Rozkład alleli w populacji')
+    
+    plt.tight_layout()
+    return fig
+
+
+def plot_simulation_results(collector: DataCollector, barrier: np.ndarray, 
+                           config: SimulationConfig):
+    """Rysuje wykresy wyników symulacji"""
+    series = collector.series()
+    if not len(series['time']):
+        print("Brak danych do wykreślenia!")
+        return
+    
+    times = series['time']
+    pop_sizes = series['population_size']
+    fitnesses = series['mean_fitness']
+    diversities = series['genetic_diversity']
+    left_pops = series['left_pop_size']
+    right_pops = series['right_pop_size']
+    
+    fig, axes = plt.subplots(2, 2, figsize=(14, 10))
+    
+    # Liczba osobników w populacji
+    ax = axes[0, 0]
+    ax.plot(times, pop_sizes, 'b-', linewidth=2, label='Razem')
+    if config.barrier_type != "none":
+        ax.plot(times, left_pops, 'r--', linewidth=1.5, label='Lewa strona')
+        ax.plot(times, right_pops, 'g--', linewidth=1.5, label='Prawa strona')
+    ax.set_xlabel('Czas (kroki)')
+    ax.set_ylabel('Liczba osobników')
+    ax.set_title('Dynamika liczebności populacji')
+    ax.legend()
+    ax.grid(True, alpha=0.3)
+    
+    # Średnie dopasowanie
+    ax = axes[0, 1]
+    ax.plot(times, fitnesses, 'g-', linewidth=2)
+    ax.set_xlabel('Czas (kroki)')
+    ax.set_ylabel('Średnie dopasowanie')
+    ax.set_title('Ewolucja średniego dopasowania')
+    ax.grid(True, alpha=0.3)
+    
+    # Różnorodność genetyczna
+    ax = axes[1, 0]
+    ax.plot(times, diversities, 'purple', linewidth=2)
+    ax.set_xlabel('Czas (kroki)')
+    ax.set_ylabel('Różnorodność genetyczna')
+    ax.set_title('Zmienność genetyczna w populacji')
+    ax.grid(True, alpha=0.3)
+    
+    # Liczba osobników po każdej stronie bariery (jeśli istnieje)
+    ax = axes[1, 1]
+    if config.barrier_type != "none" and (any(left_pops) or any(right_pops)):
+        ax.stackplot(times, left_pops, right_pops, 
+                    labels=['Lewa strona', 'Prawa strona'],
+                    colors=['red', 'green'], alpha=0.6)
+        ax.set_xlabel('Czas (kroki)')
+        ax.set_ylabel('Liczba osobników')
+        ax.set_title('Rozkład populacji w zależności od bariery')
+        ax.legend(loc='upper left')
+    else:
+        ax.text(0.5, 0.5, 'Brak bariery', ha='center', va='center', 
+               transform=ax.transAxes, fontsize=12)
+        ax.set_title('Rozkład populacji')
+    ax.grid(True, alpha=0.3)
+    
+    plt.tight_layout()
+    return fig
+
+
+def visualize_comparison(populations, environment, barriers, collection, title, filename,
+                         raster: str = 'density'):
+    """
+    Wizualizuje stan końcowy populacji.
+    
+    Rysunek powstaje bezpośrednio na płótnie Agg (bez pyplot i okien), a mapa
+    ma stałą liczbę warstw niezależnie od liczby osobników.
+    
+    Args:
+        populations: lista populacji
+        environment: mapa środowiska
+        barriers: mapa barier
+        collection: dane zbierane podczas symulacji
+        title: tytuł wykresu
+        filename: nazwa pliku do zapisania
+        raster: 'density' (liczba osobników w komórce) lub
+                'haplotypes' (dominujący haplotyp w komórce)
+    """
+    fig = Figure(figsize=(12, 10))
+    FigureCanvasAgg(fig)
+    axes = fig.subplots(2, 2)
+    fig.suptitle(title, fontsize=14, fontweight='bold')
+    
+    # 1. Rozkład populacji na mapie
+    ax = axes[0, 0]
+    grid_size = environment.shape[0]
+    
+    # Pokaż środowisko (note: imshow shows (y,x) with y increasing downward by default)
+    im = ax.imshow(environment, cmap='RdYlBu_r', alpha=0.6, origin='lower')
+    fig.colorbar(im, ax=ax, label='Warunki środowiska')
+    
+    # Pokaż osobniki jako raster komórek (wszystkie populacje razem)
+    occupied = [population for population in populations if len(population) > 0]
+    if occupied:
+        if raster == 'haplotypes':
+            draw_haplotype_raster(ax, dominant_haplotype_raster(merge_populations(occupied),
+                                                                grid_size, grid_size))
+        else:
+            density = sum(density_raster(population, grid_size, grid_size) for population in occupied)
+            density_im = ax.imshow(np.ma.masked_equal(density, 0), cmap='viridis', alpha=0.85,
+                                   origin='lower', interpolation='nearest')
+            fig.colorbar(density_im, ax=ax, label='Liczba osobników w komórce')
+    
+    # Pokaż bariery
+    draw_barrier_overlay(ax, barriers, color='black')
+    
+    # Podpisy populacji w ich środkach ciężkości
+    for pop_idx, population in enumerate(populations):
+        if len(population) > 0:
+            center = population_positions(population).mean(axis=0)
+            ax.text(center[0], center[1], f'Pop {pop_idx + 1}', ha='center', va='center',
+                    fontsize=9, fontweight='bold',
+                    bbox=dict(boxstyle='round', facecolor='white', alpha=0.7))
+    
+    ax.set_xlabel('X')
+    ax.set_ylabel('Y')
+    ax.set_title('Rozkład przestrzenny populacji')
+    ax.set_xlim(-0.5, grid_size - 0.5)
+    ax.set_ylim(-0.5, grid_size - 0.5)
+    
+    # 2. Dynamika liczby osobników
+    ax = axes[0, 1]
+    if 'total_population' in collection:
+        ax.plot(collection['total_population'], linewidth=2, color='#2ecc71')
+        ax.fill_between(range(len(collection['total_population'])), 
+                        collection['total_population'], alpha=0.3, color='#2ecc71')
+        ax.set_xlabel('Generacja')
+        ax.set_ylabel('Liczba osobników')
+        ax.set_title('Dynamika populacji')
+        ax.grid(True, alpha=0.3)
+    
+    # 3. Różnorodność genetyczna
+    ax = axes[1, 0]
+    if 'genetic_diversity' in collection:
+        ax.plot(collection['genetic_diversity'], linewidth=2, color='#3498db')
+        ax.fill_between(range(len(collection['genetic_diversity'])), 
+                        collection['genetic_diversity'], alpha=0.3, color='#3498db')
+        ax.set_xlabel('Generacja')
+        ax.set_ylabel('Różnorodność genetyczna')
+        ax.set_title('Ewolucja różnorodności')
+        ax.grid(True, alpha=0.3)
+    
+    # 4. Statystyki
+    ax = axes[1, 1]
+    ax.axis('off')
+    
+    stats_text = f"""
+    STATYSTYKI KOŃCOWE
+    {'='*40}
+    
+    Liczba populacji: {len(populations)}
+    
+    Rozmiary populacji:
+    """
+    
+    for i, pop in enumerate(populations):
+        stats_text += f"\n  Populacja {i + 1}: {len(pop)} osobników"
+    
+    total_pop = sum(len(p) for p in populations)
+    stats_text += f"\n\n  RAZEM: {total_pop} osobników"
+    
+    # Divergencja genetyczna
+    div = analyze_genetic_divergence(populations)
+    stats_text += f"\n\nDywergencja genetyczna: {div:.4f}"
+    
+    if len(populations) > 1:
+        stats_text += "\n(Wyższa wartość → więcej specjacji)"
+    
+    ax.text(0.1, 0.5, stats_text, fontsize=10, family='monospace',
+            verticalalignment='center', bbox=dict(boxstyle='round', facecolor='wheat', alpha=0.5))
+    
+    fig.tight_layout()
+    fig.savefig(filename, dpi=150, bbox_inches='tight')
+    
+    print(f"  Wizualizacja zapisana: {filename}")